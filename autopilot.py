@@ -0,0 +1,298 @@
+"""
+Autopilot – 自動駕駛（展示機台用）
+==================================
+照 `SnakeSim` 的規則找路去吃食物：
+
+* 地圖上下左右相通（撞牆從對側出來），走進傳送門會從 `portal_exit()` 出來；
+* 障礙、隱形障礙撞到就 Game Over；炸彈、假食物會扣長度，規劃路線時也當成牆；
+* 自己的身體會隨著尾巴前進一格一格讓開：第 j 節（蛇頭 = 0）要走 len - j 步以後才空出來，
+  每一步都確認走過去之後還有夠大的空間，不會把自己關死。
+
+「蛇頭站在這格，離最近的食物還要幾步」是一張距離場（`DistanceField`），只有開局時整張 BFS；
+之後 sim 的佔用有變動（`SnakeSim.watchers`）時只修正受影響的那一區，大地圖每個 tick
+不用重跑一次 BFS。
+
+```python
+pilot = Autopilot(sim)
+while not sim.game_over:
+    sim.step(pilot.act())
+```
+"""
+from array import array
+from collections import deque
+
+from snake_core import (
+    DIR_LIST, OCC_OBSTACLE, OCC_INVISIBLE, OCC_BOMB, OCC_FAKE, OCC_FOOD, OCC_PORTAL, OCC_ALL,
+)
+
+INF = 1 << 30
+REBUILD_CHANGES = 64    # 一次變動超過這麼多格（整批道具移位）就直接整張重算，比逐格修正快
+DEADLY = OCC_OBSTACLE | OCC_INVISIBLE           # 走上去就 Game Over
+AVOID = DEADLY | OCC_BOMB | OCC_FAKE            # 規劃路線時當成牆
+
+# 距離場裡每格的狀態：可以走 / 牆 / 食物（目標）
+OPEN, WALL, GOAL = 0, 1, 2
+
+
+def _state(flags):
+    if flags & OCC_PORTAL:
+        return OPEN     # 一走進去就傳走，門上的東西碰不到
+    if flags & AVOID:
+        return WALL
+    if flags & OCC_FOOD:
+        return GOAL
+    return OPEN
+
+
+STATE = bytes(_state(flags) for flags in range(OCC_ALL + 1))
+
+
+def _by_distance(seeds, queue):
+    """依距離由小到大產生 (d, 格子)：seeds 是起點，queue 是處理中才加進來的（距離都是目前 + 1），
+    兩邊合併就好，不需要 heap。"""
+    seeds.sort()
+    i = 0
+    while i < len(seeds) or queue:
+        if queue and (i == len(seeds) or queue[0][0] <= seeds[i][0]):
+            yield queue.popleft()
+        else:
+            yield seeds[i]
+            i += 1
+
+
+# ────────────────────────────────────────────────────────────────────
+# 距離場
+# ────────────────────────────────────────────────────────────────────
+class DistanceField:
+    """dist[c]：蛇頭在格子 c 時，最少還要走幾步會吃到食物（INF = 走不到）。
+    不考慮蛇身（蛇身每個 tick 都在動，交給 Autopilot 另外檢查）。"""
+
+    def __init__(self, sim):
+        self.sim = sim
+        self.W, self.C = sim.grid_w, sim.grid_w * sim.grid_h
+        # 傳送門只在開局時生成：入口 → 出口、出口 → 入口們
+        self.exit_of = {}
+        self.entries = {}
+        for p in sim.portals:
+            c, e = sim.cell_id(p), sim.cell_id(sim.portal_exit(p))
+            self.exit_of[c] = e
+            self.entries.setdefault(e, []).append(c)
+        self.state = bytearray(map(STATE.__getitem__, sim.occ))
+        self.dist = array("i", [INF]) * self.C
+        self.log = []               # sim 會把有變動的格子記進來
+        sim.watchers.append(self.log)
+        self.rebuild()
+
+    def close(self):
+        """不再跟著 sim 更新。"""
+        # 用 is 比對：空的 list 彼此相等，remove() 可能拿掉別人的
+        self.sim.watchers[:] = [log for log in self.sim.watchers if log is not self.log]
+
+    # ────────────────────────────────────────────────
+    # 圖
+    # ────────────────────────────────────────────────
+    def targets(self, c):
+        """從 c 往上、下、左、右（DIR_LIST 順序）踏到的格子，含上下左右相通。"""
+        W, C = self.W, self.C
+        x = c % W
+        return (c - W if c >= W else c - W + C,
+                c + W if c + W < C else c + W - C,
+                c - 1 if x else c + W - 1,
+                c + 1 if x < W - 1 else c - x)
+
+    def succ(self, v):
+        """蛇頭在 v 時，走一步之後可能在的格子。"""
+        out = []
+        for t in self.targets(v):
+            e = self.exit_of.get(t)
+            if e is not None:
+                out.append(e)
+            elif self.state[t] != WALL:
+                out.append(t)
+        return out
+
+    def pred(self, u, was_open=False):
+        """走一步會到 u 的格子（succ 的反向）。was_open：u 剛變成牆，列出原本走得到它的格子。"""
+        out = []
+        if u not in self.exit_of and (was_open or self.state[u] != WALL):
+            out.extend(self.targets(u))     # 上下左右是對稱的
+        for p in self.entries.get(u, ()):
+            out.extend(self.targets(p))
+        return out
+
+    # ────────────────────────────────────────────────
+    # 建立 / 更新
+    # ────────────────────────────────────────────────
+    def rebuild(self):
+        """整張重算（多起點 BFS，從所有食物往回走）。"""
+        W, C = self.W, self.C
+        state = self.state
+        self.dist = dist = array("i", [INF]) * C
+        queue = deque()
+        c = state.find(GOAL)
+        while c >= 0:
+            dist[c] = 0
+            queue.append(c)
+            c = state.find(GOAL, c + 1)
+        portals = self.exit_of.keys() | self.entries.keys()
+        while queue:
+            u = queue.popleft()
+            d = dist[u] + 1
+            if u in portals:
+                vs = self.pred(u)
+            else:
+                # 一般格子的 pred 就是上下左右（這裡是熱迴圈，直接展開 targets）
+                x = u % W
+                vs = (u - W if u >= W else u - W + C,
+                      u + W if u + W < C else u + W - C,
+                      u - 1 if x else u + W - 1,
+                      u + 1 if x < W - 1 else u - x)
+            for v in vs:
+                if dist[v] == INF and state[v] != WALL:
+                    dist[v] = d
+                    queue.append(v)
+
+    def update(self):
+        """套用 sim 上次到現在的佔用變動，回傳重算了幾格。"""
+        if not self.log:
+            return 0
+        cells = set(self.log)
+        del self.log[:]
+        occ, state, dist = self.sim.occ, self.state, self.dist
+        raised, lowered = [], []
+        for c in cells:
+            old, new = state[c], STATE[occ[c]]
+            if old == new:
+                continue
+            state[c] = new
+            if old == GOAL or new == WALL:
+                raised.append(c)        # 少了食物 / 多了牆：附近的距離只會變長
+            else:
+                lowered.append(c)       # 多了食物 / 少了牆：附近的距離只會變短
+        if not raised and not lowered:
+            return 0
+        if len(raised) + len(lowered) > REBUILD_CHANGES:
+            self.rebuild()
+            return self.C
+
+        # 1) 找出最短路一定經過變長那些格子的區域，整區先設成 INF。
+        #    依舊距離由小到大處理，輪到某格時比它近一步的格子都已經判定完了
+        raised = set(raised)
+        affected = set()
+        queue = deque()
+        for d, v in _by_distance([(dist[c], c) for c in raised if dist[c] < INF], queue):
+            if v in affected:
+                continue
+            if v not in raised and (state[v] == GOAL or any(
+                    dist[w] == d - 1 and w not in affected for w in self.succ(v))):
+                continue        # 還有別條一樣短的路
+            affected.add(v)
+            if len(affected) > self.C // 8:
+                self.rebuild()      # 逐格修正比 BFS 慢好幾倍，範圍大就整張重算
+                return self.C
+            dist[v] = INF
+            for u in self.pred(v, was_open=True):
+                if dist[u] == d + 1:
+                    queue.append((d + 1, u))
+        for c in raised:
+            dist[c] = INF
+
+        # 2) 受影響的格子從旁邊還有效的距離重新估，再跟新出現的食物 / 空格一起往外放寬
+        seeds = []
+        for v in affected | set(lowered):
+            if state[v] == WALL:
+                continue
+            if state[v] == GOAL:
+                d = 0
+            else:
+                d = min((dist[w] for w in self.succ(v)), default=INF) + 1
+            if d < dist[v]:
+                dist[v] = d
+                seeds.append((d, v))
+        queue = deque()
+        for d, u in _by_distance(seeds, queue):
+            if d != dist[u]:
+                continue
+            for v in self.pred(u):
+                if dist[v] > d + 1 and state[v] != WALL:
+                    dist[v] = d + 1
+                    queue.append((d + 1, v))
+        return len(affected) + len(lowered)
+
+
+# ────────────────────────────────────────────────────────────────────
+# 自動駕駛
+# ────────────────────────────────────────────────────────────────────
+class Autopilot:
+    """每個 tick 呼叫 act()，把回傳的方向交給 sim.turn()（或 step(action)）。"""
+
+    def __init__(self, sim):
+        self.sim = sim
+        self.field = DistanceField(sim)
+
+    def close(self):
+        self.field.close()
+
+    def act(self):
+        """這個 tick 要按的方向（混亂狀態已經反過來按）；None = 維持原方向。"""
+        s, f = self.sim, self.field
+        if s.game_over:
+            return None
+        f.update()
+
+        n = len(s.snake)
+        occ, body = s.occ, s.body_count
+        back = (-s.direction[0], -s.direction[1])
+        free_at = None
+        best = best_key = None
+        for d, t in zip(DIR_LIST, f.targets(s.cell_id(s.snake[0]))):
+            if d == back and not s.waiting_start:
+                continue        # 不能直接回頭
+            land = f.exit_of.get(t)
+            if land is None:
+                if occ[t] & DEADLY or (body[t] and n > 2):
+                    continue
+                land = t
+            if free_at is None:
+                free_at = self.body_free_at()
+            space = self.space(land, n, free_at)
+            penalty = land == t and bool(occ[t] & AVOID)
+            # 先求不會被關死，再避開炸彈 / 假食物，最後才是離食物近、空間大
+            key = (space < n, penalty, f.dist[land], -space)
+            if best_key is None or key < best_key:
+                best, best_key = d, key
+
+        if best is None:
+            return None         # 四面都是死路
+        if s.waiting_start or best != s.direction:
+            # 🌀 混亂時 turn() 會把方向反過來，先反一次抵銷
+            return (-best[0], -best[1]) if s.confuse_remaining > 0 else best
+        return None
+
+    def body_free_at(self):
+        """{格子: 第幾步起可以走進去}：尾巴那節下一步還在（碰撞判定在縮尾巴之前）。"""
+        s = self.sim
+        n, grow = len(s.snake), s.pending_growth
+        free_at = {}
+        for j, p in enumerate(s.snake):
+            c = s.cell_id(p)
+            free_at[c] = max(free_at.get(c, 0), n - j + grow + 1)
+        return free_at
+
+    def space(self, start, limit, free_at):
+        """從 start（下一步的蛇頭，第 1 步）出發走得到幾格，數到 limit 就停。"""
+        f, occ = self.field, self.sim.occ
+        seen = {start}
+        queue = deque([(start, 1)])
+        while queue and len(seen) < limit:
+            v, t = queue.popleft()
+            for w in f.targets(v):
+                e = f.exit_of.get(w)
+                if e is not None:
+                    w = e
+                elif occ[w] & DEADLY or free_at.get(w, 0) > t + 1:
+                    continue
+                if w not in seen:
+                    seen.add(w)
+                    queue.append((w, t + 1))
+        return len(seen)
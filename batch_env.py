@@ -0,0 +1,794 @@
+"""
+BatchSnakeEnv – 用 NumPy 一次推進 N 局貪食蛇
+=============================================
+給機器人訓練、平衡測試用。每局的盤面存成 NumPy 陣列（佔用旗標平面、空格索引、
+蛇身環形緩衝、方向、計時），`step()` 把 `SnakeSim.update()` 的規則改寫成整批陣列運算。
+
+* 地圖生成（reset）直接沿用 `SnakeSim.reset()`，每局各自持有一個 `random.Random(seed)`；
+* 空格索引（FreeCells）的加入 / 移除順序和 SnakeSim 完全相同，計時生成時
+  到期的局一起抽樣、各用自己的 RNG，所以同樣的 seed + 同樣的操作序列，
+  結果會和 `SnakeSim` 逐格相同；
+* 每局 RNG 的 MT19937 狀態搬進 NumPy（`BatchMT`），整批一起抽，和 `random.Random` 逐位元相同；
+  只有 reset（地圖生成還走 `SnakeSim`）前後才把狀態和該局的 `random.Random` 同步。
+
+```python
+env = BatchSnakeEnv(make_config(3), n=4096, seed=0)
+actions = np.random.randint(-1, 4, size=env.n)   # -1 = 不轉向，0~3 = DIR_LIST
+events = env.step(actions)
+```
+
+需要 numpy（`pip install numpy`）。
+"""
+import numpy as np
+
+from snake_core import (
+    SnakeSim, make_config, ms_to_ticks, timer_periods, DIR_LIST, ITEM_FLAGS, SPAWN_RULES,
+    OCC_OBSTACLE, OCC_FOOD, OCC_BOOST, OCC_BOMB, OCC_CONFUSE, OCC_FAKE, OCC_INVISIBLE,
+    FPS_BASE, BOMB_EFFECT, BOOST_DURATION, BOOST_FPS_INC, CONFUSE_DURATION,
+)
+
+# step() 回傳的每局事件旗標
+EV_FOOD      = 1 << 0
+EV_BOMB      = 1 << 1
+EV_BOOST     = 1 << 2
+EV_CONFUSE   = 1 << 3
+EV_PORTAL    = 1 << 4
+EV_FAKE_FOOD = 1 << 5
+EV_GAME_OVER = 1 << 6
+
+_DIR_DX = np.array([d[0] for d in DIR_LIST], dtype=np.int64)
+_DIR_DY = np.array([d[1] for d in DIR_LIST], dtype=np.int64)
+
+# MT19937（random.Random 用的產生器）參數
+_MT_N, _MT_M = 624, 397
+_MT_MATRIX = np.uint32(0x9908B0DF)
+_MT_UPPER, _MT_LOWER = np.uint32(0x80000000), np.uint32(0x7FFFFFFF)
+
+# 障礙以外的旗標：有這些旗標的格子才進道具索引（障礙另外記在 obst）
+_NOT_OBSTACLE = np.uint16(0xFFFF ^ OCC_OBSTACLE)
+
+# 需要數量的道具（計時生成的上限判斷）
+_COUNTED = {"food": OCC_FOOD, "bombs": OCC_BOMB, "boosts": OCC_BOOST, "confuses": OCC_CONFUSE}
+
+
+def _rank(rows, n):
+    """rows 已排序、值在 0 .. n-1：每筆是同一個值裡的第幾筆（0 起算）。"""
+    return np.arange(rows.size) - np.searchsorted(rows, np.arange(n))[rows]
+
+
+def _mt_twist(mt):
+    """MT19937 的 twist：回傳 mt（每列 624 個 word）的下一個區塊。"""
+    nxt = np.empty_like(mt)
+
+    def mix(lo, hi, nxt_lo):
+        # 第 k 格 = 第 k + 397 格（舊的，或新的第 k - 227 格）^ (第 k 格高位 | 第 k + 1 格低位) 的轉換
+        y = (mt[:, lo:hi] & _MT_UPPER) | (mt[:, lo + 1:hi + 1] & _MT_LOWER)
+        src = mt[:, lo + _MT_M:hi + _MT_M] if nxt_lo is None else nxt[:, nxt_lo:nxt_lo + hi - lo]
+        nxt[:, lo:hi] = src ^ (y >> 1) ^ np.where(y & 1, _MT_MATRIX, np.uint32(0))
+
+    # 後面的格子要用到前面新算好的，所以分三段；最後一格的低位來自新的第 0 格
+    step = _MT_N - _MT_M
+    mix(0, step, None)
+    mix(step, 2 * step, 0)
+    mix(2 * step, _MT_N - 1, step)
+    y = (mt[:, -1] & _MT_UPPER) | (nxt[:, 0] & _MT_LOWER)
+    nxt[:, -1] = nxt[:, _MT_M - 1] ^ (y >> 1) ^ np.where(y & 1, _MT_MATRIX, np.uint32(0))
+    return nxt
+
+
+def _mt_temper(y):
+    y = y ^ (y >> 11)
+    y ^= (y << 7) & np.uint32(0x9D2C5680)
+    y ^= (y << 15) & np.uint32(0xEFC60000)
+    return y ^ (y >> 18)
+
+
+class BatchMT:
+    """N 個 MT19937 狀態，一次替一批局抽數，結果和每局各自的 random.Random 逐位元相同。
+    mt[i, :624] 是第 i 局目前的區塊、mt[i, 624:] 是 twist 好的下一個區塊，out 是它們 temper 過的輸出，
+    pos[i] 是下一個要用的 word，所以一次可以往後看最多 624 個 word，整串拒絕取樣一起算，不必一輪一輪抽。
+    狀態可以和 random.Random.getstate() 來回同步（load / store）。"""
+
+    def __init__(self, n):
+        self.mt = np.zeros((n, 2 * _MT_N), dtype=np.uint32)
+        self.out = np.zeros((n, 2 * _MT_N), dtype=np.uint32)
+        self.pos = np.full(n, _MT_N, dtype=np.int64)
+        self._out = self.out.reshape(-1)
+
+    def load(self, i, rng):
+        """從 random.Random 讀進第 i 局的狀態。"""
+        state = rng.getstate()[1]
+        self.mt[i, :_MT_N] = state[:_MT_N]
+        self.mt[i, _MT_N:] = _mt_twist(self.mt[i:i + 1, :_MT_N])[0]
+        self.out[i] = _mt_temper(self.mt[i])
+        self.pos[i] = state[_MT_N]
+        self._advance(np.array([i]))
+
+    def store(self, i, rng):
+        """把第 i 局的狀態寫回 random.Random（SnakeSim 沒用到 gauss，gauss_next 不保留）。"""
+        rng.setstate((3, tuple(self.mt[i, :_MT_N].tolist()) + (int(self.pos[i]),), None))
+
+    def _advance(self, g):
+        """目前的區塊用完的局換到下一個區塊（等同 random.Random 用完 624 個 word 時的 twist）。"""
+        t = g[self.pos[g] >= _MT_N]
+        if t.size:
+            nxt = self.mt[t, _MT_N:]
+            self.mt[t, :_MT_N] = nxt
+            self.mt[t, _MT_N:] = nxt = _mt_twist(nxt)
+            self.out[t, :_MT_N] = self.out[t, _MT_N:]
+            self.out[t, _MT_N:] = _mt_temper(nxt)
+            self.pos[t] -= _MT_N
+
+    def _below(self, g, n):
+        """每局各抽一次 randrange(n)：往後看 8 個 word，第一個 < n 的就是，都不是的局再抽一次。"""
+        pos = self.pos[g]
+        shift = (32 - np.frexp(n)[1]).astype(np.uint32)
+        # word >> shift < n ⇔ word < n << shift，只有選到的那個才要位移
+        x = self._out[(g * (2 * _MT_N) + pos)[:, None] + np.arange(8)]
+        ok = x < (n << shift)[:, None]
+        j = ok.argmax(axis=1)
+        rows = np.arange(g.size)
+        out = (x[rows, j] >> shift).astype(np.int64)
+        got = ok[rows, j]
+        pos += np.where(got, j + 1, 8)
+        self.pos[g] = pos
+        if (pos >= _MT_N).any():
+            self._advance(g)
+        if not got.all():
+            out[~got] = self._below(g[~got], n[~got])
+        return out
+
+    def randbelow(self, g, n, count):
+        """第 i 列等同第 g[i] 局連續呼叫 rng.randrange(n[i] - k)，k = 0 .. count[i]-1
+        （g 不可重複，n[i] - k ≥ 1）；回傳 (len(g), max(count))，用不到的位置是 0。
+
+        randrange(n) 是 getrandbits(n.bit_length()) 的拒絕取樣。一段裡 n 的位數不變時，取完位數的 word
+        < n - count + 1 一定收、≥ n 一定不收，只有落在中間的要看前面收了幾個，這些（很少）再依序判斷。"""
+        out = np.zeros((g.size, int(count.max(initial=0))), dtype=np.int64)
+        if out.shape[1] <= 1:
+            # 每局只抽幾次（最常見）：一輪一輪抽，每輪每局一次
+            for k in range(out.shape[1]):
+                act = np.flatnonzero(count > k)
+                out[act, k] = self._below(g[act], n[act] - k)
+            return out
+        done = np.zeros(g.size, dtype=np.int64)
+        rows = np.arange(g.size)
+        while True:
+            act = rows[done < count]
+            if not act.size:
+                return out
+            ga, k0 = g[act], done[act]
+            hi = n[act] - k0
+            bits = np.frexp(hi)[1]
+            # 一段只抽到 n 的位數改變之前
+            left = np.minimum(count[act] - k0, hi - (1 << (bits - 1)) + 1)
+            lo = hi - left + 1
+            width = min(_MT_N, 2 * int(left.max()) + 16)
+            pos = self.pos[ga]
+            x = self._out[(ga * 2 * _MT_N + pos)[:, None] + np.arange(width)]
+            x >>= (32 - bits).astype(np.uint32)[:, None]
+            cand = np.flatnonzero(x < hi[:, None])
+            r = cand // width
+            cx = x.ravel()[cand].astype(np.int64)
+            # 先當候選全收，k = 同一局前面有幾個候選
+            k = _rank(r, act.size)
+            amb = np.flatnonzero(cx >= lo[r])
+            if amb.size:
+                keep = np.ones(cand.size, dtype=bool)
+                ra = r[amb]
+                nth = _rank(ra, act.size)
+                skipped = np.zeros(act.size, dtype=np.int64)
+                for s in range(int(nth.max()) + 1):
+                    e = amb[nth == s]
+                    re = r[e]
+                    bad = cx[e] >= hi[re] - np.minimum(k[e] - skipped[re], left[re] - 1)
+                    keep[e[bad]] = False
+                    skipped[re[bad]] += 1
+                cand, r, cx = cand[keep], r[keep], cx[keep]
+                k = _rank(r, act.size)
+            use = k < left[r]
+            cand, r, cx, k = cand[use], r[use], cx[use], k[use]
+            out[act[r], k0[r] + k] = cx
+            # 收滿的局用到最後一個被收的 word 為止，沒收滿的局整段都用掉了
+            end = np.full(act.size, width)
+            full = k == left[r] - 1
+            end[r[full]] = cand[full] % width + 1
+            self.pos[ga] = pos + end
+            self._advance(ga)
+            done[act] = k0 + np.bincount(r, minlength=act.size)
+
+
+class BatchSnakeEnv:
+    def __init__(self, config=None, n=1024, seed=0, seeds=None):
+        # map_check 關掉：移動障礙是整批陣列運算，不做 SnakeSim 那種逐格的連通檢查；
+        # 傳送門冷卻、出口方向也不支援（傳送門只照配對跳）
+        self.config = dict(config if config is not None else make_config(), tick_timers=True, map_check=False,
+                           portal_cooldown=0, portal_dirs=False)
+        cfg = self.config
+        if cfg.get("walls"):
+            raise ValueError("BatchSnakeEnv 不支援固定牆（walls）：移動障礙是整批重抽")
+        self.n = n
+        self.W, self.H = cfg["grid_w"], cfg["grid_h"]
+        self.cells = self.W * self.H
+        self.boss = cfg["boss"]
+        self.timer_ticks = {name: ms_to_ticks(ms) for name, ms in timer_periods(cfg).items()}
+
+        if seeds is None:
+            seeds = [seed + i for i in range(n)] if seed is not None else [None] * n
+        # 每局一個 SnakeSim：負責 reset 的地圖生成，並提供該局的 RNG
+        self.sims = [SnakeSim(cfg, s) for s in seeds]
+        # 每局 RNG 的狀態搬到 NumPy，計時生成整批抽；sims[i].rng 只在同步回去之後才用
+        self.rng = BatchMT(n)
+        for i, sim in enumerate(self.sims):
+            self.rng.load(i, sim.rng)
+
+        N, C = n, self.cells
+        cell_t = np.int16 if C < 2**15 else np.int32
+        # 蛇身：環形緩衝，存格子編號 y*W+x；hpos / tpos = 蛇頭 / 蛇尾的位置，
+        # 蛇頭往 hpos + dpos 長、蛇尾也往 dpos 收（dpos = ±1），吃食物頭尾互換只要對調、dpos 變號
+        self.cap = C + 1
+        self.body = np.zeros((N, self.cap), dtype=cell_t)
+        self.hpos = np.zeros(N, dtype=np.int64)
+        self.tpos = np.zeros(N, dtype=np.int64)
+        self.dpos = np.zeros(N, dtype=np.int64)
+        self.length = np.zeros(N, dtype=np.int64)
+
+        # 佔用：旗標平面（OCC_*）+ 蛇身計數，和 SnakeSim.occ / body_count 相同
+        self.occ = np.zeros((N, C), dtype=np.uint16)
+        self.body_count = np.zeros((N, C), dtype=np.uint16)
+        # 空格索引：pool[:nfree] 是空格、ppos 反查位置（同 FreeCells）
+        self.pool = np.zeros((N, C), dtype=cell_t)
+        self.ppos = np.zeros((N, C), dtype=cell_t)
+        self.nfree = np.zeros(N, dtype=np.int64)
+        # 道具索引：有障礙以外旗標（道具 / 傳送門）的格子，item[:nitem] + ipos 反查，
+        # 計時生成 / 重放只看這些格子（數量很少），不掃整個盤面
+        self.item = np.zeros((N, C), dtype=cell_t)
+        self.ipos = np.zeros((N, C), dtype=cell_t)
+        self.nitem = np.zeros(N, dtype=np.int64)
+        # 障礙格：obst[:nobst]（順序不重要）；每次移動都是整批收掉再重抽，不用反查
+        self.obst = np.zeros((N, max(self.sims[0].moving_obstacles, cfg["obst_count"])), dtype=cell_t)
+        self.nobst = np.zeros(N, dtype=np.int64)
+        # 同一塊記憶體的一維檢視：熱路徑用「局 * 格數 + 格子」一次索引，比 [g, cell] 兩個陣列快
+        self._occ, self._bc, self._pool, self._ppos, self._item, self._ipos = (
+            a.reshape(-1) for a in (self.occ, self.body_count, self.pool, self.ppos, self.item, self.ipos))
+        self._body = self.body.reshape(-1)
+
+        self.portal_at = np.full((N, C), -1, dtype=np.int8)
+        self.portal_cells = np.zeros((N, max(1, 2 * cfg["portal_pairs"])), dtype=np.int64)
+        self.portal_n = np.zeros(N, dtype=np.int64)
+        self._portal = self.portal_at.reshape(-1)
+
+        # 每局狀態
+        self.dx = np.zeros(N, dtype=np.int64)
+        self.dy = np.zeros(N, dtype=np.int64)
+        self.waiting = np.ones(N, dtype=bool)
+        self.game_over = np.zeros(N, dtype=bool)
+        self.pending_growth = np.zeros(N, dtype=np.int64)
+        self.age = np.zeros(N, dtype=np.int64)
+        self.tick = np.zeros(N, dtype=np.int64)
+        self.base_fps = np.zeros(N, dtype=np.int64)
+        self.fps = np.zeros(N, dtype=np.int64)
+        self.boost_remaining = np.zeros(N, dtype=np.int64)
+        self.confuse_remaining = np.zeros(N, dtype=np.int64)
+        self.counts = {kind: np.zeros(N, dtype=np.int64) for kind in _COUNTED}
+        self.events = np.zeros(N, dtype=np.uint8)
+
+        for i in range(N):
+            self._load(i)
+
+    # ────────────────────────────────────────────────
+    # 初始化 / 重開
+    # ────────────────────────────────────────────────
+    def reset(self, idx=None):
+        """重開指定的局（預設全部）；和 SnakeSim.reset() 一樣沿用該局的 RNG。"""
+        if idx is None:
+            idx = range(self.n)
+        elif isinstance(idx, np.ndarray) and idx.dtype == bool:
+            idx = np.flatnonzero(idx)
+        for i in idx:
+            i = int(i)
+            self.rng.store(i, self.sims[i].rng)
+            self.sims[i].reset()
+            self.rng.load(i, self.sims[i].rng)
+            self._load(i)
+
+    def _load(self, i):
+        sim = self.sims[i]
+        cid = sim.cell_id
+
+        self.occ[i] = sim.occ
+        self.body_count[i] = np.frombuffer(sim.body_count, dtype=np.uint8)
+        nfree = len(sim.free)
+        self.pool[i, :nfree] = sim.free.cells
+        self.ppos[i] = sim.free.pos
+        self.nfree[i] = nfree
+        items = np.flatnonzero(self.occ[i] & _NOT_OBSTACLE)
+        self.item[i, :items.size] = items
+        self.ipos[i, items] = np.arange(items.size)
+        self.nitem[i] = items.size
+        obst = np.flatnonzero(self.occ[i] & OCC_OBSTACLE)
+        if obst.size > self.obst.shape[1]:
+            self.obst = np.pad(self.obst, ((0, 0), (0, obst.size - self.obst.shape[1])))
+        self.obst[i, :obst.size] = obst
+        self.nobst[i] = obst.size
+
+        snake = [cid(p) for p in sim.snake]
+        self.body[i, :len(snake)] = snake
+        self.hpos[i], self.tpos[i], self.dpos[i] = 0, len(snake) - 1, -1
+        self.length[i] = len(snake)
+
+        portals = [cid(p) for p in sim.portals]
+        self.portal_at[i] = -1
+        self.portal_n[i] = len(portals)
+        self.portal_cells[i, :len(portals)] = portals
+        for k, c in enumerate(portals):
+            self.portal_at[i, c] = k
+
+        self.dx[i], self.dy[i] = sim.direction
+        self.waiting[i] = True
+        self.game_over[i] = False
+        self.pending_growth[i] = 0
+        self.age[i] = 0
+        self.tick[i] = 0
+        self.base_fps[i] = self.fps[i] = FPS_BASE
+        self.boost_remaining[i] = 0
+        self.confuse_remaining[i] = 0
+        for kind in _COUNTED:
+            self.counts[kind][i] = len(getattr(sim, kind))
+
+    # ────────────────────────────────────────────────
+    # 佔用索引維護（g 為局編號陣列，不可重複；操作順序與 SnakeSim 相同）
+    # ────────────────────────────────────────────────
+    def _empty(self, key):
+        return (self._occ[key] == 0) & (self._bc[key] == 0)
+
+    def _index_add(self, cells, pos, size, g, cell):
+        n = size[g]
+        cells[g * self.cells + n] = cell
+        pos[g * self.cells + cell] = n
+        size[g] = n + 1
+
+    def _index_remove(self, cells, pos, size, g, cell):
+        base = g * self.cells
+        k = pos[base + cell]
+        last = size[g] - 1
+        moved = cells[base + last]
+        cells[base + k] = moved
+        pos[base + moved] = k
+        size[g] = last
+
+    def _pool_add(self, g, cell):
+        self._index_add(self._pool, self._ppos, self.nfree, g, cell)
+
+    def _pool_remove(self, g, cell):
+        self._index_remove(self._pool, self._ppos, self.nfree, g, cell)
+
+    def _pool_extend(self, g, rows, cell):
+        """每局依序把 cell 接到空格索引後面：rows 是 cell 對應到 g 的第幾列，需已排序。"""
+        rank = _rank(rows, g.size)
+        gg = g[rows]
+        pos = self.nfree[gg] + rank
+        self._pool[gg * self.cells + pos] = cell
+        self._ppos[gg * self.cells + cell] = pos
+        self.nfree[g] += np.bincount(rows, minlength=g.size)
+
+    def _unmark(self, g, cell, flag):
+        key = g * self.cells + cell
+        occ = self._occ[key] & ~np.uint16(flag)
+        self._occ[key] = occ
+        gone = (occ & _NOT_OBSTACLE) == 0
+        self._index_remove(self._item, self._ipos, self.nitem, g[gone], cell[gone])
+        e = (occ == 0) & (self._bc[key] == 0)
+        self._pool_add(g[e], cell[e])
+
+    def _take(self, g, cell, flag, kind=None):
+        self._unmark(g, cell, flag)
+        if kind:
+            self.counts[kind][g] -= 1
+
+    # ────────────────────────────────────────────────
+    # 環形緩衝操作
+    # ────────────────────────────────────────────────
+    def _head(self, g):
+        return self._body[g * self.cap + self.hpos[g]].astype(np.int64)
+
+    def _second(self, g):
+        return self._body[g * self.cap + (self.hpos[g] - self.dpos[g]) % self.cap].astype(np.int64)
+
+    def _push_head(self, g, cell):
+        key = g * self.cells + cell
+        e = self._empty(key)
+        self._pool_remove(g[e], cell[e])
+        h = (self.hpos[g] + self.dpos[g]) % self.cap
+        self.hpos[g] = h
+        self._body[g * self.cap + h] = cell
+        self._bc[key] += 1
+        self.length[g] += 1
+
+    def _pop_tail(self, g):
+        t = self.tpos[g]
+        cell = self._body[g * self.cap + t].astype(np.int64)
+        key = g * self.cells + cell
+        self._bc[key] -= 1
+        e = self._empty(key)
+        self._pool_add(g[e], cell[e])
+        self.tpos[g] = (t + self.dpos[g]) % self.cap
+        self.length[g] -= 1
+
+    def _snake_cells(self, i):
+        pos = (self.hpos[i] - self.dpos[i] * np.arange(self.length[i])) % self.cap
+        return self.body[i, pos].astype(np.int64)
+
+    def _body_index(self, g, j):
+        """第 j 節（0 = 蛇頭）在環形緩衝裡的位置；j 可以是 (len(g), k) 的矩陣。"""
+        hpos, dpos = self.hpos[g], self.dpos[g]
+        if j.ndim == 2:
+            hpos, dpos = hpos[:, None], dpos[:, None]
+        return (hpos - dpos * j) % self.cap
+
+    def _cut_head(self, g, k):
+        """snake = snake[k:]（各局從頭那端丟掉 k 格）。
+        一格一格拿掉時，格子在最後一次被拿掉、變成空的那一刻加進空格索引，所以照「最後出現的位置」排。"""
+        rows, j = np.nonzero(np.arange(int(k.max())) < k[:, None])
+        gg = g[rows]
+        cells = self._body[gg * self.cap + self._body_index(gg, j)].astype(np.int64)
+        keys = gg * self.cells + cells
+        uniq, first, times = np.unique(keys[::-1], return_index=True, return_counts=True)
+        self._bc[uniq] -= times.astype(self._bc.dtype)
+        # (局, 節) 依序排好，每個格子留最後一次出現的那一筆
+        last = np.sort(keys.size - 1 - first)
+        last = last[self._empty(keys[last])]
+        self._pool_extend(g, rows[last], cells[last])
+        self.hpos[g] = (self.hpos[g] - self.dpos[g] * k) % self.cap
+        self.length[g] -= k
+
+    # ────────────────────────────────────────────────
+    # 核心更新
+    # ────────────────────────────────────────────────
+    def step(self, actions=None):
+        """推進一個 tick。actions：長度 n，-1 = 不轉向、0~3 = DIR_LIST 索引。
+        回傳每局的事件旗標（EV_*）。"""
+        self.events = np.zeros(self.n, dtype=np.uint8)
+        if actions is not None:
+            self._turn(np.asarray(actions))
+
+        g = np.flatnonzero(~self.game_over & ~self.waiting)
+        if g.size:
+            self._update(g)
+
+        self.tick += 1
+        live = np.flatnonzero(~self.game_over)
+        tick = self.tick[live]
+        for name, period in self.timer_ticks.items():
+            due = live[tick % period == 0]
+            if due.size:
+                self._fire(name, due)
+        return self.events
+
+    def _turn(self, actions):
+        g = np.flatnonzero(actions >= 0)
+        if not g.size:
+            return
+        a = actions[g]
+        ndx, ndy = _DIR_DX[a], _DIR_DY[a]
+        # 🌀 混亂狀態上下左右反轉
+        conf = self.confuse_remaining[g] > 0
+        ndx = np.where(conf, -ndx, ndx)
+        ndy = np.where(conf, -ndy, ndy)
+        ok = self.waiting[g] | (ndx != -self.dx[g]) | (ndy != -self.dy[g])
+        g, ndx, ndy = g[ok], ndx[ok], ndy[ok]
+        self.dx[g] = ndx
+        self.dy[g] = ndy
+        self.waiting[g] = False
+
+    def _update(self, g):
+        W, H = self.W, self.H
+
+        # FPS 自增、Boost / 混亂倒數
+        self.age[g] += 1
+        sim = self.sims[0]
+        if self.config["speed_increment"]:
+            up = g[self.age[g] % sim.speed_every == 0]
+            self.base_fps[up] += sim.speed_step
+            if sim.speed_max:
+                self.base_fps[up] = np.minimum(self.base_fps[up], sim.speed_max)
+            up = up[self.boost_remaining[up] == 0]
+            self.fps[up] = self.base_fps[up]
+        b = g[self.boost_remaining[g] > 0]
+        self.boost_remaining[b] -= 1
+        b = b[self.boost_remaining[b] == 0]
+        self.fps[b] = self.base_fps[b]
+        c = g[self.confuse_remaining[g] > 0]
+        self.confuse_remaining[c] -= 1
+
+        # 計算下一格 + 邊界對側傳送
+        head = self._head(g)
+        nx = head % W + self.dx[g]
+        ny = head // W + self.dy[g]
+        nx = np.where(nx < 0, W - 1, np.where(nx >= W, 0, nx))
+        ny = np.where(ny < 0, H - 1, np.where(ny >= H, 0, ny))
+        cell = ny * W + nx
+
+        # 傳送門：配對和 SnakeSim.link_portals 相同（paired_portals：idx ^ 1，舊設定：portals[1 - idx]）
+        pidx = self._portal[g * self.cells + cell].astype(np.int64)
+        tp = pidx >= 0
+        if tp.any():
+            gp = g[tp]
+            if self.config.get("paired_portals"):
+                other = pidx[tp] ^ 1
+            else:
+                other = (1 - pidx[tp]) % self.portal_n[gp]
+            self._move(gp, self.portal_cells[gp, other])
+            self.events[gp] |= EV_PORTAL
+            g, cell = g[~tp], cell[~tp]
+
+        key = g * self.cells + cell
+        occ = self._occ[key]
+
+        # 碰撞：障礙
+        hit = (occ & OCC_OBSTACLE) != 0
+        if hit.any():
+            self._die(g[hit])
+            g, cell, key, occ = g[~hit], cell[~hit], key[~hit], occ[~hit]
+
+        # 碰撞：自己（snake = snake[idx:]，idx = 從頭數來第一個是這格的節）
+        hit = (self._bc[key] > 0) & (self.length[g] > 2)
+        if hit.any():
+            gh = g[hit]
+            j = np.arange(int(self.length[gh].max()))
+            body = self._body[(gh * self.cap)[:, None] + self._body_index(gh, j[None, :])]
+            same = (body == cell[hit, None]) & (j < self.length[gh, None])
+            self._cut_head(gh, np.argmax(same, axis=1))
+            self._die(gh)
+            g, cell, occ = g[~hit], cell[~hit], occ[~hit]
+
+        # 炸彈：扣掉尾巴
+        hit = (occ & OCC_BOMB) != 0
+        if hit.any():
+            gb = g[hit]
+            self._take(gb, cell[hit], OCC_BOMB, "bombs")
+            self.events[gb] |= EV_BOMB
+            drop = np.where(self.length[gb] > BOMB_EFFECT, BOMB_EFFECT, self.length[gb] - 1)
+            for k in range(1, BOMB_EFFECT + 1):
+                self._pop_tail(gb[drop >= k])
+
+        # 移動蛇
+        self._move(g, cell)
+
+        # 食物：長一格並頭尾互換
+        hit = (occ & OCC_FOOD) != 0
+        if hit.any():
+            gf = g[hit]
+            self._take(gf, cell[hit], OCC_FOOD, "food")
+            self.pending_growth[gf] += 1
+            self.hpos[gf], self.tpos[gf] = self.tpos[gf], self.hpos[gf]
+            self.dpos[gf] = -self.dpos[gf]
+            self.events[gf] |= EV_FOOD
+            gf = gf[self.length[gf] >= 2]
+            h, s = self._head(gf), self._second(gf)
+            self.dx[gf] = h % W - s % W
+            self.dy[gf] = h // W - s // W
+
+        hit = (occ & OCC_CONFUSE) != 0
+        if hit.any():
+            gc = g[hit]
+            self._take(gc, cell[hit], OCC_CONFUSE, "confuses")
+            self.confuse_remaining[gc] = CONFUSE_DURATION
+            self.events[gc] |= EV_CONFUSE
+
+        hit = (occ & OCC_BOOST) != 0
+        if hit.any():
+            gb = g[hit]
+            self._take(gb, cell[hit], OCC_BOOST, "boosts")
+            self.boost_remaining[gb] = BOOST_DURATION
+            self.fps[gb] = self.base_fps[gb] + BOOST_FPS_INC
+            self.events[gb] |= EV_BOOST
+
+        if self.boss:
+            if sim.boss_shrink_ticks:
+                shrink = g[(self.age[g] % sim.boss_shrink_ticks == 0) & (self.length[g] > 1)]
+                self._pop_tail(shrink)
+
+            hit = (occ & OCC_FAKE) != 0
+            if hit.any():
+                gk = g[hit]
+                self._take(gk, cell[hit], OCC_FAKE)
+                # rng.randint(2, 5) = 2 + randrange(4)
+                one = np.ones(gk.size, dtype=np.int64)
+                penalty = 2 + self.rng.randbelow(gk, 4 * one, one)[:, 0]
+                length = self.length[gk]
+                drop = np.where(length > penalty, penalty, length - 1)
+                for k in range(1, int(drop.max()) + 1):
+                    self._pop_tail(gk[drop >= k])
+                self.events[gk] |= EV_FAKE_FOOD
+
+            hit = (occ & OCC_INVISIBLE) != 0
+            if hit.any():
+                self._die(g[hit])
+
+    def _move(self, g, cell):
+        self._push_head(g, cell)
+        grow = self.pending_growth[g] > 0
+        self.pending_growth[g[grow]] -= 1
+        self._pop_tail(g[~grow])
+
+    def _die(self, g):
+        self.game_over[g] = True
+        self.events[g] |= EV_GAME_OVER
+
+    # ────────────────────────────────────────────────
+    # 計時事件：到期的局一起抽樣，每局各用自己的 RNG
+    # ────────────────────────────────────────────────
+    def _fire(self, name, g):
+        counts = self.counts
+        if name == "bomb":
+            g = g[counts["bombs"][g] < self.config["bomb_count"]]
+            self._spawn(g, OCC_BOMB, "bombs", SPAWN_RULES["bomb"])
+        elif name == "confuse":
+            g = g[counts["confuses"][g] < self.config["confuse_count"] + self.age[g] // 300]
+            self._spawn(g, OCC_CONFUSE, "confuses", SPAWN_RULES["confuse"])
+        elif name == "food":
+            self._spawn(g, OCC_FOOD, "food", SPAWN_RULES["food"])
+        elif name == "boost":
+            g = g[counts["boosts"][g] < 1]
+            self._spawn(g, OCC_BOOST, "boosts", SPAWN_RULES["boost"])
+        elif name == "move_obstacles":
+            self._relocate_obstacles(g, np.full(g.size, self.sims[0].moving_obstacles))
+        elif name == "move_foods":
+            self._relocate(g, OCC_FOOD, "food", SPAWN_RULES["move_foods"], counts["food"][g].copy())
+        elif name == "fake_food" and self.boss:
+            self._spawn(g, OCC_FAKE, None, SPAWN_RULES["fake_food"])
+        elif name == "move_bombs" and self.boss:
+            self._relocate(g, OCC_BOMB, "bombs", SPAWN_RULES["move_bombs"], counts["bombs"][g].copy())
+        elif name == "boss_shrink" and self.boss:
+            self._pop_tail(g[self.length[g] > 1])
+
+    def _spawn(self, g, flag, kind, exclude, count=None, items=None, index=True):
+        """SnakeSim.sample_cell + place：每局抽 count 格（預設 1），沒有合法位置就跳過。
+        exclude 一定包含 flag，放下去的格子之後就不能再選，所以每抽一格候選就剛好少一格：
+        第 k 次是 randrange(total - k)，整串亂數先一次抽好，再一輪一輪放（第 s 輪是每局的第 s 格）。
+        items：呼叫端已經讀好的 (道具索引的格子, 各格 occ)，occ 為 0 的位置不算；
+        index=False：抽到的空格不進道具索引（障礙）。
+        回傳 (g, count, cells)：g 可能重排過，cells[s, i] 是 g[i] 第 s 格放在哪（s < count[i]）。"""
+        C = self.cells
+        count = np.ones(g.size, dtype=np.int64) if count is None else count
+        base = g * C
+        # 可重疊的已佔用格：只看道具索引，有東西、沒被排除，而且上面沒有蛇
+        if items is None:
+            m = int(self.nitem[g].max(initial=0))
+            icells = self.item[g, :m].astype(np.int64)
+            key = base[:, None] + icells
+            iocc = self._occ[key]
+            iocc[np.arange(m) >= self.nitem[g, None]] = 0
+        else:
+            icells, iocc = items
+            key = base[:, None] + icells
+        ok = (iocc != 0) & ((iocc & exclude | self._bc[key]) == 0)
+        nfree = self.nfree[g]
+        total = nfree + ok.sum(axis=1)
+        count = np.minimum(count, total)
+        r = self.rng.randbelow(g, total, count)
+        if kind:
+            self.counts[kind][g] += count
+
+        # 抽得多的局排前面，第 s 輪只有前 alive[s] 局還要抽
+        if g.size and count.min() != count.max():
+            order = np.argsort(-count, kind="stable")
+            g, count, base, r, nfree, ok, icells = (
+                a[order] for a in (g, count, base, r, nfree, ok, icells))
+        alive = g.size - np.cumsum(np.bincount(count, minlength=r.shape[1]))
+        cells = np.zeros((r.shape[1], g.size), dtype=np.int64)
+        pool, ppos = self._pool, self._ppos
+        tail = base + nfree - 1          # 各局空格索引最後一格的位置（一維）
+        extra = ecells = None
+        for s in range(r.shape[1]):
+            a = alive[s]
+            p, b, t = r[:a, s], base[:a], tail[:a]
+            k = b + p
+            # r ≥ 目前的空格數 ⇒ 抽到可重疊格（依格子編號排，還沒用掉的第 r - 空格數 個）
+            x = k > t
+            hit = x.any()
+            if hit:
+                if ecells is None:
+                    ecells = np.where(ok, icells, C)
+                    ecells.sort(axis=1)
+                    avail = ecells < C
+                    extra = np.zeros(cells.shape, dtype=bool)
+                xr = np.flatnonzero(x)
+                col = np.argmax(np.cumsum(avail[xr], axis=1) > (k[xr] - t[xr] - 1)[:, None], axis=1)
+                avail[xr, col] = False
+                extra[s, xr] = True
+                # 這些局底下的空格操作換成「最後一格換成自己」，什麼都不變
+                k = np.where(x, t, k)
+                p = k - b
+            # 抽到空格：FreeCells.remove 是把第 r 格換成最後一格、再丟掉最後一格
+            cells[s, :a] = pool[k]
+            moved = pool[t]
+            pool[k] = moved
+            ppos[b + moved] = p
+            if hit:
+                cells[s, xr] = ecells[xr, col]
+                t -= ~x
+            else:
+                t -= 1
+        self.nfree[g] = tail - base + 1
+        live = np.arange(r.shape[1])[:, None] < count
+        keys = base + cells
+        self._occ[keys[live]] |= flag
+        # 抽到空格的依序加進道具索引（索引內順序不重要），可重疊格本來就在裡面
+        if index and r.shape[1]:
+            if extra is not None:
+                live &= ~extra
+            slot = self.nitem[g] + np.cumsum(live, axis=0) - 1
+            added, slot = keys[live], (base + slot)[live]
+            self._item[slot] = added - (slot - slot % C)
+            self._ipos[added] = slot % C
+            self.nitem[g] += live.sum(axis=0)
+        return g, count, cells
+
+    def _relocate(self, g, flag, kind, exclude, count):
+        """SnakeSim.relocate：先依格子編號收掉舊的，再一個一個重抽。"""
+        C = self.cells
+        base = g * C
+        m = int(self.nitem[g].max(initial=0))
+        cells = self.item[g, :m].astype(np.int64)
+        key = base[:, None] + cells
+        occ = self._occ[key]
+        occ[np.arange(m) >= self.nitem[g, None]] = 0
+        # 各格互不相干，一次全部收掉；變成空的格子照 (局, 格子編號) 順序接到空格索引後面，和逐格收一樣
+        # （g 由小到大，所以「局 * 格數 + 格子」排好就是這個順序，每局的筆數不變）
+        rows, cols = np.nonzero(occ & flag)
+        old = np.sort(key[rows, cols])
+        occ &= ~np.uint16(flag)
+        self._occ[old] &= ~np.uint16(flag)
+        e = self._empty(old)
+        self._pool_extend(g, rows[e], old[e] - base[rows[e]])
+        # 道具索引：留下還有障礙以外旗標的格子（索引內順序不重要）
+        rows, cols = np.nonzero(occ & _NOT_OBSTACLE)
+        rank = _rank(rows, g.size)
+        kept = cells[rows, cols]
+        self._item[base[rows] + rank] = kept
+        self._ipos[base[rows] + kept] = rank
+        self.nitem[g] = np.bincount(rows, minlength=g.size)
+        if kind:
+            self.counts[kind][g] = 0
+        self._spawn(g, flag, kind, exclude, count, (cells, occ))
+
+    def _relocate_obstacles(self, g, count):
+        """SnakeSim.relocate_obstacles：障礙記在 obst，收掉舊的不用掃道具索引，
+        和道具重疊的格子收掉障礙之後還有別的旗標，本來就在道具索引裡，也不用動。"""
+        C = self.cells
+        base = g * C
+        m = int(self.nobst[g].max(initial=0))
+        old = self.obst[g, :m].astype(np.int64)
+        old[np.arange(m) >= self.nobst[g, None]] = C
+        old.sort(axis=1)
+        rows, cols = np.nonzero(old < C)
+        key = base[rows] + old[rows, cols]
+        occ = self._occ[key] & ~np.uint16(OCC_OBSTACLE)
+        self._occ[key] = occ
+        e = (occ == 0) & (self._bc[key] == 0)
+        self._pool_extend(g, rows[e], key[e] - base[rows[e]])
+        g, count, cells = self._spawn(g, OCC_OBSTACLE, None, SPAWN_RULES["move_obstacles"], count, index=False)
+        self.obst[g, :cells.shape[0]] = cells.T
+        self.nobst[g] = count
+
+    # ────────────────────────────────────────────────
+    # 讀回單局狀態（格式同 SnakeSim.snapshot()）
+    # ────────────────────────────────────────────────
+    def snapshot(self, i):
+        W = self.W
+        xy = lambda c: (int(c) % W, int(c) // W)
+        cells = lambda flag: {xy(c) for c in np.flatnonzero(self.occ[i] & flag)}
+        snap = {kind: cells(flag) for kind, flag in ITEM_FLAGS.items()}
+        snap.update(
+            snake=[xy(c) for c in self._snake_cells(i)],
+            direction=(int(self.dx[i]), int(self.dy[i])),
+            portals=[xy(c) for c in self.portal_cells[i, :self.portal_n[i]]],
+            age=int(self.age[i]),
+            fps=int(self.fps[i]),
+            boost_remaining=int(self.boost_remaining[i]),
+            confuse_remaining=int(self.confuse_remaining[i]),
+            game_over=bool(self.game_over[i]),
+        )
+        return snap
@@ -0,0 +1,43 @@
+"""
+自動駕駛：距離場第一次建立的時間、每個 tick 規劃（含距離場增量更新）的時間
+"""
+import time
+
+from common import LEVELS, config_for
+from snake_core import SnakeSim
+from autopilot import Autopilot
+
+
+def bench_build(report, grids):
+    """開局時整張 BFS（之後只做增量更新）。"""
+    for grid in grids:
+        sim = SnakeSim(config_for(1, False, grid), 0)
+        t0 = time.perf_counter()
+        pilot = Autopilot(sim)
+        report.result("autopilot_build", (time.perf_counter() - t0) * 1000, "ms", grid=grid)
+        pilot.close()
+
+
+def bench_plan(report, grids, ticks=2000):
+    """自動駕駛實際玩：只計 act() 的時間（含套用這段時間道具變動的增量更新），死了就重開。"""
+    for grid in grids:
+        n = ticks if grid < 500 else ticks // 10     # 大地圖整批移位時要整張重算，少跑一點
+        for name, level, boss in LEVELS:
+            sim = SnakeSim(config_for(level, boss, grid), 0)
+            pilot = Autopilot(sim)
+            spent = 0.0
+            for _ in range(n):
+                t0 = time.perf_counter()
+                action = pilot.act()
+                spent += time.perf_counter() - t0
+                sim.step(action)
+                if sim.game_over:
+                    pilot.close()
+                    sim.reset()
+                    pilot = Autopilot(sim)
+            report.result("autopilot_tick", spent / n * 1000, "ms", level=name, grid=grid)
+
+
+def run_all(report, grids, quick=False):
+    bench_build(report, grids)
+    bench_plan(report, grids, ticks=300 if quick else 2000)
@@ -0,0 +1,39 @@
+"""
+整批環境：BatchSnakeEnv.step() 的 ticks/s，需要 numpy
+只算真的有推進的局（沒死、已經開始動），死掉的局不計入，另外重開、不計時。
+"""
+import time
+
+import numpy as np
+
+from batch_env import BatchSnakeEnv
+from common import LEVELS, config_for
+
+# n × 格數 的上限（佔用平面、空格索引每局都是 W·H）；50×50 時剛好 4096 局
+MAX_CELLS = 4096 * 50 * 50
+
+
+def bench_step(report, grids, n=4096, ticks=300):
+    """隨機操作（約 10% 的 tick 轉向）；死了就 reset()，只計 step() 的時間。"""
+    for grid in grids:
+        games = min(n, MAX_CELLS // (grid * grid))
+        if games < 1:
+            continue
+        for name, level, boss in LEVELS:
+            env = BatchSnakeEnv(config_for(level, boss, grid), n=games, seed=0)
+            rng = np.random.default_rng(0)
+            spent = 0.0
+            live_ticks = 0
+            for _ in range(ticks):
+                actions = np.where(rng.random(games) < 0.1, rng.integers(0, 4, games), -1)
+                live_ticks += int(np.count_nonzero(~env.game_over & (~env.waiting | (actions >= 0))))
+                t0 = time.perf_counter()
+                env.step(actions)
+                spent += time.perf_counter() - t0
+                if env.game_over.any():
+                    env.reset(env.game_over)
+            report.result("batch_step", live_ticks / spent, "ticks/s", level=name, grid=grid, n=games)
+
+
+def run_all(report, grids, quick=False):
+    bench_step(report, grids, ticks=60 if quick else 300)
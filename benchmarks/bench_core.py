@@ -0,0 +1,150 @@
+"""
+規則核心：update() ticks/s（含大量傳送門）、spawn_* / relocate_*、reset() 地圖生成（含連通檢查）與套用現成地圖
+"""
+import random
+import time
+
+from common import LEVELS, best_of, config_for, lay_snake, serpentine
+from snake_core import SnakeSim, DIR_LIST, make_config
+
+
+def bench_tick(report, grids, ticks=20000):
+    """一般對局：隨機操作，死了就重開；只計 step() 的時間（重開另外由 bench_reset 量）。"""
+    for grid in grids:
+        for name, level, boss in LEVELS:
+            cfg = config_for(level, boss, grid)
+            sim = SnakeSim(cfg, 0)
+            rng = random.Random(0)
+
+            def run():
+                spent = 0.0
+                for _ in range(ticks):
+                    action = None
+                    if rng.random() < 0.1:
+                        action = rng.choice(DIR_LIST)
+                    t0 = time.perf_counter()
+                    sim.step(action)
+                    spent += time.perf_counter() - t0
+                    if sim.game_over:
+                        sim.reset()
+                return spent
+
+            sec = min(run() for _ in range(3))
+            report.result("tick", ticks / sec, "ticks/s", level=name, grid=grid)
+
+
+def bench_tick_length(report, grids, lengths=(10, 100, 1000, 10000, 100000), ticks=5000):
+    """長蛇：沒有道具的盤面上沿蛇行路線走，只量移動 / 碰撞本身隨長度的成本。"""
+    for grid in grids:
+        for length in lengths:
+            if length > grid * (grid - 2):
+                continue
+            cfg = make_config(1, grid_w=grid, grid_h=grid, obst_count=0, food_count=0,
+                              portal_pairs=0, tick_timers=False, randomized_start=False)
+            sim = SnakeSim(cfg, 0)
+            lay_snake(sim, length)
+
+            def run():
+                for _ in range(ticks):
+                    sim.step(serpentine(sim))
+
+            sec = best_of(run)
+            assert not sim.game_over
+            report.result("tick_length", ticks / sec, "ticks/s", grid=grid, length=length)
+
+
+def bench_portals(report, grids, pairs=(1, 10, 100, 1000), ticks=5000):
+    """很多對傳送門：隨機亂走，只量 step()（傳送門查表不應該隨數量變慢）。"""
+    for grid in grids:
+        for n in pairs:
+            if n * 2 > grid * grid // 4:
+                continue
+            cfg = make_config(1, grid_w=grid, grid_h=grid, obst_count=0, food_count=0,
+                              portal_pairs=n, tick_timers=False)
+            sim = SnakeSim(cfg, 0)
+            rng = random.Random(0)
+
+            def run():
+                spent = 0.0
+                for _ in range(ticks):
+                    action = rng.choice(DIR_LIST) if rng.random() < 0.1 else None
+                    t0 = time.perf_counter()
+                    sim.step(action)
+                    spent += time.perf_counter() - t0
+                    if sim.game_over:
+                        sim.reset()
+                return spent
+
+            sec = min(run() for _ in range(3))
+            report.result("tick_portals", ticks / sec, "ticks/s", grid=grid, pairs=n)
+
+
+def bench_spawn(report, grids, calls=500):
+    kinds = ["spawn_food", "spawn_boost", "spawn_bomb", "spawn_confuse", "spawn_fake_food"]
+    for grid in grids:
+        for name, level, boss in LEVELS:
+            cfg = config_for(level, boss, grid)
+            for method in kinds:
+                sims = [SnakeSim(cfg, seed) for seed in range(3)]
+                it = iter(sims)
+
+                def run():
+                    fn = getattr(next(it), method)
+                    for _ in range(calls):
+                        fn()
+
+                sec = best_of(run)
+                report.result(method, calls / sec, "calls/s", level=name, grid=grid)
+
+
+def bench_relocate(report, grids, calls=50):
+    kinds = ["relocate_obstacles", "relocate_foods", "relocate_bombs"]
+    for grid in grids:
+        for name, level, boss in LEVELS:
+            cfg = config_for(level, boss, grid)
+            sim = SnakeSim(cfg, 0)
+            for _ in range(cfg["bomb_count"]):
+                sim.spawn_bomb()
+            for method in kinds:
+                fn = getattr(sim, method)
+
+                def run():
+                    for _ in range(calls):
+                        fn()
+
+                sec = best_of(run)
+                report.result(method, calls / sec, "calls/s", level=name, grid=grid)
+
+
+def bench_reset(report, grids):
+    for grid in grids:
+        for name, level, boss in LEVELS:
+            cfg = config_for(level, boss, grid)
+            sim = SnakeSim(cfg, 0)
+            n = max(1, 200000 // (grid * grid))
+
+            def run():
+                for _ in range(n):
+                    sim.reset()
+
+            sec = best_of(run)
+            report.result("reset", sec / n * 1000, "ms", level=name, grid=grid)
+
+            # 套用 MapCache 在背景做好的地圖（不生成、不做連通檢查）
+            layout = sim.layout()
+
+            def run_layout():
+                for _ in range(n):
+                    sim.reset(layout)
+
+            sec = best_of(run_layout)
+            report.result("reset_layout", sec / n * 1000, "ms", level=name, grid=grid)
+
+
+def run_all(report, grids, quick=False):
+    bench_tick(report, grids, ticks=5000 if quick else 20000)
+    bench_tick_length(report, grids, ticks=1000 if quick else 5000)
+    bench_portals(report, grids, ticks=1000 if quick else 5000)
+    bench_spawn(report, grids, calls=100 if quick else 500)
+    bench_relocate(report, grids, calls=10 if quick else 50)
+    bench_reset(report, grids)
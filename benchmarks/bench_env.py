@@ -0,0 +1,29 @@
+"""
+強化學習環境：SnakeEnv.step()（含觀察值平面更新）的 steps/s，需要 numpy
+"""
+import random
+import time
+
+from common import LEVELS, config_for
+from snake_env import SnakeEnv
+
+
+def bench_step(report, grids, steps=20000):
+    """隨機動作，死了就 reset()；只計 step() 的時間。"""
+    for grid in grids:
+        for name, level, boss in LEVELS:
+            env = SnakeEnv(config_for(level, boss, grid), seed=0)
+            rng = random.Random(0)
+            spent = 0.0
+            for _ in range(steps):
+                action = rng.randrange(4) if rng.random() < 0.1 else -1
+                t0 = time.perf_counter()
+                _, _, terminated, _, _ = env.step(action)
+                spent += time.perf_counter() - t0
+                if terminated:
+                    env.reset()
+            report.result("env_step", steps / spent, "steps/s", level=name, grid=grid)
+
+
+def run_all(report, grids, quick=False):
+    bench_step(report, grids, steps=2000 if quick else 20000)
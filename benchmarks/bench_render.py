@@ -0,0 +1,58 @@
+"""
+畫面：SnakeGame.render() frames/s（dirty-rect、整張重畫、大地圖鏡頭），dummy SDL driver
+"""
+import random
+import time
+
+from common import LEVELS, config_for
+import snake_core
+from snake_core import DIR_LIST
+
+
+def set_window(sg, view, cell):
+    sg.GRID_W = sg.GRID_H = view
+    sg.CELL_SIZE = cell
+    sg.WINDOW_W = cell * view
+    sg.WINDOW_H = cell * view + sg.SCOREBAR_H
+
+
+def render_fps(sg, level, boss, grid, dirty, frames, world=False):
+    if world:
+        # 大地圖：視窗維持預設的 50×50 格，鏡頭跟著蛇頭
+        set_window(sg, snake_core.GRID_W, 15)
+    else:
+        # 格子大小跟著格數縮小，視窗維持 1000px 以內
+        set_window(sg, grid, max(2, min(15, 1000 // grid)))
+    sg.DIRTY_RENDER = dirty
+
+    game = sg.SnakeGame(seed=0, level=4 if boss else level, name="bench")
+    game.config = config_for(level, boss, grid, tick_timers=True)
+    game.reset()
+    rng = random.Random(0)
+
+    spent = 0.0
+    for _ in range(frames):
+        if rng.random() < 0.1:
+            game.recorder.turn(rng.choice(DIR_LIST))
+        game.update()
+        if game.sim.game_over:
+            game.reset()
+        t0 = time.perf_counter()
+        game.render()
+        spent += time.perf_counter() - t0
+    return frames / spent
+
+
+def run_all(report, grids, quick=False):
+    import snake_game as sg
+    frames = 300 if quick else 1500
+    for grid in grids:
+        for name, level, boss in LEVELS:
+            if grid <= 500:     # 1000×1000 塞進一個視窗每格不到 1px，沒意義
+                for dirty in (True, False):
+                    fps = render_fps(sg, level, boss, grid, dirty, frames)
+                    report.result("render", fps, "frames/s", level=name, grid=grid,
+                                  mode="dirty" if dirty else "full")
+            if grid > snake_core.GRID_W:
+                fps = render_fps(sg, level, boss, grid, True, frames, world=True)
+                report.result("render", fps, "frames/s", level=name, grid=grid, mode="world")
@@ -0,0 +1,58 @@
+"""
+排行榜：ScoreStore（save_score / load_scores 背後的 SQLite）與 ScoreWorker 佇列
+"""
+import os
+import tempfile
+import time
+
+from common import best_of
+from score_store import ScoreStore, ScoreWorker
+
+
+def run_all(report, grids=None, quick=False):
+    sizes = (1000, 10000) if quick else (1000, 10000, 100000)
+    for players in sizes:
+        with tempfile.TemporaryDirectory() as d:
+            store = ScoreStore(os.path.join(d, "scores.db"), import_dir=d)
+            store.submit_many([(f"p{i}", i % 997, 1, False) for i in range(players)])
+
+            n = 500
+            counter = iter(range(10**9))
+
+            def submit():
+                for _ in range(n):
+                    i = next(counter)
+                    store.submit(f"p{i % players}", 1000 + i, 1)
+
+            report.result("score_submit", n / best_of(submit), "ops/s", players=players)
+
+            def top():
+                for _ in range(n):
+                    store.top(1, k=5)
+
+            report.result("score_top5", n / best_of(top), "ops/s", players=players)
+
+            def best():
+                for i in range(n):
+                    store.best(f"p{i * 7 % players}", 1)
+
+            report.result("score_best", n / best_of(best), "ops/s", players=players)
+            store.close()
+
+            # save_score 在遊戲迴圈裡只是丟進佇列；flush 是背景真正寫完的時間
+            worker = ScoreWorker(os.path.join(d, "scores.db"))
+            worker.flush()
+            t0 = time.perf_counter()
+            for i in range(n):
+                worker.submit(f"w{i}", i, 1)
+            queued = time.perf_counter() - t0
+            worker.flush()
+            flushed = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            for _ in range(n):
+                worker.leaderboard(1)
+            cached = time.perf_counter() - t0
+            worker.close()
+            report.result("save_score", n / queued, "ops/s", players=players)
+            report.result("save_score_flush", flushed * 1000, "ms", players=players, batch=n)
+            report.result("load_scores", n / cached, "ops/s", players=players)
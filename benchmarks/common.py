@@ -0,0 +1,108 @@
+"""
+benchmarks 共用：計時、輸出格式、測試用盤面
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# 沒有螢幕也能跑 render
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from snake_core import world_config  # noqa: E402
+
+# (名稱, level, boss)
+LEVELS = [("L1", 1, False), ("L2", 2, False), ("L3", 3, False), ("Boss", 3, True)]
+
+
+def best_of(fn, repeat=3):
+    """跑 repeat 次取最快的一次（秒）；fn() 自己負責做足夠多次的工作。"""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def config_for(level, boss, grid, **overrides):
+    """grid×grid 的設定，障礙 / 食物數量依面積放大（50×50 時和遊戲預設相同）。"""
+    return world_config(level, boss, grid, grid, **overrides)
+
+
+def lay_snake(sim, length):
+    """把蛇擺成蛇行排列（偶數列往右、奇數列往左），長度 length，清掉路徑上的東西。
+    之後用 serpentine() 當操作就會一直沿著同樣的路線走。"""
+    W, H = sim.grid_w, sim.grid_h
+    path = []
+    for y in range(H):
+        xs = range(W) if y % 2 == 0 else range(W - 1, -1, -1)
+        path.extend((x, y) for x in xs)
+        if len(path) >= length:
+            break
+    path = path[:length]
+    while len(sim.snake):
+        sim.pop_tail()
+    for p in path:
+        for kind in ("obstacles", "food", "boosts", "bombs", "confuses", "fake_food", "invisible_obstacles"):
+            if p in getattr(sim, kind):
+                sim.take(kind, p)
+    for p in path:
+        sim.push_head(p)
+    sim.direction = (1, 0) if path[-1][1] % 2 == 0 else (-1, 0)
+    sim.waiting_start = False
+
+
+def serpentine(sim):
+    """蛇行路線的下一個方向（None = 不轉）。"""
+    (x, y), (dx, dy) = sim.snake[0], sim.direction
+    if dy:
+        return (1, 0) if y % 2 == 0 else (-1, 0)
+    if (dx == 1 and x == sim.grid_w - 1) or (dx == -1 and x == 0):
+        return (0, 1)
+    return None
+
+
+def metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    try:
+        import pygame
+        pg = pygame.version.ver
+    except ImportError:
+        pg = None
+    return {
+        "meta": True,
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pygame": pg,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+class Report:
+    """每筆結果一行 JSON（JSONL），key 欄位相同的結果可以跨 commit 比較（見 compare.py）。"""
+
+    def __init__(self, out=None):
+        self.out = out if out is not None else sys.stdout
+
+    def write(self, record):
+        self.out.write(json.dumps(record, sort_keys=True) + "\n")
+        self.out.flush()
+
+    def result(self, bench, value, unit, **params):
+        self.write(dict(bench=bench, value=round(value, 3), unit=unit, **params))
+        shown = " ".join(f"{k}={v}" for k, v in params.items())
+        print(f"  {bench:<18} {shown:<40} {value:>14,.1f} {unit}", file=sys.stderr)
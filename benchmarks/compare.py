@@ -0,0 +1,61 @@
+"""
+比較兩次 benchmarks/run.py 的結果：
+
+```bash
+python benchmarks/compare.py before.jsonl after.jsonl --threshold 10
+```
+變慢超過 threshold %（預設 10）的項目會標 REGRESSION，有任何一項就以 exit code 1 結束。
+"""
+import argparse
+import json
+import sys
+
+# 這些單位是「越小越好」
+LOWER_IS_BETTER = {"ms"}
+
+
+def load(path):
+    results = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            rec = json.loads(line)
+            if rec.get("meta"):
+                continue
+            key = tuple(sorted((k, v) for k, v in rec.items() if k != "value"))
+            results[key] = rec
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare benchmark results")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="變慢幾 % 算退步")
+    args = parser.parse_args(argv)
+
+    before, after = load(args.before), load(args.after)
+    regressions = 0
+    for key in sorted(before.keys() & after.keys()):
+        a, b = before[key], after[key]
+        if a["value"] == 0:
+            continue
+        change = (b["value"] - a["value"]) / a["value"] * 100
+        if a["unit"] in LOWER_IS_BETTER:
+            change = -change
+        flag = ""
+        if change < -args.threshold:
+            flag = "REGRESSION"
+            regressions += 1
+        elif change > args.threshold:
+            flag = "faster"
+        params = " ".join(f"{k}={v}" for k, v in key if k not in ("bench", "unit"))
+        print(f"{a['bench']:<18} {params:<40} {a['value']:>12,.1f} → {b['value']:>12,.1f} {a['unit']:<9} "
+              f"{change:+6.1f}% {flag}")
+    for key in sorted(before.keys() - after.keys()):
+        print("missing in after:", dict(key))
+    print(f"{regressions} regression(s)")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""
+Benchmarks
+==========
+量測規則核心、畫面、排行榜、自動駕駛、強化學習環境（單局 / 整批）的熱路徑，結果是 JSONL（一行一筆），可以跨 commit 比較。
+不需要螢幕（dummy SDL video driver）。
+
+```bash
+python benchmarks/run.py --out before.jsonl             # 完整：格數 50~1000、各難度含 Boss
+python benchmarks/run.py --quick --only core,scores     # 快速、只跑部分
+python benchmarks/compare.py before.jsonl after.jsonl   # 找出變慢的項目
+```
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+from common import Report, metadata
+
+import bench_autopilot
+import bench_batch
+import bench_core
+import bench_env
+import bench_render
+import bench_scores
+
+SUITES = {"core": bench_core, "render": bench_render, "scores": bench_scores, "autopilot": bench_autopilot,
+          "env": bench_env, "batch": bench_batch}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Snake benchmarks")
+    parser.add_argument("--out", help="結果寫到這個 JSONL 檔（預設 stdout）")
+    parser.add_argument("--only", default=",".join(SUITES), help="要跑哪些：core,render,scores,autopilot,env,batch")
+    parser.add_argument("--grids", help="格數，逗號分隔（預設 50,100,200,500,1000；--quick 為 50,100）")
+    parser.add_argument("--quick", action="store_true", help="少跑幾次，快速檢查用")
+    args = parser.parse_args(argv)
+
+    if args.grids:
+        grids = [int(g) for g in args.grids.split(",")]
+    else:
+        grids = [50, 100] if args.quick else [50, 100, 200, 500, 1000]
+
+    out = open(args.out, "w", encoding="utf-8") if args.out else None
+    report = Report(out)
+    report.write(metadata())
+
+    # 排行榜、遊戲存檔都寫在暫存目錄，不動到真的 scores.db
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as work:
+        os.chdir(work)
+        try:
+            for name in args.only.split(","):
+                print(f"[{name}]", file=sys.stderr)
+                SUITES[name].run_all(report, grids, quick=args.quick)
+        finally:
+            os.chdir(cwd)
+    if out:
+        out.close()
+
+
+if __name__ == "__main__":
+    main()
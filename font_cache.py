@@ -0,0 +1,52 @@
+"""
+字型路徑快取
+============
+`pygame.font.SysFont()` 每次都要掃一遍系統字型，字型多的機器光這步就要好幾百 ms。
+這裡把「字型名稱 → 字型檔路徑」存在 `~/.snake_game_fonts.json`，之後直接用路徑開字型；
+同一次執行裡不同大小也只查一次。找不到字型時和 SysFont 一樣退回 pygame 內建字型。
+"""
+import json
+import os
+
+import pygame
+
+CACHE_PATH = os.path.join(os.path.expanduser("~"), ".snake_game_fonts.json")
+
+_paths = None   # 這次執行讀進來的快取
+
+
+def _read():
+    try:
+        with open(CACHE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write():
+    try:
+        tmp = CACHE_PATH + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(_paths, f)
+        os.replace(tmp, CACHE_PATH)
+    except OSError:
+        pass        # 家目錄不能寫就算了，下次再查一次而已
+
+
+def font_path(name, bold=False, italic=False):
+    """字型檔路徑；None = pygame 內建字型。"""
+    global _paths
+    if _paths is None:
+        _paths = _read()
+    key = f"{name}|{int(bold)}{int(italic)}"
+    path = _paths.get(key)
+    if path is None or (path and not os.path.exists(path)):
+        path = pygame.font.match_font(name, bold, italic) or ""
+        _paths[key] = path
+        _write()
+    return path or None
+
+
+def load_font(name, size, bold=False, italic=False):
+    """取代 pygame.font.SysFont(name, size)。"""
+    return pygame.font.Font(font_path(name, bold, italic), size)
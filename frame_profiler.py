@@ -0,0 +1,86 @@
+"""
+FrameProfiler – 每幀分段計時
+============================
+把主迴圈的一幀拆成 events / update / render / flip 四段，保留最近 window 幀，
+算 p50 / p95 / p99，並可以把每幀的數字逐行寫到 CSV 或 JSONL（看副檔名）。
+
+```python
+prof = FrameProfiler(export="frames.csv")
+prof.record("playing", events=0.0001, update=0.0004, render=0.002, flip=0.001)
+prof.percentiles("render")     # (p50, p95, p99)，單位 ms
+```
+"""
+import csv
+import json
+import time
+from collections import deque
+
+PHASES = ("events", "update", "render", "flip")
+
+
+class FrameProfiler:
+    def __init__(self, window=240, export=None):
+        self.samples = {p: deque(maxlen=window) for p in PHASES + ("total",)}
+        self.frame_stamps = deque(maxlen=window)    # 每幀結束的時間，算實際幀率
+        self.tick_stamps = deque(maxlen=window)     # 每個遊戲 tick 的時間，算實際遊戲速度
+        self.frames = 0
+        self.t0 = time.perf_counter()
+
+        self._file = self._csv = None
+        if export:
+            self._file = open(export, "w", encoding="utf-8", newline="")
+            if not export.endswith(".jsonl"):
+                self._csv = csv.writer(self._file)
+                self._csv.writerow(["frame", "time_ms", "scene"] + [f"{p}_ms" for p in PHASES + ("total",)])
+
+    def record(self, scene, **phases):
+        """記一幀；phases 是各段花的秒數。"""
+        now = time.perf_counter()
+        total = sum(phases.values())
+        for p in PHASES:
+            self.samples[p].append(phases.get(p, 0.0))
+        self.samples["total"].append(total)
+        self.frame_stamps.append(now)
+        self.frames += 1
+
+        if self._file is not None:
+            ms = [round(phases.get(p, 0.0) * 1000, 4) for p in PHASES] + [round(total * 1000, 4)]
+            stamp = round((now - self.t0) * 1000, 3)
+            if self._csv is not None:
+                self._csv.writerow([self.frames, stamp, scene] + ms)
+            else:
+                rec = {"frame": self.frames, "time_ms": stamp, "scene": scene}
+                rec.update({f"{p}_ms": v for p, v in zip(PHASES + ("total",), ms)})
+                self._file.write(json.dumps(rec) + "\n")
+
+    def tick(self):
+        self.tick_stamps.append(time.perf_counter())
+
+    def percentiles(self, phase, ps=(50, 95, 99)):
+        """最近 window 幀的百分位數（ms，nearest-rank）。"""
+        data = sorted(self.samples[phase])
+        if not data:
+            return tuple(0.0 for _ in ps)
+        n = len(data)
+        return tuple(data[min(n - 1, max(0, -(-p * n // 100) - 1))] * 1000 for p in ps)
+
+    @staticmethod
+    def _rate(stamps):
+        if len(stamps) < 2 or stamps[-1] == stamps[0]:
+            return 0.0
+        return (len(stamps) - 1) / (stamps[-1] - stamps[0])
+
+    def fps(self):
+        """實際幀率（最近 window 幀）。"""
+        return self._rate(self.frame_stamps)
+
+    def tick_rate(self):
+        """實際遊戲速度（tick/s）；最後一個 tick 超過 1 秒前（暫停中）就算 0。"""
+        if not self.tick_stamps or time.perf_counter() - self.tick_stamps[-1] > 1.0:
+            return 0.0
+        return self._rate(self.tick_stamps)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = self._csv = None
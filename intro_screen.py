@@ -1,6 +1,5 @@
 # intro_screen.py
 import pygame
-import time
 
 # 開場像素蛇圖案（使用等寬字型會最漂亮）
 PIXEL_SNAKE = [
@@ -25,22 +24,56 @@ PIXEL_SNAKE = [
     "      ███████████████████████     █████████      ████",
 ]
 
+LINE_H        = 20      # 行距
+LINE_DELAY_MS = 100     # 每行出現的間隔
+HOLD_MS       = 1500    # 全部出現後停留多久
+INTRO_MS      = len(PIXEL_SNAKE) * LINE_DELAY_MS + HOLD_MS
+
+
 # -----------------------------------------------------
-# 在 Pygame 視窗中播放開場畫面
+# 開場畫面：整張橫幅先 render 成一張 surface，之後依經過時間
+# 決定露出幾行（不 sleep，由呼叫端的主迴圈推進）
 # -----------------------------------------------------
-def show_intro(screen, font):
-    screen.fill((30, 30, 30))
-    pygame.display.set_caption("Snake Game – Intro")
+def render_banner(font):
+    labels = [font.render(line, True, (255, 255, 255)) for line in PIXEL_SNAKE]
+    w = max(label.get_width() for label in labels)
+    h = (len(labels) - 1) * LINE_H + labels[-1].get_height()
+    banner = pygame.Surface((w, h), pygame.SRCALPHA)
+    for i, label in enumerate(labels):
+        banner.blit(label, (0, i * LINE_H))
+    return banner
 
-    # 顯示每一行字的動畫效果
-    delay = 0.1  # 秒
-    for i, line in enumerate(PIXEL_SNAKE):
-        label = font.render(line, True, (255, 255, 255))
-        screen.blit(label, (50, 50 + i * 20))
-        pygame.display.flip()
-        time.sleep(delay)
 
-    time.sleep(1.5)  # 等待 1.5 秒後清除
+def lines_shown(elapsed_ms):
+    """elapsed_ms 時露出幾行；動畫結束（可以清掉）時回傳 None。"""
+    if elapsed_ms >= INTRO_MS:
+        return None
+    return min(len(PIXEL_SNAKE), elapsed_ms // LINE_DELAY_MS + 1)
+
+
+def draw_intro(screen, banner, elapsed_ms):
+    """畫出 elapsed_ms 時的開場畫面，回傳動畫是否已經結束。"""
     screen.fill((30, 30, 30))
-    pygame.display.flip()
+    shown = lines_shown(elapsed_ms)
+    if shown is None:
+        return True
+    h = banner.get_height() if shown == len(PIXEL_SNAKE) else shown * LINE_H
+    screen.blit(banner, (50, 50), pygame.Rect(0, 0, banner.get_width(), h))
+    return False
+
 
+def show_intro(screen, font):
+    """單獨播放開場畫面（按任意鍵跳過）。"""
+    pygame.display.set_caption("Snake Game – Intro")
+    banner = render_banner(font)
+    clock = pygame.time.Clock()
+    elapsed = 0
+    while True:
+        for e in pygame.event.get():
+            if e.type in (pygame.KEYDOWN, pygame.QUIT):
+                elapsed = INTRO_MS
+        done = draw_intro(screen, banner, elapsed)
+        pygame.display.flip()
+        if done:
+            return
+        elapsed += clock.tick(60)
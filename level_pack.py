@@ -0,0 +1,303 @@
+"""
+LevelPack – 關卡檔（levels/*.json）與編譯好的快取
+=================================================
+每個關卡一個 JSON 檔：選單名稱、說明頁、規則設定（`make_config` 的欄位，沒寫的用第 1 關的值）、固定牆。
+
+```json
+{
+  "number": 2, "boss": false,
+  "name": "Level 2", "title": "Level 2 – Moving Obstacles",
+  "info": [["wall", "Obstacles move every 4 seconds"], ["bomb", "Bomb: shortens snake tail"]],
+  "settings": {"obst_ms": 4000, "obst_count": 20, "food_count": 4, "speed_every": 120},
+  "walls": [[10, 10], [10, 11], [10, 12]]
+}
+```
+
+* `number` + `boss` 是排行榜的分類（內建 1、2、3 和 3 + Boss），自訂關卡請用 10 以上；
+* 可以調的設定見 `SETTINGS`：格數、道具數量、各計時週期（*_ms）、速度曲線（speed_every / speed_step /
+  speed_max）、Boss 規則（invisible_count / boss_shrink_ticks / shrink_ms …）；
+* 第一次讀取時整包解析、檢查（欄位、範圍、固定牆會不會把地圖切開），結果寫成同目錄的 `.levels.cache`；
+  之後啟動只 stat 關卡檔比對指紋，對得上就直接 mmap 快取，不再解析 JSON、不再檢查
+  （只對一次 CRC32，快取被截斷或內容壞掉就從關卡檔重建）；
+* 關卡檔有錯就丟 ValueError（訊息帶檔名和欄位）。
+
+快取格式（little-endian）：
+
+    b"SNKL" | 版本 u16 | 關卡數 u16 | 指紋 (sha1, 20 bytes) | 內容的 CRC32 u32
+    | 索引 (offset u32, 長度 u32) × 關卡數 | 每個關卡一筆 marshal 過的 dict（依 number、boss 排序）
+
+CRC32 算的是 header 之後的所有內容（索引 + 每筆關卡）。
+
+```python
+pack = LevelPack.load()              # 預設 levels/
+level = pack[0]                      # 選單上的第 1 個
+cfg = level.config()                 # 給 SnakeSim 的完整設定
+```
+"""
+import hashlib
+import json
+import marshal
+import mmap
+import os
+import struct
+import zlib
+from collections import deque
+
+from snake_core import make_config, world_config, fixed_start, start_cells, GRID_W, GRID_H
+
+LEVEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "levels")
+CACHE_NAME = ".levels.cache"
+
+MAGIC   = b"SNKL"
+VERSION = 2         # 關卡格式或檢查規則改了就加 1，舊快取自動重建
+_HEADER = struct.Struct("<4sHH20sI")
+_INDEX  = struct.Struct("<II")
+
+# 設定欄位 → (型別, 最小值)；bool 沒有範圍
+SETTINGS = {
+    "grid_w": (int, 12), "grid_h": (int, 12),
+    "obst_count": (int, 0), "food_count": (int, 0), "bomb_count": (int, 0),
+    "confuse_count": (int, 0), "portal_pairs": (int, 0), "obst_move_count": (int, 0),
+    "obst_ms": (int, 0), "food_ms": (int, 0),                   # 0 = 不移動
+    "bomb_ms": (int, 1), "confuse_ms": (int, 1), "spawn_food_ms": (int, 1), "boost_ms": (int, 1),
+    "shrink_ms": (int, 1), "bomb_move_ms": (int, 1), "fake_food_ms": (int, 1),
+    "speed_increment": (bool, None), "speed_every": (int, 1), "speed_step": (int, 0), "speed_max": (int, 0),
+    "invisible_count": (int, 0), "boss_shrink_ticks": (int, 0),
+    "portal_cooldown": (int, 0), "portal_dirs": (bool, None), "paired_portals": (bool, None),
+    "randomized_start": (bool, None), "map_check": (bool, None),
+}
+
+# 說明頁可以用的圖示（SnakeGame.paint_icon）
+ICONS = ("wall", "food", "boost", "portal", "border", "confuse", "bomb", "timer", "fake", "invisible")
+
+
+class Level:
+    """一個關卡（快取裡的一筆）。"""
+
+    def __init__(self, data):
+        self.number = data["number"]
+        self.boss = data["boss"]
+        self.name = data["name"]
+        self.title = data["title"]
+        self.info = [tuple(row) for row in data["info"]]
+        self.settings = data["settings"]
+        self.walls = data["walls"]
+        self.file = data["file"]
+
+    def config(self, world=None):
+        """組出 SnakeSim 的完整設定；world = N 時改成 N×N 大地圖（障礙、食物數量依面積放大，固定牆不放）。"""
+        cfg = make_config(1, self.boss, **self.settings)
+        if world:
+            cfg = world_config(1, self.boss, world, world, base=cfg)
+        elif self.walls:
+            cfg["walls"] = [list(p) for p in self.walls]
+        cfg["level"] = self.number
+        return cfg
+
+    def __repr__(self):
+        return f"Level({self.number}{' boss' if self.boss else ''} {self.name!r})"
+
+
+# ────────────────────────────────────────────────────────────────────
+# 解析 / 檢查
+# ────────────────────────────────────────────────────────────────────
+def parse_level(path):
+    """讀一個關卡檔，檢查完回傳正規化過的 dict（有錯就 ValueError）。"""
+    name = os.path.basename(path)
+
+    def fail(msg):
+        raise ValueError(f"{name}: {msg}")
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+    except ValueError as err:
+        fail(f"JSON 格式錯誤：{err}")
+    if not isinstance(raw, dict):
+        fail("最外層要是物件")
+    unknown = set(raw) - {"number", "boss", "name", "title", "info", "settings", "walls"}
+    if unknown:
+        fail(f"不認得的欄位 {sorted(unknown)}")
+
+    number = raw.get("number")
+    if type(number) is not int or number < 1:
+        fail("number 要是 ≥ 1 的整數")
+    boss = raw.get("boss", False)
+    if type(boss) is not bool:
+        fail("boss 要是 true / false")
+    label = raw.get("name")
+    if not isinstance(label, str) or not label:
+        fail("缺少 name")
+
+    info = raw.get("info", [])
+    if not isinstance(info, list):
+        fail("info 要是 [[圖示, 說明], ...]")
+    for row in info:
+        if not (isinstance(row, list) and len(row) == 2 and row[0] in ICONS and isinstance(row[1], str)):
+            fail(f"info 項目格式錯誤：{row!r}（圖示可用 {', '.join(ICONS)}）")
+
+    settings = raw.get("settings", {})
+    if not isinstance(settings, dict):
+        fail("settings 要是物件")
+    for key, value in settings.items():
+        if key not in SETTINGS:
+            fail(f"settings 裡不認得的欄位 {key!r}")
+        kind, low = SETTINGS[key]
+        if type(value) is not kind:
+            fail(f"settings.{key} 要是 {kind.__name__}")
+        if low is not None and value < low:
+            fail(f"settings.{key} 不能小於 {low}")
+
+    W, H = settings.get("grid_w", GRID_W), settings.get("grid_h", GRID_H)
+    walls = raw.get("walls", [])
+    if not isinstance(walls, list):
+        fail("walls 要是 [[x, y], ...]")
+    cells = set()
+    for p in walls:
+        if not (isinstance(p, list) and len(p) == 2 and all(type(v) is int for v in p)):
+            fail(f"walls 項目格式錯誤：{p!r}")
+        x, y = p
+        if not (0 <= x < W and 0 <= y < H):
+            fail(f"牆 {p} 超出 {W}×{H} 的地圖")
+        if (x, y) in cells:
+            fail(f"牆 {p} 重複")
+        cells.add((x, y))
+
+    cfg = make_config(1, boss, **settings)
+    needed = cfg["obst_count"] + cfg["food_count"] + 2 * cfg["portal_pairs"] + len(cells) + 4
+    if needed > W * H:
+        fail(f"{W}×{H} 放不下 {needed} 個東西")
+    if cells and not _walls_connected(cells, W, H):
+        fail("固定牆把地圖切成好幾塊（有走不到的格子）")
+    if not cfg["randomized_start"]:
+        blocked = sorted(cells.intersection(start_cells(*fixed_start(W, H))))
+        if blocked:
+            fail(f"牆 {[list(p) for p in blocked]} 擋住固定起點（蛇身或第一步）")
+
+    return {
+        "file": name,
+        "number": number,
+        "boss": boss,
+        "name": label,
+        "title": raw.get("title", label),
+        "info": info,
+        "settings": settings,
+        "walls": [list(p) for p in walls],
+    }
+
+
+def _walls_connected(walls, W, H):
+    """只有固定牆時，其他格子是不是全部連在一起（上下左右相通）。"""
+    start = next((x, y) for y in range(H) for x in range(W) if (x, y) not in walls)
+    seen = {start}
+    queue = deque([start])
+    while queue:
+        x, y = queue.popleft()
+        for q in (((x + 1) % W, y), ((x - 1) % W, y), (x, (y + 1) % H), (x, (y - 1) % H)):
+            if q not in seen and q not in walls:
+                seen.add(q)
+                queue.append(q)
+    return len(seen) == W * H - len(walls)
+
+
+def compile_levels(paths):
+    """解析、檢查整包關卡，回傳每個關卡 marshal 過的 bytes（依 number、boss 排序）。"""
+    levels = [parse_level(p) for p in paths]
+    levels.sort(key=lambda lv: (lv["number"], lv["boss"]))
+    seen = {}
+    for lv in levels:
+        key = (lv["number"], lv["boss"])
+        if key in seen:
+            raise ValueError(f"{lv['file']}: 和 {seen[key]} 的 number / boss 相同")
+        seen[key] = lv["file"]
+    return [marshal.dumps(lv) for lv in levels]
+
+
+# ────────────────────────────────────────────────────────────────────
+# 關卡包
+# ────────────────────────────────────────────────────────────────────
+class LevelPack:
+    def __init__(self, buf, count):
+        self.buf = buf              # mmap（或重建時寫不了快取檔就是 bytes）
+        self.count = count
+        self._levels = [None] * count   # 用到才從快取解出來
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if self._levels[i] is None:
+            offset, length = _INDEX.unpack_from(self.buf, _HEADER.size + i * _INDEX.size)
+            self._levels[i] = Level(marshal.loads(self.buf[offset:offset + length]))
+        return self._levels[i]
+
+    def __iter__(self):
+        return (self[i] for i in range(self.count))
+
+    def find(self, number, boss=False):
+        """依排行榜分類找關卡；沒有就回傳 None。"""
+        return next((lv for lv in self if lv.number == number and lv.boss == bool(boss)), None)
+
+    @staticmethod
+    def fingerprint(paths):
+        """關卡檔的指紋：檔名、大小、修改時間（只 stat，不讀內容）。"""
+        h = hashlib.sha1(struct.pack("<H", VERSION))
+        for p in paths:
+            st = os.stat(p)
+            h.update(f"{os.path.basename(p)}\0{st.st_size}\0{st.st_mtime_ns}\0".encode("utf-8"))
+        return h.digest()
+
+    @classmethod
+    def load(cls, directory=LEVEL_DIR):
+        """讀 directory 裡所有 *.json；快取的指紋對得上就直接 mmap，否則重新編譯並寫回快取。"""
+        paths = sorted(os.path.join(directory, n) for n in os.listdir(directory) if n.endswith(".json"))
+        if not paths:
+            raise ValueError(f"{directory} 裡沒有關卡檔（*.json）")
+        digest = cls.fingerprint(paths)
+        cache = os.path.join(directory, CACHE_NAME)
+
+        pack = cls._open(cache, digest)
+        if pack is not None:
+            return pack
+
+        records = compile_levels(paths)
+        body = bytearray()
+        offset = _HEADER.size + _INDEX.size * len(records)
+        for rec in records:
+            body += _INDEX.pack(offset, len(rec))
+            offset += len(rec)
+        for rec in records:
+            body += rec
+        out = _HEADER.pack(MAGIC, VERSION, len(records), digest, zlib.crc32(body)) + body
+        try:
+            tmp = cache + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(out)
+            os.replace(tmp, cache)
+        except OSError:
+            return cls(out, len(records))      # 目錄不能寫（唯讀的機台）：這次就用記憶體裡的
+        return cls._open(cache, digest) or cls(out, len(records))
+
+    @classmethod
+    def _open(cls, path, digest):
+        """mmap 快取檔；不存在、版本或指紋不對、CRC 對不上（截斷、內容壞掉）都回傳 None。"""
+        try:
+            with open(path, "rb") as f:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        try:
+            magic, version, count, stored, crc = _HEADER.unpack_from(buf, 0)
+            if magic != MAGIC or version != VERSION or stored != digest:
+                raise ValueError("stale cache")
+            if zlib.crc32(buf[_HEADER.size:]) != crc:
+                raise ValueError("corrupt cache")
+            pack = cls(buf, count)
+            for i in range(count):          # 內容對過 CRC，這裡只確認索引都在檔案範圍內，關卡等用到再解
+                offset, length = _INDEX.unpack_from(buf, _HEADER.size + i * _INDEX.size)
+                if offset + length > len(buf):
+                    raise ValueError("truncated cache")
+            return pack
+        except (struct.error, ValueError):
+            buf.close()
+            return None
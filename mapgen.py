@@ -0,0 +1,100 @@
+"""
+MapCache – 背景預先生成開局地圖
+================================
+設定有 `map_check`（make_config 預設開）時，`SnakeSim.reset()` 放障礙會先確認不會把地圖切開，
+最後再從蛇頭整張 flood fill 一次（地圖上下左右相通、傳送門直接跳到出口），有走不到的格子就重新生成。
+50×50 只要幾 ms，但 --world 1000 的大地圖光 flood fill 就要大半秒。
+
+MapCache 用一個背景程序先把下一局的地圖生成、檢查好（`SnakeSim.layout()`），
+開新局時直接套上，不用等：
+
+* 套 layout 和用同一個 seed 自己生成的結果完全相同（連 RNG 狀態都一樣），決定性模式 / 重播照常；
+* 每份設定預先排 `depth` 張（seed 隨機）；決定性模式可以指定下一局的 seed：`prefetch(config, [seed])`；
+* 背景還沒做好就在前景直接生成，不會卡住等背景；背景程序掛掉（BrokenProcessPool）就收掉，之後都在前景生成。
+
+```python
+maps = MapCache()
+sim = maps.take(make_config(3))          # 第一次在前景生成，同時開始幫下一局準備
+sim = maps.take(make_config(3))          # 之後通常都是背景做好的
+maps.close()
+```
+"""
+import json
+import multiprocessing
+import random
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from snake_core import SnakeSim
+
+
+def generate_layout(config, seed):
+    """（背景程序）生成並檢查一張地圖，回傳 layout。"""
+    return SnakeSim(config, seed).layout()
+
+
+class MapCache:
+    def __init__(self, workers=1, depth=1):
+        self.workers = workers
+        self.depth = depth          # 每份設定預先準備幾張（隨機 seed）
+        self.pool = None            # 第一次用到才開
+        self.broken = False         # 背景程序開不起來 / 掛掉過：之後都在前景生成
+        self.pending = {}           # 設定（JSON）→ [(seed, future), ...]，先排的在前面
+
+    @staticmethod
+    def _key(config):
+        return json.dumps(config, sort_keys=True)
+
+    def prefetch(self, config, seeds=None):
+        """幫這份設定排好之後要用的地圖：給 seeds 就排這些 seed，否則補到 depth 張隨機 seed。"""
+        if self.broken:
+            return
+        queue = self.pending.setdefault(self._key(config), [])
+        if seeds is None:
+            seeds = [random.randrange(2**31) for _ in range(self.depth - len(queue))]
+        try:
+            if self.pool is None:
+                # spawn：子程序從乾淨的直譯器開始，不會複製到主程序的視窗、背景執行緒
+                self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            for seed in seeds:
+                if all(s != seed for s, _ in queue):
+                    queue.append((seed, self.pool.submit(generate_layout, config, seed)))
+        except (BrokenProcessPool, OSError):
+            self._give_up()
+
+    def take(self, config, seed=None):
+        """開一局，回傳 SnakeSim。seed=None = 哪一張都可以（用掉之後自動補）；
+        背景還沒做好（或生成失敗）就在前景用同一個 seed 生成。"""
+        queue = self.pending.get(self._key(config), [])
+        sim = None
+        for i, (s, future) in enumerate(queue):
+            if seed is not None and s != seed:
+                continue
+            if future.done():
+                del queue[i]
+                error = future.exception()
+                if error is None:
+                    sim = SnakeSim(config, s, layout=future.result())
+                elif isinstance(error, (BrokenProcessPool, OSError)):
+                    self._give_up()
+                break
+            if seed is not None:
+                del queue[i]
+                future.cancel()         # 指定的那張還沒好：前景自己做，背景那份不要了
+                break
+        if sim is None:
+            sim = SnakeSim(config, seed if seed is not None else random.randrange(2**31))
+        if seed is None:
+            self.prefetch(config)
+        return sim
+
+    def _give_up(self):
+        """背景程序壞了（例如子程序匯入主程式時掛掉）：收掉 pool，之後 take() 都在前景生成。"""
+        self.close()
+        self.broken = True
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+        self.pending = {}
@@ -0,0 +1,196 @@
+"""
+MultiSnakeSim – 多條蛇同一張地圖（連線對戰的規則核心，不依賴 pygame）
+=====================================================================
+地圖、道具、計時生成都沿用 `SnakeSim`；每位玩家有自己的蛇身、方向、加速 / 混亂倒數。
+每個 tick 依玩家編號輪流把該玩家的狀態「裝進」sim、跑一次 `SnakeSim.update()` 再存回去，
+所以吃食物頭尾互換、炸彈、傳送門、Boss 效果和單人版完全相同。
+
+* 撞到別人的蛇身 = Game Over（death_cause = "snake"）；撞到自己照單人版規則；
+* 死掉的蛇整條從地圖上拿掉，`RESPAWN_TICKS` 之後在隨機空位重生（等第一次輸入才開始走）；
+* 同一個 tick 兩條蛇搶同一格時，編號小的先走（先佔到那一格）；
+* `owner[c]`：格子 c 上蛇身的玩家編號（0 = 沒有），畫面 / 網路同步用。
+
+```python
+sim = MultiSnakeSim(make_config(2), seed=1)
+a, b = sim.join("ginny"), sim.join("bot")
+events = sim.step({a: (1, 0)})      # [(玩家編號, 事件名稱), ...]
+```
+"""
+from snake_core import SnakeSim, SnakeBody, make_config, DIR_LIST, FPS_BASE
+
+MAX_PLAYERS = 127               # 玩家編號 1~127（網路格式裡佔 7 bits）
+RESPAWN_TICKS = 3 * FPS_BASE    # 死掉之後幾個 tick 重生
+SPAWN_TRIES = 50
+
+# 每位玩家各自一份、update() 期間裝進 sim 的欄位
+PLAYER_FIELDS = ("snake", "direction", "pending_growth", "age", "base_fps", "fps",
+                 "boost_remaining", "confuse_remaining", "game_over", "death_cause", "waiting_start")
+
+
+class Player:
+    def __init__(self, pid, name):
+        self.pid = pid
+        self.name = name
+        self.snake = SnakeBody()
+        self.direction = (1, 0)
+        self.pending_growth = 0
+        self.age = 0
+        self.base_fps = self.fps = FPS_BASE
+        self.boost_remaining = 0
+        self.confuse_remaining = 0
+        self.game_over = True       # 還沒放上地圖
+        self.death_cause = None
+        self.waiting_start = True
+        self.respawn_at = 0         # 第幾個 tick 起可以重生
+        self.deaths = 0
+        self.best = 0               # 這次連線最長到幾格
+
+
+class MultiSnakeSim(SnakeSim):
+    def __init__(self, config=None, seed=None, layout=None):
+        self.players = {}
+        self._slot = 0
+        super().__init__(config if config is not None else make_config(), seed, layout)
+
+    def reset(self, layout=None):
+        """重建地圖；已加入的玩家全部等待重生。"""
+        self.owner = bytearray(self.grid_w * self.grid_h)
+        super().reset(layout)
+        # 單人版開局的那條蛇不要，玩家由 join() 放上來
+        self.cut_tail(0)
+        self._room = SnakeBody()    # 沒有玩家裝進來時的空蛇身
+        for pl in self.players.values():
+            pl.snake = SnakeBody()
+            pl.game_over = True
+            pl.respawn_at = 0
+
+    # ────────────────────────────────────────────────
+    # 玩家
+    # ────────────────────────────────────────────────
+    def join(self, name):
+        """加入一位玩家，回傳玩家編號；下一個 tick 起在空位重生。"""
+        pid = next((k for k in range(1, MAX_PLAYERS + 1) if k not in self.players), None)
+        if pid is None:
+            raise ValueError("房間已滿")
+        self.players[pid] = Player(pid, name)
+        return pid
+
+    def leave(self, pid):
+        pl = self.players.pop(pid)
+        if not pl.game_over:
+            self._bind(pl)
+            self.cut_tail(0)
+            self._unbind(pl)
+
+    def _bind(self, pl):
+        for k in PLAYER_FIELDS:
+            setattr(self, k, getattr(pl, k))
+        self._slot = pl.pid
+
+    def _unbind(self, pl):
+        for k in PLAYER_FIELDS:
+            setattr(pl, k, getattr(self, k))
+        # 計時事件（fire）看到的是整個房間：沒有蛇、沒有 Game Over、age 用房間的 tick
+        self.snake = self._room
+        self.game_over = False
+        self.death_cause = None
+        self.age = self.tick
+        self._slot = 0
+
+    def _respawn(self, pl):
+        """在隨機空位放一條 3 格的蛇（頭前一格也要空著）；找不到就下個 tick 再試。"""
+        W, H, rng = self.grid_w, self.grid_h, self.rng
+        for _ in range(SPAWN_TRIES):
+            if not len(self.free):
+                return False
+            c = self.free[rng.randrange(len(self.free))]
+            dx, dy = rng.choice(DIR_LIST)
+            x, y = c % W, c // W
+            cells = [(x + k * dx, y + k * dy) for k in (1, 0, -1, -2)]
+            if all(0 <= px < W and 0 <= py < H and self.is_free((px, py)) for px, py in cells):
+                break
+        else:
+            return False
+        self._bind(pl)
+        self.snake = SnakeBody()
+        for p in cells[1:]:
+            self.snake.push_tail(p)
+            self._body_add(p)
+        self.direction = (dx, dy)
+        self.pending_growth = self.age = 0
+        self.base_fps = self.fps = FPS_BASE
+        self.boost_remaining = self.confuse_remaining = 0
+        self.game_over = False
+        self.death_cause = None
+        self.waiting_start = True
+        self._unbind(pl)
+        return True
+
+    # ────────────────────────────────────────────────
+    # 推進
+    # ────────────────────────────────────────────────
+    def step(self, actions=None):
+        """actions：{玩家編號: 方向}；回傳這個 tick 的事件 [(玩家編號, 名稱), ...]。"""
+        actions = actions or {}
+        events = []
+        for pid in sorted(self.players):
+            pl = self.players[pid]
+            if pl.game_over:
+                if self.tick >= pl.respawn_at:
+                    self._respawn(pl)
+                continue
+            self._bind(pl)
+            self.events = []
+            action = actions.get(pid)
+            if action is not None:
+                self.turn(action)
+            self.update()
+            if self.game_over:
+                self.cut_tail(0)        # 整條拿掉，空出位置
+                pl.respawn_at = self.tick + RESPAWN_TICKS
+                pl.deaths += 1
+            pl.best = max(pl.best, len(self.snake))
+            self._unbind(pl)
+            events.extend((pid, e) for e in self.events)
+        self.events = []
+        self.tick += 1
+        self.age = self.tick
+        for name in self.scheduler.due(self.tick):
+            self.fire(name)
+        return events
+
+    def fire(self, name):
+        if name == "boss_shrink":
+            if self.boss:
+                for pl in self.players.values():
+                    if not pl.game_over and len(pl.snake) > 1:
+                        self._bind(pl)
+                        self.pop_tail()
+                        self._unbind(pl)
+            return
+        super().fire(name)
+
+    # ────────────────────────────────────────────────
+    # 佔用索引：多記一份蛇身是誰的
+    # ────────────────────────────────────────────────
+    def hit_body(self, p):
+        if self.owner[self.cell_id(p)] not in (0, self._slot):
+            self._hit_other = True
+            return True
+        return super().hit_body(p)
+
+    def update(self):
+        self._hit_other = False
+        super().update()
+        if self._hit_other:
+            self.death_cause = "snake"      # SnakeSim 只分得出 "self"
+
+    def _body_add(self, p):
+        super()._body_add(p)
+        self.owner[self.cell_id(p)] = self._slot
+
+    def _body_remove(self, p):
+        super()._body_remove(p)
+        c = self.cell_id(p)
+        if not self.body_count[c]:
+            self.owner[c] = 0
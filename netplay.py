@@ -0,0 +1,632 @@
+"""
+Netplay – 連線對戰（asyncio + UDP）
+===================================
+伺服器手上有權威的 `MultiSnakeSim`，以固定 tick 數推進；客戶端只送方向、畫收到的盤面。
+
+* 一個伺服器程序（一個 UDP port）同時開很多房間，每個房間一個 asyncio task，沒人了就關掉；
+* 盤面每格一個 uint16：低 9 bits 是佔用旗標（OCC_*），高 7 bits 是蛇身的玩家編號；
+* 每個 tick 只送「和客戶端最後 ack 的那個 tick 相比」有變的格子（格子編號差用 varint、值 2 bytes），
+  客戶端 ack 落後超過 `HISTORY` 個 tick 或還沒 ack 過就送完整盤面（相對於空盤面）；
+* UDP 會掉封包、會亂序：方向輸入帶遞增序號、每個封包都重送最近 `INPUT_WINDOW` 筆，伺服器只收比較新的，
+  依序號排進佇列、每個 tick 套用一筆（同一個 tick 內連按兩次方向也不會蓋掉前一次）；
+  盤面封包舊的直接丟，掉的那些下一次的差分會一起補上；
+* `--latency / --jitter / --loss` 模擬網路狀況（只作用在自己送出的封包），本機就能測。
+
+```bash
+python netplay.py server --port 5050
+python netplay.py client --room r1 --name ginny --level 2              # pygame 視窗，WASD / 方向鍵
+python netplay.py client --room r1 --bots 8 --seconds 30 --loss 0.2    # 無畫面機器人，印出流量統計
+```
+
+封包格式（little-endian，str8 = 1 byte 長度 + UTF-8）：
+
+| 類型 | 方向 | 內容 |
+|------|------|------|
+| `J` 加入 | C→S | level:B boss:B room:str8 name:str8 |
+| `W` 歡迎 | S→C | pid:B grid_w:H grid_h:H tick_rate:B n:B portal:I×n |
+| `I` 輸入 | C→S | ack_tick:I seq:I n:B dir:B×n（最近 n 筆方向，最後一筆的序號是 seq；0~3 = DIR_LIST） |
+| `L` 離開 | C→S | |
+| `S` 盤面 | S→C | tick:I base:I n:B [pid:B flags:B head:I length:H best:H name:str8]×n 差分 |
+| `E` 錯誤 | S→C | UTF-8 訊息 |
+"""
+import argparse
+import asyncio
+import random
+import struct
+import sys
+import time
+from array import array
+from collections import deque
+
+from multiplayer import MultiSnakeSim
+from snake_core import make_config, DIR_LIST, FPS_BASE
+
+DEFAULT_PORT = 5050
+TICK_RATE = FPS_BASE        # 每秒幾個 tick（固定，不跟著加速道具變快）
+HISTORY = 64                # 伺服器保留幾個 tick 的變動紀錄
+CLIENT_TIMEOUT = 10.0       # 幾秒沒收到客戶端的封包就當作斷線
+KEEPALIVE = 0.5             # 客戶端沒收到盤面時，每隔幾秒重送輸入 / 加入
+MAX_CELLS = 100 * 100       # 完整盤面（最壞每格 5 bytes）也要塞得進一個 UDP 封包
+NO_BASE = 0xFFFFFFFF        # 差分的基準 =「空盤面」，也就是完整盤面
+OWNER_SHIFT = 9             # 盤面值：旗標 | 玩家編號 << 9
+INPUT_WINDOW = 8            # 每個輸入封包帶最近幾筆方向（前面的封包掉了也補得回來）
+INPUT_QUEUE = 4             # 伺服器每位玩家最多排幾筆還沒套用的方向（太多會讓操作延遲）
+
+MSG_JOIN, MSG_WELCOME, MSG_INPUT, MSG_LEAVE, MSG_SNAPSHOT, MSG_ERROR = b"J", b"W", b"I", b"L", b"S", b"E"
+
+# 玩家表裡的 flags
+PF_ALIVE, PF_WAITING, PF_CONFUSED, PF_BOOSTED = 1, 2, 4, 8
+
+_WELCOME = struct.Struct("<BHHBB")
+_INPUT = struct.Struct("<IIB")
+_SNAP = struct.Struct("<II")
+_PLAYER = struct.Struct("<BBIHH")
+
+
+# ────────────────────────────────────────────────────────────────────
+# 編碼
+# ────────────────────────────────────────────────────────────────────
+def pack_str(text):
+    data = text.encode("utf-8")[:32]
+    return bytes([len(data)]) + data
+
+
+def unpack_str(data, pos):
+    n = data[pos]
+    return data[pos + 1:pos + 1 + n].decode("utf-8", "replace"), pos + 1 + n
+
+
+def encode_cells(cells, board):
+    """cells 這些格子的目前值：依格子編號排序，每格 = 與上一格的間隔（varint）+ 值（uint16）。"""
+    out = bytearray()
+    prev = -1
+    for c in sorted(cells):
+        gap = c - prev - 1
+        prev = c
+        while gap >= 0x80:
+            out.append(gap & 0x7F | 0x80)
+            gap >>= 7
+        out.append(gap)
+        v = board[c]
+        out.append(v & 0xFF)
+        out.append(v >> 8)
+    return bytes(out)
+
+
+def decode_cells(data, pos, board):
+    """把 encode_cells 的結果寫進 board，回傳改了幾格。"""
+    c, n, end = -1, 0, len(data)
+    while pos < end:
+        gap = shift = 0
+        while True:
+            b = data[pos]
+            pos += 1
+            gap |= (b & 0x7F) << shift
+            if b < 0x80:
+                break
+            shift += 7
+        c += gap + 1
+        board[c] = data[pos] | data[pos + 1] << 8
+        pos += 2
+        n += 1
+    return n
+
+
+class LossyLink:
+    """包住 transport 模擬網路：每個送出的封包延遲 latency ± jitter 秒，loss 機率直接丟掉。"""
+
+    def __init__(self, transport, latency=0.0, jitter=0.0, loss=0.0, seed=None):
+        self.transport = transport
+        self.latency, self.jitter, self.loss = latency, jitter, loss
+        self.rng = random.Random(seed)
+        self.sent = self.dropped = self.bytes = 0
+
+    def sendto(self, data, addr=None):
+        self.sent += 1
+        self.bytes += len(data)
+        if self.loss and self.rng.random() < self.loss:
+            self.dropped += 1
+            return
+        delay = self.latency + (self.rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self._send, data, addr)
+        else:
+            self._send(data, addr)
+
+    def _send(self, data, addr):
+        if self.transport.is_closing():
+            return
+        if addr is None:
+            self.transport.sendto(data)
+        else:
+            self.transport.sendto(data, addr)
+
+    def close(self):
+        self.transport.close()
+
+
+# ────────────────────────────────────────────────────────────────────
+# 伺服器
+# ────────────────────────────────────────────────────────────────────
+class RemoteClient:
+    def __init__(self, addr, pid, name):
+        self.addr = addr
+        self.pid = pid
+        self.name = name
+        self.acked = NO_BASE    # 客戶端確定收到的最新 tick
+        self.seq = 0            # 已經收到的輸入序號
+        self.actions = deque()  # 還沒套用的方向，每個 tick 取一筆
+        self.seen = time.monotonic()
+
+
+class Room:
+    def __init__(self, server, name, config, seed=None):
+        self.server = server
+        self.name = name
+        self.sim = MultiSnakeSim(config, seed)
+        C = self.sim.grid_w * self.sim.grid_h
+        if C > MAX_CELLS:
+            raise ValueError(f"地圖太大（最多 {MAX_CELLS} 格）")
+        self.clients = {}           # addr → RemoteClient
+        self.board = array("H", bytes(2 * C))
+        self.log = []               # sim 會把有變動的格子記進來
+        self.sim.watchers.append(self.log)
+        self.refresh(range(C))
+        # history[-k]：第 tick - k + 1 個 tick 變動的格子
+        self.history = deque(maxlen=HISTORY)
+        self.task = None
+
+    def refresh(self, cells):
+        """重算 cells 的盤面值，回傳真的有變的格子。"""
+        occ, owner, board = self.sim.occ, self.sim.owner, self.board
+        changed = set()
+        for c in cells:
+            v = occ[c] | owner[c] << OWNER_SHIFT
+            if board[c] != v:
+                board[c] = v
+                changed.add(c)
+        return changed
+
+    def welcome(self, client):
+        sim = self.sim
+        portals = [sim.cell_id(p) for p in sim.portals]
+        return (MSG_WELCOME + _WELCOME.pack(client.pid, sim.grid_w, sim.grid_h, self.server.tick_rate, len(portals))
+                + struct.pack(f"<{len(portals)}I", *portals))
+
+    def player_table(self):
+        sim = self.sim
+        out = [bytes([len(sim.players)])]
+        for pid in sorted(sim.players):
+            pl = sim.players[pid]
+            flags = 0
+            if not pl.game_over:
+                flags |= PF_ALIVE | (PF_WAITING if pl.waiting_start else 0)
+                flags |= (PF_CONFUSED if pl.confuse_remaining > 0 else 0) | (PF_BOOSTED if pl.boost_remaining > 0 else 0)
+            head = sim.cell_id(pl.snake[0]) if not pl.game_over else 0
+            out.append(_PLAYER.pack(pid, flags, head, len(pl.snake), min(pl.best, 0xFFFF)) + pack_str(pl.name))
+        return b"".join(out)
+
+    def snapshot(self, base, players):
+        """相對於 base 這個 tick 的盤面封包（base 太舊或 NO_BASE 就送完整盤面）。"""
+        tick = self.sim.tick
+        if base != NO_BASE and tick - len(self.history) <= base <= tick:
+            cells = set()
+            for k in range(1, tick - base + 1):
+                cells |= self.history[-k]
+        else:
+            base = NO_BASE
+            cells = [c for c, v in enumerate(self.board) if v]
+        return MSG_SNAPSHOT + _SNAP.pack(tick, base) + players + encode_cells(cells, self.board)
+
+    def tick(self):
+        actions = {}
+        for client in self.clients.values():
+            if client.actions:
+                actions[client.pid] = client.actions.popleft()
+        self.sim.step(actions)
+        changed = self.refresh(set(self.log))
+        del self.log[:]
+        self.history.append(changed)
+
+        players = self.player_table()
+        packets = {}        # 同一個 base 的客戶端共用同一個封包
+        for client in self.clients.values():
+            if client.acked not in packets:
+                packets[client.acked] = self.snapshot(client.acked, players)
+            self.server.send(packets[client.acked], client.addr)
+
+    def drop_idle(self):
+        now = time.monotonic()
+        for client in [c for c in self.clients.values() if now - c.seen > CLIENT_TIMEOUT]:
+            self.server.remove(client.addr)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        period = 1 / self.server.tick_rate
+        due = loop.time()
+        while self.clients:
+            due += period
+            await asyncio.sleep(max(0.0, due - loop.time()))
+            self.drop_idle()
+            if self.clients:
+                self.tick()
+        self.server.rooms.pop(self.name, None)
+
+
+class GameServer(asyncio.DatagramProtocol):
+    def __init__(self, tick_rate=TICK_RATE, latency=0.0, jitter=0.0, loss=0.0, seed=None):
+        self.tick_rate = tick_rate
+        self.net = (latency, jitter, loss)
+        self.seed = seed
+        self.rooms = {}         # 房間名稱 → Room
+        self.by_addr = {}       # addr → Room
+        self.transport = None
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT):
+        loop = asyncio.get_running_loop()
+        await loop.create_datagram_endpoint(lambda: self, local_addr=(host, port))
+        return self.transport.transport.get_extra_info("sockname")
+
+    def connection_made(self, transport):
+        self.transport = LossyLink(transport, *self.net, seed=self.seed)
+
+    def close(self):
+        for room in self.rooms.values():
+            if room.task is not None:
+                room.task.cancel()
+        if self.transport is not None:
+            self.transport.close()
+
+    def send(self, data, addr):
+        self.transport.sendto(data, addr)
+
+    def datagram_received(self, data, addr):
+        try:
+            self.handle(data, addr)
+        except (IndexError, ValueError, struct.error):
+            pass        # 格式不對的封包直接丟掉
+
+    def error_received(self, exc):
+        pass
+
+    def handle(self, data, addr):
+        kind = data[:1]
+        room = self.by_addr.get(addr)
+        if kind == MSG_JOIN:
+            if room is None:
+                room = self.join(data, addr)
+                if room is None:
+                    return
+            self.send(room.welcome(room.clients[addr]), addr)     # 重送的 JOIN 也回（上一個 WELCOME 可能掉了）
+            return
+        if room is None:
+            return
+        client = room.clients[addr]
+        client.seen = time.monotonic()
+        if kind == MSG_INPUT:
+            ack, seq, n = _INPUT.unpack_from(data, 1)
+            if ack != NO_BASE and ack <= room.sim.tick and (client.acked == NO_BASE or ack > client.acked):
+                client.acked = ack
+            dirs = data[1 + _INPUT.size:1 + _INPUT.size + n]
+            if len(dirs) != n or any(d >= len(DIR_LIST) for d in dirs):
+                return
+            # 第 k 筆的序號是 seq - n + 1 + k，只收還沒收過的
+            for k in range(max(0, n - (seq - client.seq)), n):
+                if len(client.actions) < INPUT_QUEUE:
+                    client.actions.append(DIR_LIST[dirs[k]])
+            client.seq = max(client.seq, seq)
+        elif kind == MSG_LEAVE:
+            self.remove(addr)
+
+    def join(self, data, addr):
+        level, boss = data[1], data[2]
+        name, pos = unpack_str(data, 3)
+        player, _ = unpack_str(data, pos)
+        room = self.rooms.get(name)
+        if room is None:
+            # 房間的難度由第一個進來的人決定
+            try:
+                room = Room(self, name, make_config(min(max(level, 1), 3), bool(boss)), self.seed)
+            except ValueError as err:
+                self.send(MSG_ERROR + str(err).encode("utf-8"), addr)
+                return None
+            self.rooms[name] = room
+        try:
+            pid = room.sim.join(player or "player")
+        except ValueError as err:
+            self.send(MSG_ERROR + str(err).encode("utf-8"), addr)
+            return None
+        room.clients[addr] = RemoteClient(addr, pid, player)
+        self.by_addr[addr] = room
+        if room.task is None:
+            room.task = asyncio.ensure_future(room.run())
+        return room
+
+    def remove(self, addr):
+        room = self.by_addr.pop(addr, None)
+        if room is not None:
+            client = room.clients.pop(addr)
+            room.sim.leave(client.pid)
+
+
+# ────────────────────────────────────────────────────────────────────
+# 客戶端
+# ────────────────────────────────────────────────────────────────────
+class RemotePlayer:
+    def __init__(self, pid, flags, head, length, best, name):
+        self.pid, self.flags, self.head, self.length, self.best, self.name = pid, flags, head, length, best, name
+
+    @property
+    def alive(self):
+        return bool(self.flags & PF_ALIVE)
+
+
+class GameClient(asyncio.DatagramProtocol):
+    def __init__(self, room="lobby", name="player", level=1, boss=False,
+                 latency=0.0, jitter=0.0, loss=0.0, seed=None):
+        self.room, self.name, self.level, self.boss = room, name, level, boss
+        self.net = (latency, jitter, loss)
+        self.seed = seed
+        self.transport = None
+        self.pid = None
+        self.grid_w = self.grid_h = 0
+        self.tick_rate = TICK_RATE
+        self.portals = []
+        self.tick = NO_BASE         # 目前盤面是第幾個 tick（也是要 ack 的值）
+        self.board = None
+        self.players = {}           # pid → RemotePlayer
+        self.boards = {}            # tick → 盤面（差分的基準）
+        self.ticks = deque()
+        self.seq = 0                # 方向輸入序號（每按一次 +1）
+        self.dirs = deque(maxlen=INPUT_WINDOW)   # 最近幾筆方向（最後一筆的序號是 seq）
+        self.joined = None
+        self.error = None
+        self.snapshots = self.full_snapshots = self.snapshot_bytes = 0
+        self._keepalive = None
+
+    async def connect(self, host="127.0.0.1", port=DEFAULT_PORT, timeout=10.0):
+        loop = asyncio.get_running_loop()
+        self.joined = loop.create_future()
+        await loop.create_datagram_endpoint(lambda: self, remote_addr=(host, port))
+        self._keepalive = asyncio.ensure_future(self.keepalive())
+        await asyncio.wait_for(asyncio.shield(self.joined), timeout)
+
+    def connection_made(self, transport):
+        self.transport = LossyLink(transport, *self.net, seed=self.seed)
+
+    def close(self):
+        if self._keepalive is not None:
+            self._keepalive.cancel()
+        if self.transport is not None and not self.transport.transport.is_closing():
+            self.transport.transport.sendto(MSG_LEAVE)     # 不經過模擬網路，盡量讓伺服器收到
+            self.transport.close()
+
+    async def keepalive(self):
+        """還沒加入就重送 JOIN；加入後定時重送最新輸入（盤面全掉時伺服器也知道我們還在）。"""
+        while True:
+            if self.pid is None:
+                self.transport.sendto(MSG_JOIN + bytes([self.level, self.boss]) + pack_str(self.room) + pack_str(self.name))
+            else:
+                self.send_input()
+            await asyncio.sleep(KEEPALIVE)
+
+    def turn(self, direction):
+        """按一次方向鍵（(dx, dy)）。"""
+        self.seq += 1
+        self.dirs.append(DIR_LIST.index(direction))
+        self.send_input()
+
+    def send_input(self):
+        self.transport.sendto(MSG_INPUT + _INPUT.pack(self.tick, self.seq, len(self.dirs)) + bytes(self.dirs))
+
+    def me(self):
+        return self.players.get(self.pid)
+
+    def status_text(self):
+        status = f"room {self.room}  tick {self.tick if self.board is not None else '-'}"
+        me = self.me()
+        if me is not None:
+            status += "  you: " + (f"{me.length}" if me.alive else "respawning")
+            if me.alive and me.flags & PF_WAITING:
+                status += " (press a direction)"
+        return status
+
+    def datagram_received(self, data, addr):
+        try:
+            kind = data[:1]
+            if kind == MSG_SNAPSHOT and self.pid is not None:
+                self.on_snapshot(data)
+            elif kind == MSG_WELCOME and self.pid is None:
+                self.on_welcome(data)
+            elif kind == MSG_ERROR and not self.joined.done():
+                self.error = data[1:].decode("utf-8", "replace")
+                self.joined.set_exception(ConnectionError(self.error))
+        except (IndexError, ValueError, struct.error):
+            pass
+
+    def error_received(self, exc):
+        pass
+
+    def on_welcome(self, data):
+        pid, w, h, rate, n = _WELCOME.unpack_from(data, 1)
+        self.portals = list(struct.unpack_from(f"<{n}I", data, 1 + _WELCOME.size))
+        self.grid_w, self.grid_h, self.tick_rate = w, h, rate
+        self.pid = pid
+        if not self.joined.done():
+            self.joined.set_result(pid)
+
+    def on_snapshot(self, data):
+        tick, base = _SNAP.unpack_from(data, 1)
+        if self.tick != NO_BASE and tick <= self.tick:
+            return      # 比手上的舊（亂序 / 重複）
+        if base == NO_BASE:
+            board = array("H", bytes(2 * self.grid_w * self.grid_h))
+            self.full_snapshots += 1
+        elif base in self.boards:
+            board = array("H", self.boards[base])
+        else:
+            return      # 基準已經丟掉了；不 ack，伺服器會改送完整盤面
+        n, pos = data[1 + _SNAP.size], 2 + _SNAP.size
+        players = {}
+        for _ in range(n):
+            pid, flags, head, length, best = _PLAYER.unpack_from(data, pos)
+            name, pos = unpack_str(data, pos + _PLAYER.size)
+            players[pid] = RemotePlayer(pid, flags, head, length, best, name)
+        decode_cells(data, pos, board)
+
+        self.boards[tick] = board
+        self.ticks.append(tick)
+        while len(self.ticks) > HISTORY:
+            del self.boards[self.ticks.popleft()]
+        self.tick, self.board, self.players = tick, board, players
+        self.snapshots += 1
+        self.snapshot_bytes += len(data)
+        self.send_input()       # 順便 ack
+
+
+# ────────────────────────────────────────────────────────────────────
+# 客戶端畫面（pygame）
+# ────────────────────────────────────────────────────────────────────
+async def run_window(client, title=None):
+    """畫 client 收到的盤面，方向鍵 / WASD 轉向，Esc 或關視窗離開。
+    client 只要有 grid_w / grid_h / board / players / portals / pid、turn()、me()、status_text()
+    （spectate.FeedReader 也用這個畫面）。"""
+    import pygame
+    from font_cache import load_font
+    from snake_game import (
+        CELL_SIZE, SCOREBAR_H, DIRS, PORTAL_COLORS, C_BG, C_GRID, C_TEXT, C_SNAKE, C_SNAKE_CONFUSE,
+        C_FOOD, C_OBST, C_BOOST, C_BOMB, C_CONFUSE, C_FAKE_FOOD, C_FAKE_OBST,
+    )
+    from snake_core import OCC_OBSTACLE, OCC_FOOD, OCC_BOOST, OCC_BOMB, OCC_CONFUSE, OCC_FAKE, OCC_INVISIBLE, OCC_PORTAL
+
+    # 後面的蓋掉前面的（和 snake_game 的圖層順序相同）
+    layers = ((OCC_BOMB, C_BOMB), (OCC_FAKE, C_FAKE_FOOD), (OCC_INVISIBLE, C_FAKE_OBST), (OCC_OBSTACLE, C_OBST),
+              (OCC_FOOD, C_FOOD), (OCC_BOOST, C_BOOST), (OCC_CONFUSE, C_CONFUSE))
+    others = [(255, 140, 0), (0, 160, 255), (255, 105, 180), (160, 82, 45), (148, 0, 211), (0, 206, 209)]
+    pygame.init()
+    W, H = client.grid_w, client.grid_h
+    screen = pygame.display.set_mode((W * CELL_SIZE, H * CELL_SIZE + SCOREBAR_H))
+    pygame.display.set_caption(title or f"Snake – {client.room}")
+    font = load_font("Courier New", 18)
+    try:
+        while True:
+            for e in pygame.event.get():
+                if e.type == pygame.QUIT or (e.type == pygame.KEYDOWN and e.key == pygame.K_ESCAPE):
+                    return
+                if e.type == pygame.KEYDOWN and e.key in DIRS:
+                    client.turn(DIRS[e.key])
+
+            screen.fill(C_BG)
+            pygame.draw.rect(screen, C_GRID, (0, 0, W * CELL_SIZE, H * CELL_SIZE), 1)
+            me = client.me()
+            if client.board is not None:
+                portal_color = {c: PORTAL_COLORS[k // 2 % len(PORTAL_COLORS)] for k, c in enumerate(client.portals)}
+                for c, v in enumerate(client.board):
+                    if not v:
+                        continue
+                    rect = ((c % W) * CELL_SIZE, (c // W) * CELL_SIZE, CELL_SIZE, CELL_SIZE)
+                    owner = v >> 9
+                    if owner:
+                        if owner == client.pid:
+                            color = C_SNAKE_CONFUSE if me and me.flags & PF_CONFUSED else C_SNAKE
+                        else:
+                            color = others[owner % len(others)]
+                        pygame.draw.rect(screen, color, rect)
+                        continue
+                    color = portal_color.get(c) if v & OCC_PORTAL else None
+                    for flag, layer_color in layers:
+                        if v & flag:
+                            color = layer_color
+                    if color is not None:
+                        pygame.draw.rect(screen, color, rect)
+                for pl in client.players.values():
+                    if pl.alive:
+                        rect = ((pl.head % W) * CELL_SIZE, (pl.head // W) * CELL_SIZE, CELL_SIZE, CELL_SIZE)
+                        pygame.draw.rect(screen, C_TEXT, rect, 2)
+
+            status = client.status_text()
+            board = "  ".join(f"{pl.name}:{pl.length}" for pl in sorted(
+                client.players.values(), key=lambda p: -p.length)[:6])
+            screen.blit(font.render(status, True, C_TEXT), (8, H * CELL_SIZE + 4))
+            screen.blit(font.render(board, True, C_TEXT), (8, H * CELL_SIZE + 22))
+            pygame.display.flip()
+            await asyncio.sleep(1 / 60)
+    finally:
+        pygame.quit()
+
+
+# ────────────────────────────────────────────────────────────────────
+# 命令列
+# ────────────────────────────────────────────────────────────────────
+async def run_bots(args):
+    """無畫面機器人：每個 tick 有 15% 機率亂轉，跑完印出每個客戶端收到的盤面與流量。"""
+    clients = []
+    for i in range(args.bots):
+        client = GameClient(args.room, f"bot{i + 1}", min(args.level, 3), args.level == 4,
+                            args.latency, args.jitter, args.loss, seed=i)
+        await client.connect(args.host, args.port)
+        clients.append(client)
+    rng = random.Random(0)
+    t_end = time.monotonic() + args.seconds
+    while time.monotonic() < t_end:
+        for client in clients:
+            if rng.random() < 0.15:
+                client.turn(rng.choice(DIR_LIST))
+        await asyncio.sleep(1 / clients[0].tick_rate if clients else 0.1)
+    for client in clients:
+        me = client.me()
+        print(f"{client.name}: tick {client.tick}  snapshots {client.snapshots} (full {client.full_snapshots})  "
+              f"{client.snapshot_bytes / max(client.snapshots, 1):.0f} B/snapshot  "
+              f"sent {client.transport.sent} (dropped {client.transport.dropped})  "
+              f"best {me.best if me else '-'}")
+        client.close()
+
+
+async def amain(args):
+    if args.mode == "server":
+        server = GameServer(args.rate, args.latency, args.jitter, args.loss)
+        host, port = await server.start(args.host, args.port)
+        print(f"listening on {host}:{port}", file=sys.stderr)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            server.close()
+    elif args.bots:
+        await run_bots(args)
+    else:
+        client = GameClient(args.room, args.name, min(args.level, 3), args.level == 4,
+                            args.latency, args.jitter, args.loss)
+        await client.connect(args.host, args.port)
+        try:
+            await run_window(client)
+        finally:
+            client.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Snake 連線對戰")
+    parser.add_argument("mode", choices=["server", "client"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--rate", type=int, default=TICK_RATE, help="伺服器每秒幾個 tick")
+    parser.add_argument("--room", default="lobby")
+    parser.add_argument("--name", default="player")
+    parser.add_argument("--level", type=int, default=1, choices=[1, 2, 3, 4],
+                        help="新開房間的難度（4 = Boss；房間已存在就沿用）")
+    parser.add_argument("--bots", type=int, default=0, help="不開視窗，改跑 N 個亂走的機器人")
+    parser.add_argument("--seconds", type=float, default=30, help="機器人跑幾秒")
+    parser.add_argument("--latency", type=float, default=0.0, help="模擬延遲（秒，只作用在送出的封包）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="延遲的隨機 ± 範圍（秒）")
+    parser.add_argument("--loss", type=float, default=0.0, help="模擬掉封包機率 0~1")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(amain(args))
+    except KeyboardInterrupt:
+        pass
+    except (ConnectionError, asyncio.TimeoutError) as err:
+        print(f"連線失敗：{err or '伺服器沒有回應'}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Replay – 決定性對局的錄製與播放
+================================
+`SnakeSim` 用固定 seed + tick 計時器（`tick_timers=True`）時，整局只取決於
+seed、設定和玩家每個 tick 前按了哪些方向，所以重播檔只要存這三樣。
+
+檔案格式（little-endian）：
+
+    b"SNKR" | 版本 u8 | seed i64 | 設定 JSON 長度 u32 | 設定 JSON (utf-8)
+    | tick 數 u32 | 最終蛇長 u32 | 是否 Game Over u8 | token 數 u32 | token...
+
+每個 token 是一個 varint：`(次數 << 3) | 種類`，種類 0~3 = `turn(DIR_LIST[種類])`，
+4 = 連續 `step()` 次數（run-length）。一般一局只有幾 KB。
+
+```bash
+python replay.py game.snkr                          # 無畫面全速快轉，核對結果
+python snake_game.py --replay game.snkr --speed 4   # 有畫面，4 倍速
+```
+"""
+import argparse
+import json
+import struct
+import sys
+import time
+
+from snake_core import SnakeSim, DIR_LIST
+
+MAGIC   = b"SNKR"
+VERSION = 1
+TOKEN_STEP = 4
+
+_HEADER = struct.Struct("<4sBqI")
+_FOOTER = struct.Struct("<IIBI")
+SEED_MIN, SEED_MAX = -2**63, 2**63 - 1     # 檔頭的 seed 是 i64
+
+
+def seed_arg(text):
+    """argparse 用的 --seed 型別：整數，而且要放得進重播檔（i64），不然錄完才寫檔失敗。"""
+    try:
+        seed = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"seed 要是整數：{text!r}") from None
+    if not SEED_MIN <= seed <= SEED_MAX:
+        raise argparse.ArgumentTypeError(f"seed 要在 {SEED_MIN} ~ {SEED_MAX} 之間：{seed}")
+    return seed
+
+
+# ────────────────────────────────────────────────────────────────────
+# varint 編碼
+# ────────────────────────────────────────────────────────────────────
+def _put_varint(out, v):
+    while v >= 0x80:
+        out.append((v & 0x7F) | 0x80)
+        v >>= 7
+    out.append(v)
+
+
+def _get_varint(data, pos):
+    v = shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        v |= (b & 0x7F) << shift
+        if b < 0x80:
+            return v, pos
+        shift += 7
+
+
+# ────────────────────────────────────────────────────────────────────
+# 重播資料
+# ────────────────────────────────────────────────────────────────────
+class Replay:
+    """一局的 seed、設定與輸入 token [(種類, 次數), ...]。"""
+
+    def __init__(self, seed, config, tokens=None, ticks=0, final_length=0, game_over=False):
+        self.seed = seed
+        self.config = dict(config)
+        self.tokens = tokens if tokens is not None else []
+        self.ticks = ticks
+        self.final_length = final_length
+        self.game_over = game_over
+
+    def to_bytes(self):
+        cfg = json.dumps(self.config, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        out = bytearray(_HEADER.pack(MAGIC, VERSION, self.seed, len(cfg)))
+        out += cfg
+        out += _FOOTER.pack(self.ticks, self.final_length, self.game_over, len(self.tokens))
+        for kind, count in self.tokens:
+            _put_varint(out, (count << 3) | kind)
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, seed, cfg_len = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError("not a replay file")
+        if version != VERSION:
+            raise ValueError(f"unsupported replay version {version}")
+        pos = _HEADER.size
+        config = json.loads(data[pos:pos + cfg_len].decode("utf-8"))
+        pos += cfg_len
+        ticks, final_length, game_over, n = _FOOTER.unpack_from(data, pos)
+        pos += _FOOTER.size
+        tokens = []
+        for _ in range(n):
+            v, pos = _get_varint(data, pos)
+            tokens.append((v & 7, v >> 3))
+        return cls(seed, config, tokens, ticks, final_length, bool(game_over))
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+    def actions(self):
+        """依序產生 ("turn", 方向) / ("step", None)，播放時照順序套用即可。"""
+        for kind, count in self.tokens:
+            for _ in range(count):
+                if kind == TOKEN_STEP:
+                    yield "step", None
+                else:
+                    yield "turn", DIR_LIST[kind]
+
+
+class ReplayRecorder:
+    """包住一個 SnakeSim，turn() / step() 照常轉給它，同時記錄成 token。"""
+
+    def __init__(self, sim):
+        if sim.seed is None:
+            raise ValueError("replay needs a SnakeSim with an explicit seed")
+        if not SEED_MIN <= sim.seed <= SEED_MAX:
+            raise ValueError(f"replay seed must fit in a signed 64-bit integer: {sim.seed}")
+        if not sim.config["tick_timers"]:
+            raise ValueError("replay needs tick_timers=True (deterministic spawning)")
+        self.sim = sim
+        self.replay = Replay(sim.seed, sim.config)
+
+    def _push(self, kind):
+        tokens = self.replay.tokens
+        if tokens and tokens[-1][0] == kind:
+            tokens[-1] = (kind, tokens[-1][1] + 1)
+        else:
+            tokens.append((kind, 1))
+
+    def turn(self, nd):
+        self._push(DIR_LIST.index(nd))
+        self.sim.turn(nd)
+
+    def step(self, action=None):
+        if action is not None:
+            self.turn(action)
+        self._push(TOKEN_STEP)
+        self.replay.ticks += 1
+        events = self.sim.step()
+        self.replay.final_length = len(self.sim.snake)
+        self.replay.game_over = self.sim.game_over
+        return events
+
+    def save(self, path):
+        self.replay.save(path)
+
+
+def play(replay, on_step=None):
+    """無畫面全速重跑一份重播，回傳最後的 SnakeSim；on_step(sim, events) 每個 tick 呼叫一次。"""
+    sim = SnakeSim(replay.config, replay.seed)
+    for action, arg in replay.actions():
+        if action == "turn":
+            sim.turn(arg)
+        else:
+            events = sim.step()
+            if on_step is not None:
+                on_step(sim, events)
+    return sim
+
+
+def verify(replay, sim):
+    """重跑結果是否和錄製時一致。"""
+    return (sim.tick == replay.ticks and len(sim.snake) == replay.final_length
+            and sim.game_over == replay.game_over)
+
+
+# ────────────────────────────────────────────────────────────────────
+# 執行
+# ────────────────────────────────────────────────────────────────────
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("usage: python replay.py FILE.snkr")
+        sys.exit(2)
+    rp = Replay.load(sys.argv[1])
+    t0 = time.perf_counter()
+    sim = play(rp)
+    dt = time.perf_counter() - t0
+    print(f"seed {rp.seed}  level {rp.config['level']}{' boss' if rp.config['boss'] else ''}  "
+          f"{rp.ticks} ticks in {dt:.3f}s ({rp.ticks / max(dt, 1e-9):,.0f} ticks/s)")
+    print(f"length {len(sim.snake)}  game_over {sim.game_over}  "
+          f"{'OK' if verify(rp, sim) else 'MISMATCH (expected length %d)' % rp.final_length}")
+    sys.exit(0 if verify(rp, sim) else 1)
@@ -0,0 +1,394 @@
+"""
+ScoreStore – 排行榜存檔（SQLite）
+=================================
+取代原本每次 Game Over 都把 `scores_level{N}{_boss}.txt` 整個讀進來、排序、覆寫的做法：
+
+* 每位玩家在每個 (難度, 模式) 只留最高分，主鍵 (level, boss, name) → 查個人最佳 O(log n)；
+* 另有 (level, boss, score) 索引，前 k 名只讀 k 筆；
+* 寫入是單一 UPSERT，交給 SQLite 的交易與檔案鎖處理，多個遊戲同時寫同一個檔也不會蓋掉別人的分數；
+* 第一次開啟時會匯入同目錄下舊的 `scores_level*.txt`（舊檔保留不動）；
+* 日誌模式預設用 WAL（讀的人不會擋住寫的人），但 WAL 需要共享記憶體，放在網路磁碟
+  （NFS / SMB 掛載的家目錄）上不可靠，這時自動改用 DELETE 日誌 + 忙碌等待；也可以用 journal= 指定。
+
+```python
+store = ScoreStore("scores.db")
+store.submit("ginny", 42, level=2)
+store.top(2, k=5)           # [("ginny", 42), ...]
+store.best("ginny", 2)      # 42
+```
+
+遊戲主迴圈用 `ScoreWorker`：寫入丟進佇列由背景執行緒批次寫入，排行榜留在記憶體裡，
+顯示時不碰磁碟。
+"""
+import os
+import re
+import queue
+import sqlite3
+import threading
+import time
+
+DEFAULT_PATH = "scores.db"
+JOURNAL_MODES = ("wal", "delete")
+# 什麼時候值得整理：WAL 檔超過 WAL_LIMIT bytes 就 checkpoint，空頁超過 FREE_RATIO 才 VACUUM
+WAL_LIMIT = 4 * 1024 * 1024
+FREE_RATIO = 0.25
+FREE_MIN_PAGES = 64
+BUSY_TIMEOUT = 10.0     # 檔案被別的程序鎖住時，一次寫入最多等幾秒
+# 不能用 WAL 的檔案系統（/proc/mounts 的第三欄）
+_NETWORK_FS = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "afs", "9p", "ceph", "glusterfs", "lustre",
+               "fuse.sshfs", "fuse.glusterfs", "fuse.cephfs", "davfs", "fuse.davfs2"}
+_TXT_NAME = re.compile(r"^scores_level(\d+)(_boss)?\.txt$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    level INTEGER NOT NULL,
+    boss  INTEGER NOT NULL,
+    name  TEXT    NOT NULL,
+    score INTEGER NOT NULL,
+    PRIMARY KEY (level, boss, name)
+);
+CREATE INDEX IF NOT EXISTS scores_rank ON scores (level, boss, score DESC);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# 同一位玩家只保留最高分
+_UPSERT = ("INSERT INTO scores (level, boss, name, score) VALUES (?, ?, ?, ?) "
+           "ON CONFLICT (level, boss, name) DO UPDATE SET score = excluded.score "
+           "WHERE excluded.score > scores.score")
+
+
+def on_network_fs(path):
+    """path 是否在網路檔案系統上（Windows 看 UNC 路徑，Linux 查 /proc/mounts；查不到當作本機）。"""
+    path = os.path.abspath(path)
+    if path.startswith("\\\\"):
+        return True
+    try:
+        with open("/proc/mounts", "r", encoding="utf-8") as f:
+            mounts = [line.split()[1:3] for line in f]
+    except OSError:
+        return False
+    best, fstype = "", None
+    for mount, kind in mounts:
+        mount = mount.replace("\\040", " ")
+        inside = path == mount or path.startswith(mount.rstrip("/") + "/")
+        if inside and len(mount) > len(best):
+            best, fstype = mount, kind
+    return fstype in _NETWORK_FS
+
+
+class ScoreStore:
+    def __init__(self, path=DEFAULT_PATH, import_dir=None, journal=None, busy_timeout=BUSY_TIMEOUT):
+        """import_dir：從哪裡匯入舊的 txt 排行榜（預設為資料庫所在目錄）。
+        journal："wal" / "delete"；None = 自動（網路磁碟或開不了 WAL 時用 delete）。
+        busy_timeout：檔案被鎖住時最多等幾秒。"""
+        if journal is not None and journal not in JOURNAL_MODES:
+            raise ValueError(f"journal 只能是 {JOURNAL_MODES} 或 None：{journal!r}")
+        self.path = path
+        self.journal = journal or ("delete" if on_network_fs(path) else "wal")
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()   # sqlite 連線不能跨執行緒共用，每條執行緒各開一個
+
+        db = self._db()
+        with db:
+            db.executescript(_SCHEMA)
+        if import_dir is None:
+            import_dir = os.path.dirname(os.path.abspath(path))
+        self.import_text_files(import_dir, once=True)
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=self.busy_timeout)
+            self._set_journal(db)
+            self._local.db = db
+        return db
+
+    def _set_journal(self, db):
+        if self.journal == "wal":
+            try:
+                mode = db.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+            except sqlite3.OperationalError:
+                mode = None
+            if mode == "wal":
+                db.execute("PRAGMA synchronous=NORMAL")
+                return
+            self.journal = "delete"     # 開不了 WAL（沒有共享記憶體等），之後的連線都用 DELETE
+        try:
+            db.execute("PRAGMA journal_mode=DELETE")
+        except sqlite3.OperationalError:
+            pass        # 別的程序還開著 WAL，SQLite 會沿用原本的模式
+
+    def set_busy_timeout(self, seconds):
+        """改這條執行緒的連線（與之後開的連線）被鎖住時最多等幾秒。"""
+        self.busy_timeout = seconds
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.execute(f"PRAGMA busy_timeout = {int(seconds * 1000)}")
+
+    def close(self):
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+    # ────────────────────────────────────────────────
+    # 寫入
+    # ────────────────────────────────────────────────
+    def submit(self, name, score, level, boss=False):
+        """記錄一局分數；只有超過該玩家的最佳分才會更新。回傳是否刷新紀錄。"""
+        db = self._db()
+        with db:
+            cur = db.execute(_UPSERT, (level, int(boss), name, score))
+        return cur.rowcount > 0
+
+    def submit_many(self, rows):
+        """rows：[(name, score, level, boss), ...]，一次交易寫完。"""
+        db = self._db()
+        with db:
+            db.executemany(_UPSERT, [(level, int(boss), name, score) for name, score, level, boss in rows])
+
+    # ────────────────────────────────────────────────
+    # 查詢
+    # ────────────────────────────────────────────────
+    def top(self, level, boss=False, k=5):
+        """前 k 名 [(name, score), ...]；k=None 取全部。"""
+        sql = "SELECT name, score FROM scores WHERE level = ? AND boss = ? ORDER BY score DESC, name"
+        args = (level, int(boss))
+        if k is not None:
+            sql += " LIMIT ?"
+            args += (k,)
+        return self._db().execute(sql, args).fetchall()
+
+    def best(self, name, level, boss=False):
+        """該玩家的最佳分，沒玩過回傳 None。"""
+        row = self._db().execute(
+            "SELECT score FROM scores WHERE level = ? AND boss = ? AND name = ?",
+            (level, int(boss), name)).fetchone()
+        return row[0] if row else None
+
+    # ────────────────────────────────────────────────
+    # 匯入舊檔 / 整理
+    # ────────────────────────────────────────────────
+    def import_text_files(self, directory, once=False):
+        """匯入 directory 裡的 scores_level{N}{_boss}.txt，回傳匯入筆數。
+        once=True 時只在第一次執行（記在 meta 表裡）。"""
+        db = self._db()
+        if once and db.execute("SELECT 1 FROM meta WHERE key = 'imported_txt'").fetchone():
+            return 0
+        rows = []
+        for fn in sorted(os.listdir(directory)):
+            m = _TXT_NAME.match(fn)
+            if not m:
+                continue
+            level, boss = int(m.group(1)), m.group(2) is not None
+            # 舊版檔案不一定是 UTF-8：讀不懂的字元換掉，不要讓整個匯入失敗
+            with open(os.path.join(directory, fn), "r", encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    name, sep, score = line.strip().rpartition(",")
+                    if sep and score.lstrip("-").isdigit():
+                        rows.append((name, int(score), level, boss))
+        with db:
+            db.executemany(_UPSERT, [(level, int(boss), name, score) for name, score, level, boss in rows])
+            db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('imported_txt', '1')")
+        return len(rows)
+
+    def compact(self):
+        """把 WAL 併回主檔並重整資料庫（可在背景執行緒呼叫）。"""
+        db = self._db()
+        db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        db.execute("VACUUM")
+        db.execute("PRAGMA optimize")
+
+    def compact_if_needed(self):
+        """只在需要時整理：WAL 太大就 checkpoint，空頁太多才 compact()（VACUUM）。
+        只看檔案大小和兩個 PRAGMA，很便宜；回傳做了什麼（"vacuum" / "checkpoint" / None）。"""
+        db = self._db()
+        free = db.execute("PRAGMA freelist_count").fetchone()[0]
+        pages = db.execute("PRAGMA page_count").fetchone()[0]
+        if free >= FREE_MIN_PAGES and free > pages * FREE_RATIO:
+            self.compact()
+            return "vacuum"
+        try:
+            wal = os.path.getsize(self.path + "-wal")
+        except OSError:
+            wal = 0
+        if wal > WAL_LIMIT:
+            db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            return "checkpoint"
+        return None
+
+
+# ────────────────────────────────────────────────────────────────────
+# 背景存檔
+# ────────────────────────────────────────────────────────────────────
+def _merge(board, rows, size):
+    """把 rows 併進排行榜（每人取最高分），回傳前 size 名。"""
+    best = dict(board)
+    for name, score in rows:
+        if score > best.get(name, score - 1):
+            best[name] = score
+    return sorted(best.items(), key=lambda t: (-t[1], t[0]))[:size]
+
+
+class ScoreWorker:
+    """背景存檔執行緒：submit() 只把分數丟進佇列，資料庫的開啟、匯入、寫入都在背景做。
+    排行榜前 cache_size 名留在記憶體（送出的分數立刻併進去），顯示時不必等磁碟。"""
+
+    BATCH = 256
+    RETRY_DELAY = 0.2       # 寫入失敗後第一次重試前等幾秒，之後每次加倍
+    RETRY_MAX_DELAY = 10.0
+    STOP_RETRIES = 4        # close(timeout=None) 時還有沒寫進去的分數，最多再試幾次
+    STOP_MARGIN = 0.1       # close() 的 timeout 留這麼多秒給背景收尾，重試不會超過 close 願意等的時間
+    COMPACT_EVERY = 300.0   # 閒下來時最多每幾秒檢查一次要不要整理資料庫
+
+    def __init__(self, path=DEFAULT_PATH, cache_size=50, journal=None):
+        self.path = path
+        self.journal = journal
+        self.cache_size = cache_size
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._boards = {}            # (level, boss) → [(name, score), ...]
+        self._unwritten = 0          # 背景結束時還沒寫進去的分數
+        self._stopped = False        # 背景是收到 stop 才結束的（不是中途掛掉）
+        self._thread = threading.Thread(target=self._run, name="score-writer", daemon=True)
+        self._thread.start()
+
+    # ────────────────────────────────────────────────
+    # 主執行緒用（都不做 I/O）
+    # ────────────────────────────────────────────────
+    def submit(self, name, score, level, boss=False):
+        key = (level, bool(boss))
+        with self._lock:
+            self._boards[key] = _merge(self._boards.get(key, ()), [(name, score)], self.cache_size)
+        self._queue.put(("submit", (name, score, level, bool(boss))))
+
+    def prefetch(self, level, boss=False):
+        """請背景先把這個排行榜讀進快取。"""
+        self._queue.put(("load", (level, bool(boss))))
+
+    def leaderboard(self, level, boss=False, k=5):
+        """快取裡的前 k 名；k=None 取整個快取。"""
+        with self._lock:
+            board = self._boards.get((level, bool(boss)), [])
+        return list(board if k is None else board[:k])
+
+    def flush(self, timeout=None):
+        """等佇列裡的寫入都寫完；逾時、寫入失敗或背景已經結束都回傳 False。"""
+        if not self._thread.is_alive():
+            return False
+        done, result = threading.Event(), []
+        self._queue.put(("flush", (done, result)))
+        return done.wait(timeout) and result == [True]
+
+    def close(self, timeout=2.0):
+        """寫完剩下的分數後結束背景執行緒，最多等 timeout 秒；回傳是否全部寫完
+        （背景中途掛掉、或還有分數沒寫進去都回傳 False）。"""
+        if self._thread.is_alive():
+            # 把期限一起送過去：寫入失敗的重試（含等鎖）都要在 close 放棄等待之前結束
+            deadline = None if timeout is None else time.monotonic() + max(0.0, timeout - self.STOP_MARGIN)
+            self._queue.put(("stop", deadline))
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                print(f"⚠ 分數還沒寫完（剩 {self._queue.qsize()} 筆），放棄等待")
+                return False
+        if not self._stopped:
+            print("⚠ 存檔執行緒中途結束，分數可能沒寫進排行榜")
+            return False
+        if self._unwritten or not self._queue.empty():
+            print(f"⚠ 有分數沒寫進排行榜（{self._unwritten + self._queue.qsize()} 筆）")
+            return False
+        return True
+
+    # ────────────────────────────────────────────────
+    # 背景執行緒
+    # ────────────────────────────────────────────────
+    def _write(self, store, rows, busy_timeout=BUSY_TIMEOUT):
+        """寫入 rows（必要時先開資料庫），等鎖最多 busy_timeout 秒；回傳 (store, 是否成功)。"""
+        try:
+            if store is None:
+                store = ScoreStore(self.path, journal=self.journal, busy_timeout=busy_timeout)
+            elif store.busy_timeout != busy_timeout:
+                store.set_busy_timeout(busy_timeout)
+            if rows:
+                store.submit_many(rows)
+            return store, True
+        except (sqlite3.Error, OSError, ValueError) as err:
+            # 其他例外也接住：寫入執行緒一掛，之後排進來的分數都會丟掉
+            print(f"⚠ 分數寫入失敗（{err}），稍後重試")
+            return store, False
+
+    def _run(self):
+        store, _ = self._write(None, ())
+        last_check = None   # 上次檢查要不要整理的時間（第一次閒下來就檢查）
+
+        pending = []    # 寫入失敗（資料庫被鎖太久）的分數，下一批再試
+        delay = self.RETRY_DELAY
+        stop = False
+        deadline = None     # close() 願意等到什麼時候（None = 沒有期限）
+        while not stop:
+            try:
+                # 有沒寫進去的分數時不要一直等佇列，逾時就重試
+                batch = [self._queue.get(timeout=delay if pending or store is None else None)]
+            except queue.Empty:
+                batch = []
+            while len(batch) < self.BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            rows, loads, waiters = pending, set(), []
+            for op, arg in batch:
+                if op == "submit":
+                    rows.append(arg)
+                elif op == "load":
+                    loads.add(arg)
+                elif op == "flush":
+                    waiters.append(arg)
+                elif op == "stop":
+                    stop, deadline = True, arg
+
+            left = lambda: BUSY_TIMEOUT if deadline is None else max(0.0, deadline - time.monotonic())
+            store, ok = self._write(store, rows, min(BUSY_TIMEOUT, left()) if stop else BUSY_TIMEOUT)
+            pending = [] if ok else rows
+            delay = self.RETRY_DELAY if ok else min(delay * 2, self.RETRY_MAX_DELAY)
+            if stop:
+                # 收尾：沒有期限就最多重試 STOP_RETRIES 次；有期限就一直試到期限，不超過 close 會等的時間
+                tries = 0
+                while not ok and (left() > 0 if deadline is not None else tries < self.STOP_RETRIES):
+                    tries += 1
+                    time.sleep(min(delay, left() / 2))
+                    delay = min(delay * 2, self.RETRY_MAX_DELAY)
+                    store, ok = self._write(store, pending, min(BUSY_TIMEOUT, left()))
+                if ok:
+                    pending = []
+            if store is not None:
+                for level, boss in loads:
+                    try:
+                        top = store.top(level, boss, k=self.cache_size)
+                    except sqlite3.Error as err:
+                        print(f"⚠ 排行榜讀取失敗（{err}）")
+                        continue
+                    with self._lock:
+                        key = (level, boss)
+                        self._boards[key] = _merge(self._boards.get(key, ()), top, self.cache_size)
+            for done, result in waiters:
+                result.append(ok)
+                done.set()
+
+            # 佇列空了（沒有分數在等）才順便看要不要整理，而且每 COMPACT_EVERY 秒最多一次
+            now = time.monotonic()
+            if (not stop and ok and store is not None and self._queue.empty()
+                    and (last_check is None or now - last_check >= self.COMPACT_EVERY)):
+                last_check = now
+                try:
+                    store.compact_if_needed()
+                except sqlite3.OperationalError:
+                    pass        # 別的程序正在寫，下次再整理
+        self._unwritten = len(pending)
+        self._stopped = True
+        if store is not None:
+            store.close()
@@ -0,0 +1,988 @@
+"""
+Snake 規則核心（不依賴 pygame）
+=================================
+把 `SnakeGame.update()` 裡的遊戲規則抽出來，方便機器人、測試、伺服器端重播共用。
+
+用法：
+```python
+sim = SnakeSim(make_config(level=2), seed=42)
+while not sim.game_over:
+    sim.step((1, 0))      # 方向 (dx, dy) 或 None（維持原方向）
+print(len(sim.snake), sim.age)
+```
+"""
+import heapq
+import random
+from array import array
+
+# ────────────────────────────────────────────────────────────────────
+# 規則參數
+# ────────────────────────────────────────────────────────────────────
+GRID_W, GRID_H    = 50, 50
+FPS_BASE          = 8
+OBSTACLE_COUNT    = 25
+INITIAL_FOOD      = 3
+NEW_FOOD_EVENT_MS = 2500
+BOOST_EVENT_MS    = 10000          # 新閃電道具產生間隔(ms)
+BOOST_DURATION    = 450            # 加速持續 frame 數（依 FPS 計）
+BOOST_FPS_INC     = 4
+BOMB_EVENT_MS     = 8000
+BOMB_EFFECT       = 3              # 被扣掉的長度
+CONFUSE_INTERVAL  = 12000          # 每 12 秒嘗試產生一個迷惑道具
+CONFUSE_DURATION  = 5 * FPS_BASE   # 持續 5 秒（依 FPS 計）
+BOSS_SHRINK_INTERVAL = 10000       # 每 10 秒減 1 格
+BOMB_MOVE_INTERVAL   = 3000        # 每 3 秒移動炸彈
+FAKE_FOOD_EVENT_MS   = 5000
+SPEED_UP_TICKS    = 150            # 每活過幾個 tick 基礎速度 +1（speed_increment）
+BOSS_INVISIBLE    = 8              # Boss 模式開局的隱形障礙數
+BOSS_SHRINK_TICKS = FPS_BASE * 10  # Boss 模式每活過幾個 tick 額外減 1 格
+MAP_TRIES   = 100                  # 開局地圖不連通就重新生成，最多幾次
+PLACE_TRIES = 20                   # 移動障礙時一個障礙最多重抽幾次（都會切斷路線就不放）
+
+# 難度 (障礙刷新 ms, 食物刷新 ms)
+DIFFICULTY_SETTINGS = {
+    1: {"obst_ms": 0,     "food_ms": 0,     "obst_count": 10, "food_count": 5, "bomb_count": 1, "confuse_count": 1, "portal_pairs": 1},
+    2: {"obst_ms": 4000,  "food_ms": 0,     "obst_count": 20, "food_count": 4, "bomb_count": 2, "confuse_count": 1, "portal_pairs": 2},
+    3: {"obst_ms": 3000,  "food_ms": 3000,  "obst_count": 35, "food_count": 3, "bomb_count": 3, "confuse_count": 2, "portal_pairs": 3},
+}
+
+# 上、下、左、右
+DIR_LIST = [(0, -1), (0, 1), (-1, 0), (1, 0)]
+
+
+def make_config(level=1, boss=False, **overrides):
+    """依難度組出一份完整設定（dict），overrides 可覆寫任何欄位。"""
+    cfg = dict(DIFFICULTY_SETTINGS[level])
+    cfg.update(
+        level=level,
+        boss=boss,
+        grid_w=GRID_W,
+        grid_h=GRID_H,
+        speed_increment=True,
+        randomized_start=True,
+        tick_timers=True,      # 生成 / 移動依 tick 排程；False = 完全不自動觸發（呼叫端自己 fire）
+        map_check=True,        # 開局地圖要整張連通、移動障礙不能切斷路線（舊重播沒有這個欄位 = 不檢查）
+        paired_portals=True,   # 傳送門依生成順序兩兩一對（0↔1、2↔3…）；舊重播沒有這個欄位 = 原本的 1 - idx
+        portal_cooldown=0,     # 傳送過的那對門幾個 tick 內失效（當成一般格子）；0 = 沒有冷卻
+        portal_dirs=False,     # 每個傳送門有固定的出口方向：從那一個門出來時蛇頭轉成那個方向
+    )
+    cfg.update(overrides)
+    return cfg
+
+
+# make_config() 沒列出、但 SnakeSim / timer_periods() 會讀的選用欄位（沒給就用預設值）
+OPTIONAL_CONFIG_KEYS = frozenset({
+    "bomb_ms", "confuse_ms", "spawn_food_ms", "boost_ms", "shrink_ms", "bomb_move_ms", "fake_food_ms",
+    "speed_every", "speed_step", "speed_max", "invisible_count", "boss_shrink_ticks", "obst_move_count", "walls",
+})
+
+
+def timer_periods(cfg):
+    """各計時事件的週期（ms），只列出這個設定會用到的。
+    固定週期也可以在設定裡覆寫（bomb_ms、confuse_ms、spawn_food_ms、boost_ms、
+    shrink_ms、bomb_move_ms、fake_food_ms），調平衡（sweep.py）時用。"""
+    periods = {
+        "bomb":    cfg.get("bomb_ms", BOMB_EVENT_MS),
+        "confuse": cfg.get("confuse_ms", CONFUSE_INTERVAL),
+        "food":    cfg.get("spawn_food_ms", NEW_FOOD_EVENT_MS),
+        "boost":   cfg.get("boost_ms", BOOST_EVENT_MS),
+    }
+    if cfg["obst_ms"] > 0:
+        periods["move_obstacles"] = cfg["obst_ms"]
+    if cfg["food_ms"] > 0:
+        periods["move_foods"] = cfg["food_ms"]
+    if cfg["boss"]:
+        periods["boss_shrink"] = cfg.get("shrink_ms", BOSS_SHRINK_INTERVAL)
+        periods["move_bombs"]  = cfg.get("bomb_move_ms", BOMB_MOVE_INTERVAL)
+        periods["fake_food"]   = cfg.get("fake_food_ms", FAKE_FOOD_EVENT_MS)
+    return periods
+
+
+def ms_to_ticks(ms):
+    return max(1, round(ms * FPS_BASE / 1000))
+
+
+class TickScheduler:
+    """遊戲時間排程器：週期工作依「第幾個 tick 到期」放在 heap 裡。
+    同一個 tick 到期的工作照註冊順序觸發；clear() 整個清空（重開一局時用）。"""
+
+    def __init__(self):
+        self.jobs = []      # heap：[到期 tick, 註冊序號, 週期, 名稱]
+        self.seq = 0
+
+    def every(self, period, name, start=0):
+        """從 start 起每 period 個 tick 觸發一次 name，回傳可以給 cancel() 的工作。"""
+        job = [start + period, self.seq, period, name]
+        self.seq += 1
+        heapq.heappush(self.jobs, job)
+        return job
+
+    def cancel(self, job):
+        job[2] = 0          # 延後移除：輪到它時直接丟掉
+
+    def clear(self):
+        self.jobs = []
+        self.seq = 0
+
+    def due(self, tick):
+        """回傳到 tick 為止到期的工作名稱（依序），並排好下一次。"""
+        jobs = self.jobs
+        fired = []
+        while jobs and jobs[0][0] <= tick:
+            job = jobs[0]
+            if job[2] == 0:
+                heapq.heappop(jobs)
+                continue
+            fired.append(job[3])
+            job[0] += job[2]
+            heapq.heapreplace(jobs, job)
+        return fired
+
+
+def world_config(level, boss, grid_w, grid_h, base=None, **overrides):
+    """大地圖用的設定：障礙、食物數量依面積放大（50×50 時和 make_config 相同）。
+    base：從這份設定的格數、數量放大（例如關卡檔組出來的），預設 make_config(level, boss)。"""
+    if base is None:
+        base = make_config(level, boss)
+    cfg = dict(base, grid_w=grid_w, grid_h=grid_h, **overrides)
+    scale = (grid_w * grid_h) / (base["grid_w"] * base["grid_h"])
+    for key in ("obst_count", "food_count"):
+        if key not in overrides:
+            cfg[key] = max(1, round(base[key] * scale))
+    return cfg
+
+
+def fixed_start(W, H):
+    """randomized_start 關掉時的起點：(蛇頭, 方向)，地圖正中央、向右。"""
+    return (W // 2, H // 2), (1, 0)
+
+
+def start_cells(head, direction):
+    """開局要空著的格子：蛇頭、身體、尾巴、下一步。"""
+    dx, dy = direction
+    body = (head[0] - dx, head[1] - dy)
+    return head, body, (body[0] - dx, body[1] - dy), (head[0] + dx, head[1] + dy)
+
+
+# ────────────────────────────────────────────────────────────────────
+# 格子佔用索引
+# ────────────────────────────────────────────────────────────────────
+# 每格的佔用旗標（occ[y*W+x]）；蛇身另外用 body_count 計數（傳送門出口可能重疊）
+OCC_SNAKE     = 1 << 0
+OCC_OBSTACLE  = 1 << 1
+OCC_FOOD      = 1 << 2
+OCC_BOOST     = 1 << 3
+OCC_BOMB      = 1 << 4
+OCC_CONFUSE   = 1 << 5
+OCC_FAKE      = 1 << 6
+OCC_INVISIBLE = 1 << 7
+OCC_PORTAL    = 1 << 8
+OCC_ALL       = (1 << 9) - 1
+OCC_WALL      = OCC_OBSTACLE | OCC_INVISIBLE    # 走進去就 Game Over 的格子
+
+# 道具集合的屬性名 → 旗標
+ITEM_FLAGS = {
+    "obstacles":           OCC_OBSTACLE,
+    "food":                OCC_FOOD,
+    "boosts":              OCC_BOOST,
+    "bombs":               OCC_BOMB,
+    "confuses":            OCC_CONFUSE,
+    "fake_food":           OCC_FAKE,
+    "invisible_obstacles": OCC_INVISIBLE,
+}
+
+# 各種生成 / 移動不能落在哪些東西上（沒列到的道具可以重疊，和原本規則一樣）
+SPAWN_RULES = {
+    "food":           OCC_SNAKE | OCC_OBSTACLE | OCC_FOOD,
+    "boost":          OCC_SNAKE | OCC_OBSTACLE | OCC_FOOD | OCC_BOOST,
+    "bomb":           OCC_SNAKE | OCC_OBSTACLE | OCC_FOOD | OCC_BOOST | OCC_BOMB,
+    "confuse":        OCC_SNAKE | OCC_OBSTACLE | OCC_FOOD | OCC_BOOST | OCC_BOMB | OCC_CONFUSE,
+    "fake_food":      OCC_SNAKE | OCC_OBSTACLE | OCC_FOOD | OCC_FAKE,
+    "portal":         OCC_SNAKE | OCC_OBSTACLE | OCC_FOOD | OCC_BOOST | OCC_BOMB | OCC_CONFUSE | OCC_PORTAL,
+    "move_obstacles": OCC_SNAKE | OCC_FOOD | OCC_BOOST | OCC_OBSTACLE,
+    "move_foods":     OCC_SNAKE | OCC_OBSTACLE | OCC_FOOD,
+    "move_bombs":     OCC_SNAKE | OCC_FOOD | OCC_BOOST | OCC_OBSTACLE | OCC_BOMB,
+}
+
+
+# 走進格子時的效果：update() 只讀一次格子的佔用旗標，照順序呼叫格子上有的那幾個。
+# 新增道具 = 一個旗標、ITEM_FLAGS / SPAWN_RULES 各一項、這裡一項（SnakeSim 上寫一個方法），update() 不用改。
+# 每項：(旗標, SnakeSim 方法名稱, 死因)；方法回傳 True 就 Game Over（記下死因），同階段後面的不再處理
+#   enter：蛇頭移過去之前（撞到就停在原地）
+#   moved：蛇頭移過去之後
+#   late ：Boss 縮短之後（和原本 update() 的判斷順序相同，Game Over 時的長度才不會差一格）
+CELL_EFFECTS = {
+    "enter": ((OCC_OBSTACLE, "hit_wall", "obstacle"),
+              (OCC_SNAKE,    "hit_body", "self"),
+              (OCC_BOMB,     "eat_bomb", None)),
+    "moved": ((OCC_FOOD,     "eat_food", None),
+              (OCC_CONFUSE,  "eat_confuse", None),
+              (OCC_BOOST,    "eat_boost", None)),
+    "late":  ((OCC_FAKE,      "eat_fake_food", None),
+              (OCC_INVISIBLE, "hit_wall", "invisible")),
+}
+
+
+class FreeCells:
+    """完全空著的格子（沒有蛇身、沒有任何道具）。
+    cells 是密集陣列、pos 反查索引，加入 / 移除 / 抽第 k 個都是 O(1)。
+    用 array 存（每格 4 bytes），1000×1000 的大地圖也不會建出上百萬個 int 物件。"""
+
+    def __init__(self, n):
+        self.cells = array("i", range(n))
+        self.pos = array("i", self.cells)
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __getitem__(self, k):
+        return self.cells[k]
+
+    def add(self, c):
+        self.pos[c] = len(self.cells)
+        self.cells.append(c)
+
+    def remove(self, c):
+        k = self.pos[c]
+        last = self.cells.pop()
+        if last != c:
+            self.cells[k] = last
+            self.pos[last] = k
+
+
+class SnakeBody:
+    """蛇身：預先配置的 x / y 座標陣列當環形緩衝，body[0] 是蛇頭。
+    頭部加一格、尾巴 / 頭部拿一格、頭尾互換（reverse）都是 O(1)，截斷只移動端點、不複製。
+    「某格有沒有蛇身」不在這裡查，看 SnakeSim.body_count。"""
+
+    def __init__(self, capacity=16):
+        self.cap = max(2, capacity)
+        self.xs = array("i", [0]) * self.cap
+        self.ys = array("i", [0]) * self.cap
+        self.lo = 0          # 實際存放的起點
+        self.n = 0
+        self.head_lo = True  # 蛇頭在 lo 那一端；reverse 只要翻轉它
+
+    def __len__(self):
+        return self.n
+
+    def _slot(self, k):
+        """第 k 格（0 = 蛇頭）在陣列裡的位置。"""
+        if k < 0:
+            k += self.n
+        if not 0 <= k < self.n:
+            raise IndexError("snake index out of range")
+        if self.head_lo:
+            return (self.lo + k) % self.cap
+        return (self.lo + self.n - 1 - k) % self.cap
+
+    def __getitem__(self, k):
+        i = self._slot(k)
+        return self.xs[i], self.ys[i]
+
+    def __iter__(self):
+        xs, ys, cap, lo, n = self.xs, self.ys, self.cap, self.lo, self.n
+        order = range(n) if self.head_lo else range(n - 1, -1, -1)
+        for k in order:
+            i = (lo + k) % cap
+            yield xs[i], ys[i]
+
+    def index(self, p):
+        """從蛇頭往後找第一個等於 p 的位置（O(n)，只在撞到自己時用）。"""
+        for k, q in enumerate(self):
+            if q == p:
+                return k
+        raise ValueError(f"{p} is not in snake")
+
+    def _grow(self):
+        cells = list(self)
+        self.cap *= 2
+        self.xs = array("i", [0]) * self.cap
+        self.ys = array("i", [0]) * self.cap
+        for i, (x, y) in enumerate(cells):
+            self.xs[i] = x
+            self.ys[i] = y
+        self.lo = 0
+        self.head_lo = True
+
+    def push_head(self, p):
+        if self.n == self.cap:
+            self._grow()
+        if self.head_lo:
+            self.lo = (self.lo - 1) % self.cap
+            i = self.lo
+        else:
+            i = (self.lo + self.n) % self.cap
+        self.xs[i], self.ys[i] = p
+        self.n += 1
+
+    def push_tail(self, p):
+        if self.n == self.cap:
+            self._grow()
+        if self.head_lo:
+            i = (self.lo + self.n) % self.cap
+        else:
+            self.lo = (self.lo - 1) % self.cap
+            i = self.lo
+        self.xs[i], self.ys[i] = p
+        self.n += 1
+
+    def pop_tail(self):
+        if self.head_lo:
+            i = (self.lo + self.n - 1) % self.cap
+        else:
+            i = self.lo
+            self.lo = (self.lo + 1) % self.cap
+        self.n -= 1
+        return self.xs[i], self.ys[i]
+
+    def pop_head(self):
+        if self.head_lo:
+            i = self.lo
+            self.lo = (self.lo + 1) % self.cap
+        else:
+            i = (self.lo + self.n - 1) % self.cap
+        self.n -= 1
+        return self.xs[i], self.ys[i]
+
+    def reverse(self):
+        self.head_lo = not self.head_lo
+
+
+# ────────────────────────────────────────────────────────────────────
+# 模擬核心
+# ────────────────────────────────────────────────────────────────────
+class SnakeSim:
+    def __init__(self, config=None, seed=None, layout=None):
+        self.config = config if config is not None else make_config()
+        self.seed = seed
+        self.rng = random.Random(seed)
+
+        cfg = self.config
+        self.grid_w = cfg["grid_w"]
+        self.grid_h = cfg["grid_h"]
+        self.boss = cfg["boss"]
+        self.obstacle_count = cfg["obst_count"]
+        self.initial_food   = cfg["food_count"]
+        self.max_bombs      = cfg["bomb_count"]
+        self.max_confuses   = cfg["confuse_count"]
+        self.num_portal_pairs = cfg["portal_pairs"]
+        self.portal_cooldown  = cfg.get("portal_cooldown", 0)
+        # 關卡檔可以調的規則（舊設定沒有這些欄位 = 原本寫死的值）
+        self.speed_every = cfg.get("speed_every", SPEED_UP_TICKS)
+        self.speed_step  = cfg.get("speed_step", 1)
+        self.speed_max   = cfg.get("speed_max", 0)        # 0 = 不設上限
+        self.invisible_count   = cfg.get("invisible_count", BOSS_INVISIBLE)
+        self.boss_shrink_ticks = cfg.get("boss_shrink_ticks", BOSS_SHRINK_TICKS)
+        self.moving_obstacles  = cfg.get("obst_move_count", OBSTACLE_COUNT)   # 每次移動障礙後有幾個
+        # 固定牆：開局先放、不會被定時移動的障礙
+        self.wall_cells = [tuple(p) for p in cfg.get("walls", ())]
+        self.walls = frozenset(self.wall_cells)
+
+        self.timer_ticks = {name: ms_to_ticks(ms) for name, ms in timer_periods(cfg).items()}
+        # 效果登錄表先綁成方法（子類別覆寫的方法也會用到），加上每個階段的旗標聯集讓沒東西的格子直接跳過
+        self.effects = {phase: tuple((flag, getattr(self, name), cause) for flag, name, cause in items)
+                        for phase, items in CELL_EFFECTS.items()}
+        self.effect_masks = {phase: sum(flag for flag, _, _ in items) for phase, items in CELL_EFFECTS.items()}
+        self.scheduler = TickScheduler()
+        self.events = []
+        self.watchers = []      # 每個 list 都會收到佔用有變動的格子編號（畫面、自動駕駛用）
+
+        self.reset(layout)
+
+    # ────────────────────────────────────────────────
+    # 初始化 / 重開
+    # ────────────────────────────────────────────────
+    def reset(self, layout=None):
+        """重開一局。給 layout（見 layout()）就直接照它擺，不用重新生成。"""
+        self.pending_growth = 0
+        self.age = 0
+        self.tick = 0
+        self.game_over = False
+        self.death_cause = None     # Game Over 的原因："obstacle" / "self" / "invisible"
+        self.waiting_start = True
+        self.events = []
+        self.confuse_remaining = 0
+        self.portal_ready = {}      # 傳送門格子 → 第幾個 tick 起可以再用（冷卻）
+
+        # 上一局的排程全部作廢，從 tick 0 重新排
+        self.scheduler.clear()
+        if self.config["tick_timers"]:
+            for name, period in self.timer_ticks.items():
+                self.scheduler.every(period, name)
+
+        if layout is not None:
+            self.load_layout(layout)
+        else:
+            # map_check：有蛇頭走不到的格子（被障礙圍住的死角）就整張重新生成
+            for _ in range(MAP_TRIES):
+                self.generate()
+                if not self.config.get("map_check") or self.map_connected():
+                    break
+
+        # 重設速度
+        self.base_fps = FPS_BASE
+        self.fps = FPS_BASE
+        self.boost_remaining = 0
+
+    def generate(self):
+        """隨機擺出開局地圖：蛇、障礙、食物、隱形障礙、傳送門。"""
+        rng = self.rng
+        W, H = self.grid_w, self.grid_h
+
+        # 初始蛇身
+        tries = 0
+        while tries < 1000:
+            if self.config["randomized_start"]:
+                head = (rng.randint(5, W-6), rng.randint(5, H-6))
+                dir_idx = rng.choice(DIR_LIST)
+            else:
+                head, dir_idx = fixed_start(W, H)
+
+            _, body, tail, next_step = start_cells(head, dir_idx)
+            if all(0 <= x < W and 0 <= y < H for x, y in [body, next_step]) \
+                    and not self.walls.intersection((head, body, tail, next_step)):
+                break
+            tries += 1
+
+        dx, dy = dir_idx
+        self.direction = (dx, dy)
+
+        # 佔用索引：一開始全部是空格
+        C = W * H
+        self.occ = array("H", bytes(2 * C))
+        self.body_count = bytearray(C)
+        self.free = FreeCells(C)
+        for kind in ITEM_FLAGS:
+            setattr(self, kind, set())
+        self.portals = []       # 傳送門位置，依生成順序（配對見 link_portals）
+        self.portal_dirs = []   # 各傳送門的出口方向（portal_dirs 關掉時是空的）
+        self.portal_exits = {}  # 入口格子編號 → (出口格子編號, 出口方向或 None)
+
+        self.snake = SnakeBody(C + 1)
+        for p in [head, (head[0] - dx, head[1] - dy), (head[0] - 2*dx, head[1] - 2*dy)]:
+            self.snake.push_tail(p)
+            self._body_add(p)
+
+        # 保護區域：頭前一步先從空格拿掉，障礙、食物、隱形障礙都不會放在那裡
+        nxt = (head[0] + dx, head[1] + dy)
+        protect = None
+        if 0 <= nxt[0] < W and 0 <= nxt[1] < H and self.is_free(nxt):
+            protect = self.cell_id(nxt)
+            self.free.remove(protect)
+
+        # 固定牆（蛇的開局位置已經避開；頭前一步一樣保護）
+        for p in self.wall_cells:
+            if self.is_free(p) and self.cell_id(p) != protect:
+                self.place("obstacles", p)
+
+        total_needed = self.obstacle_count + self.initial_food
+        if len(self.free) < total_needed:
+            raise ValueError("⚠ 地圖太小或障礙數量太多，請減少設定")
+
+        # 障礙與食物（map_check 時每放一個牆都先確認不會把地圖切開，最後 reset 再整張檢查一次）
+        check = self.keeps_connected if self.config.get("map_check") else None
+        for _ in range(self.obstacle_count):
+            self.spawn("obstacles", OCC_ALL, check)
+        for _ in range(self.initial_food):
+            self.spawn("food", OCC_ALL)
+
+        # Boss 模式才需要生成 invisible_obstacles
+        n = self.invisible_count
+        if self.boss and n and len(self.free) >= n:
+            for _ in range(n):
+                self.spawn("invisible_obstacles", OCC_ALL, check)
+
+        if protect is not None:
+            self.free.add(protect)
+
+        self.spawn_portals()
+
+    def layout(self):
+        """目前的地圖（通常是剛開局時）連同 RNG 狀態，可以 pickle 傳到別的程序。
+        reset(layout) 之後和用同一個 seed 自己生成的 sim 完全相同，之後的計時生成也一樣。"""
+        layout = {
+            "grid": (self.grid_w, self.grid_h),
+            "rng": self.rng.getstate(),
+            "snake": list(self.snake),
+            "direction": self.direction,
+            "occ": array("H", self.occ),
+            "body_count": bytes(self.body_count),
+            "free": (array("i", self.free.cells), array("i", self.free.pos)),
+            "portals": list(self.portals),
+            "portal_dirs": list(self.portal_dirs),
+        }
+        for kind in ITEM_FLAGS:
+            layout[kind] = sorted(getattr(self, kind))
+        return layout
+
+    def load_layout(self, layout):
+        """照 layout() 的內容擺好地圖（佔用索引整塊複製，不重算）。"""
+        if tuple(layout["grid"]) != (self.grid_w, self.grid_h):
+            raise ValueError(f"地圖大小不符：{layout['grid']}")
+        self.rng.setstate(layout["rng"])
+        self.direction = tuple(layout["direction"])
+        self.occ = array("H", layout["occ"])
+        self.body_count = bytearray(layout["body_count"])
+        self.free = FreeCells(0)
+        self.free.cells = array("i", layout["free"][0])
+        self.free.pos = array("i", layout["free"][1])
+        for kind in ITEM_FLAGS:
+            setattr(self, kind, set(map(tuple, layout[kind])))
+        self.portals = [tuple(p) for p in layout["portals"]]
+        self.portal_dirs = [tuple(d) for d in layout["portal_dirs"]]
+        self.link_portals()
+        self.snake = SnakeBody(self.grid_w * self.grid_h + 1)
+        for p in layout["snake"]:
+            self.snake.push_tail(tuple(p))
+
+    # ────────────────────────────────────────────────
+    # 輸入
+    # ────────────────────────────────────────────────
+    def turn(self, nd):
+        """套用一次方向輸入（含混亂反轉、禁止直接回頭）。"""
+        # 🌀 如果進入混亂狀態，上下左右全部反轉
+        if self.confuse_remaining > 0:
+            nd = (-nd[0], -nd[1])
+
+        if self.waiting_start or (nd[0] != -self.direction[0] or nd[1] != -self.direction[1]):
+            self.direction = nd
+            self.waiting_start = False
+
+    def step(self, action=None):
+        """推進一個 tick，回傳這個 tick 發生的事件名稱列表。"""
+        self.events = []
+        if action is not None:
+            self.turn(action)
+        if not self.game_over:
+            self.update()
+        self.tick += 1
+        for name in self.scheduler.due(self.tick):
+            self.fire(name)
+        return self.events
+
+    def fire(self, name):
+        """處理一個計時事件（生成 / 移動道具、Boss 縮短）。"""
+        if self.game_over:
+            return
+        if name == "bomb":
+            if len(self.bombs) < self.max_bombs:
+                self.spawn_bomb()
+        elif name == "confuse":
+            # 限制增加速度，不要太快增加太多
+            if len(self.confuses) < self.max_confuses + self.age // 300:
+                self.spawn_confuse()
+        elif name == "food":
+            self.spawn_food()
+        elif name == "boost":
+            if len(self.boosts) < 1:
+                self.spawn_boost()
+        elif name == "move_obstacles":
+            self.relocate_obstacles()
+        elif name == "move_foods":
+            self.relocate_foods()
+        elif name == "fake_food" and self.boss:
+            self.spawn_fake_food()
+        elif name == "move_bombs" and self.boss:
+            self.relocate_bombs()
+        elif name == "boss_shrink" and self.boss:
+            if len(self.snake) > 1:
+                self.pop_tail()
+
+    # ────────────────────────────────────────────────
+    # 核心更新
+    # ────────────────────────────────────────────────
+    def update(self):
+        if self.waiting_start:
+            return  # 還沒按鍵，不更新位置
+
+        # FPS 自增
+        self.age += 1
+        if self.config["speed_increment"] and self.age % self.speed_every == 0:
+            self.base_fps += self.speed_step
+            if self.speed_max:
+                self.base_fps = min(self.base_fps, self.speed_max)
+            if self.boost_remaining == 0:
+                self.fps = self.base_fps
+
+        # Boost 時間減少
+        if self.boost_remaining > 0:
+            self.boost_remaining -= 1
+            if self.boost_remaining == 0:
+                self.fps = self.base_fps
+
+        if self.confuse_remaining > 0:
+            self.confuse_remaining -= 1
+
+        # 計算下一格
+        hx, hy = self.snake[0]
+        dx, dy = self.direction
+        nx, ny = hx+dx, hy+dy
+
+        # 邊界處理：對側傳送
+        if nx < 0:
+            nx = self.grid_w - 1
+        elif nx >= self.grid_w:
+            nx = 0
+        if ny < 0:
+            ny = self.grid_h - 1
+        elif ny >= self.grid_h:
+            ny = 0
+
+        new_head = (nx, ny)
+
+        # 這一格上有什麼：讀一次佔用旗標（蛇身另外算成 OCC_SNAKE）
+        c = self.cell_id(new_head)
+        flags = self.occ[c]
+
+        # 傳送門處理：進入後立即傳送到另一邊（查表 O(1)；冷卻中的傳送門當成一般格子）
+        if flags & OCC_PORTAL and self.tick >= self.portal_ready.get(c, 0):
+            e, exit_dir = self.portal_exits[c]
+            new_head = (e % self.grid_w, e // self.grid_w)
+            if self.portal_cooldown:
+                self.portal_ready[c] = self.portal_ready[e] = self.tick + self.portal_cooldown
+            if exit_dir is not None:
+                self.direction = exit_dir
+
+            # 移動蛇：直接從出口出現（跳過一般移動流程）
+            self.push_head(new_head)
+            if self.pending_growth:
+                self.pending_growth -= 1
+            else:
+                self.pop_tail()
+            self.events.append("portal")
+            return
+
+        if self.body_count[c]:
+            flags |= OCC_SNAKE
+
+        # 碰撞、炸彈（格子上沒有這個階段的東西就連呼叫都省掉，大部分 tick 是這樣）
+        masks = self.effect_masks
+        if flags & masks["enter"] and self.apply_effects("enter", flags, new_head):
+            return
+
+        # 移動蛇
+        self.push_head(new_head)
+        if self.pending_growth:
+            self.pending_growth -= 1
+        else:
+            self.pop_tail()
+
+        # 食物、混亂、加速
+        if flags & masks["moved"] and self.apply_effects("moved", flags, new_head):
+            return
+
+        # Boss 模式效果
+        if self.boss:
+            if self.boss_shrink_ticks and self.age % self.boss_shrink_ticks == 0 and len(self.snake) > 1:
+                self.pop_tail()
+
+        # 假食物、隱形障礙
+        if flags & masks["late"]:
+            self.apply_effects("late", flags, new_head)
+
+    def apply_effects(self, phase, flags, p):
+        """依 CELL_EFFECTS 處理這個階段、格子上有的效果；Game Over 的話回傳 True。"""
+        for flag, handler, cause in self.effects[phase]:
+            if flags & flag and handler(p):
+                self.game_over = True
+                self.death_cause = cause
+                self.events.append("game_over")
+                return True
+        return False
+
+    # ────────────────────────────────────────────────
+    # 走進格子的效果（登錄在 CELL_EFFECTS；回傳 True = Game Over）
+    # ────────────────────────────────────────────────
+    def hit_wall(self, p):
+        return True
+
+    def eat_bomb(self, p):
+        self.take("bombs", p)
+        self.events.append("bomb")
+        # 扣掉尾巴
+        self.cut_tail(len(self.snake) - BOMB_EFFECT if len(self.snake) > BOMB_EFFECT else 1)
+
+    def eat_food(self, p):
+        self.take("food", p)
+        self.pending_growth += 1
+        self.snake.reverse()
+        if len(self.snake) >= 2:
+            hx, hy = self.snake[0]; nx, ny = self.snake[1]
+            self.direction = (hx-nx, hy-ny)
+        self.events.append("food")
+
+    def eat_confuse(self, p):
+        self.take("confuses", p)
+        self.confuse_remaining = CONFUSE_DURATION
+        self.events.append("confuse")
+
+    def eat_boost(self, p):
+        self.take("boosts", p)
+        self.boost_remaining = BOOST_DURATION
+        self.fps = self.base_fps + BOOST_FPS_INC
+        self.events.append("boost")
+
+    def eat_fake_food(self, p):
+        self.take("fake_food", p)
+        penalty = self.rng.randint(2, 5)
+        self.cut_tail(len(self.snake) - penalty if len(self.snake) > penalty else 1)
+        self.events.append("fake_food")
+
+    def snapshot(self):
+        """目前狀態的複本（dict），給機器人 / 重播比對用。"""
+        return {
+            "snake": list(self.snake),
+            "direction": self.direction,
+            "food": set(self.food),
+            "obstacles": set(self.obstacles),
+            "bombs": set(self.bombs),
+            "boosts": set(self.boosts),
+            "confuses": set(self.confuses),
+            "portals": list(self.portals),
+            "fake_food": set(self.fake_food),
+            "invisible_obstacles": set(self.invisible_obstacles),
+            "age": self.age,
+            "fps": self.fps,
+            "boost_remaining": self.boost_remaining,
+            "confuse_remaining": self.confuse_remaining,
+            "game_over": self.game_over,
+        }
+
+    # ────────────────────────────────────────────────
+    # 佔用索引維護：蛇身與道具的增減都要經過這裡
+    # ────────────────────────────────────────────────
+    def portal_exit(self, p):
+        """走進傳送門 p 之後會從哪裡出來（不管冷卻）。"""
+        e = self.portal_exits[self.cell_id(p)][0]
+        return e % self.grid_w, e // self.grid_w
+
+    def cell_id(self, p):
+        return p[1] * self.grid_w + p[0]
+
+    def is_free(self, p):
+        c = self.cell_id(p)
+        return not self.occ[c] and not self.body_count[c]
+
+    def _mark(self, c, flag):
+        if not self.occ[c] and not self.body_count[c]:
+            self.free.remove(c)
+        self.occ[c] |= flag
+        for log in self.watchers:
+            log.append(c)
+
+    def _unmark(self, c, flag):
+        self.occ[c] &= ~flag
+        if not self.occ[c] and not self.body_count[c]:
+            self.free.add(c)
+        for log in self.watchers:
+            log.append(c)
+
+    def _body_add(self, p):
+        c = self.cell_id(p)
+        if not self.occ[c] and not self.body_count[c]:
+            self.free.remove(c)
+        self.body_count[c] += 1
+        for log in self.watchers:
+            log.append(c)
+
+    def _body_remove(self, p):
+        c = self.cell_id(p)
+        self.body_count[c] -= 1
+        if not self.occ[c] and not self.body_count[c]:
+            self.free.add(c)
+        for log in self.watchers:
+            log.append(c)
+
+    def hit_body(self, p):
+        """蛇頭走進有蛇身的格子 p：撞到自己（長度 > 2）會從撞到的地方斷掉，回傳是否 Game Over。"""
+        if len(self.snake) <= 2:
+            return False
+        self.cut_head(self.snake.index(p))
+        return True
+
+    def place(self, kind, p):
+        getattr(self, kind).add(p)
+        self._mark(self.cell_id(p), ITEM_FLAGS[kind])
+
+    def take(self, kind, p):
+        getattr(self, kind).remove(p)
+        self._unmark(self.cell_id(p), ITEM_FLAGS[kind])
+
+    def push_head(self, p):
+        self.snake.push_head(p)
+        self._body_add(p)
+
+    def pop_tail(self):
+        self._body_remove(self.snake.pop_tail())
+
+    def cut_tail(self, keep):
+        """只留前 keep 格（snake[:keep]），從尾巴一格一格拿掉。"""
+        while len(self.snake) > keep:
+            self.pop_tail()
+
+    def cut_head(self, k):
+        """snake = snake[k:]，從蛇頭一格一格拿掉。"""
+        for _ in range(k):
+            self._body_remove(self.snake.pop_head())
+
+    # ────────────────────────────────────────────────
+    # 工具：隨機生成 / 移動道具
+    # ────────────────────────────────────────────────
+    def _overlap_cells(self, exclude):
+        """可以和新道具重疊的已佔用格（依格子編號排序）。
+        只掃 exclude 沒排除的道具（數量很少），和蛇長、盤面滿不滿無關；蛇身一律排除。"""
+        extras = set()
+        for kind, flag in ITEM_FLAGS.items():
+            if not flag & exclude:
+                for p in getattr(self, kind):
+                    c = self.cell_id(p)
+                    if not self.occ[c] & exclude and not self.body_count[c]:
+                        extras.add(c)
+        if not OCC_PORTAL & exclude:
+            for p in self.portals:
+                c = self.cell_id(p)
+                if not self.occ[c] & exclude and not self.body_count[c]:
+                    extras.add(c)
+        return sorted(extras)
+
+    def sample_cell(self, exclude):
+        """在沒有 exclude 裡任何東西的格子中均勻抽一格（回傳格子編號）。
+        只要還有合法位置就一定抽得到；完全沒有時回傳 None。"""
+        extras = self._overlap_cells(exclude) if exclude != OCC_ALL else ()
+        n = len(self.free) + len(extras)
+        if n == 0:
+            return None
+        r = self.rng.randrange(n)
+        return self.free[r] if r < len(self.free) else extras[r - len(self.free)]
+
+    def spawn(self, kind, exclude, check=None):
+        """抽一格放 kind；給 check 的話 check(格子編號) 不通過就重抽，PLACE_TRIES 次都不行就不放。"""
+        for _ in range(PLACE_TRIES if check is not None else 1):
+            c = self.sample_cell(exclude)
+            if c is None:
+                return
+            if check is None or check(c):
+                self.place(kind, (c % self.grid_w, c // self.grid_w))
+                return
+
+    def relocate(self, kind, count, exclude, check=None):
+        """整批重放：先收掉舊的（依格子編號順序，固定牆不動），再一個一個重抽。"""
+        for p in sorted(getattr(self, kind) - self.walls, key=self.cell_id):
+            self.take(kind, p)
+        for _ in range(count):
+            self.spawn(kind, exclude, check)
+
+    def spawn_food(self):
+        self.spawn("food", SPAWN_RULES["food"])
+
+    def spawn_boost(self):
+        self.spawn("boosts", SPAWN_RULES["boost"])
+
+    def spawn_bomb(self):
+        self.spawn("bombs", SPAWN_RULES["bomb"])
+
+    def spawn_confuse(self):
+        self.spawn("confuses", SPAWN_RULES["confuse"])
+
+    def spawn_portals(self):
+        exclude = SPAWN_RULES["portal"]
+        total_needed = self.num_portal_pairs * 2
+        if len(self.free) + len(self._overlap_cells(exclude)) < total_needed:
+            return
+        for _ in range(total_needed):
+            c = self.sample_cell(exclude)
+            self.portals.append((c % self.grid_w, c // self.grid_w))
+            self._mark(c, OCC_PORTAL)
+        if self.config.get("portal_dirs"):
+            self.portal_dirs = [self.rng.choice(DIR_LIST) for _ in self.portals]
+        self.link_portals()
+
+    def link_portals(self):
+        """建 portal_exits 查表（開局擺好傳送門之後一次建好，之後每個 tick 只查表）。
+        paired_portals：第 2k 和 2k+1 個是一對，幾對都可以；舊設定沿用原本的 portals[1 - idx]
+        （只有第一對是對的，之後的門會接到清單尾端）。"""
+        n = len(self.portals)
+        paired = self.config.get("paired_portals")
+        cells = [self.cell_id(p) for p in self.portals]
+        self.portal_exits = {}
+        for k, c in enumerate(cells):
+            other = k ^ 1 if paired else (1 - k) % n
+            self.portal_exits[c] = (cells[other], self.portal_dirs[other] if self.portal_dirs else None)
+
+    def spawn_fake_food(self):
+        self.spawn("fake_food", SPAWN_RULES["fake_food"])
+
+    def random_edge_position(self):
+        side = self.rng.choice(["top", "bottom", "left", "right"])
+        if side == "top":
+            return self.rng.randint(0, self.grid_w-1), 0
+        elif side == "bottom":
+            return self.rng.randint(0, self.grid_w-1), self.grid_h-1
+        elif side == "left":
+            return 0, self.rng.randint(0, self.grid_h-1)
+        else:
+            return self.grid_w-1, self.rng.randint(0, self.grid_h-1)
+
+    def relocate_obstacles(self):
+        check = self.keeps_connected if self.config.get("map_check") else None
+        self.relocate("obstacles", self.moving_obstacles, SPAWN_RULES["move_obstacles"], check)
+
+    def relocate_foods(self):
+        self.relocate("food", len(self.food), SPAWN_RULES["move_foods"])
+
+    def relocate_bombs(self):
+        self.relocate("bombs", len(self.bombs), SPAWN_RULES["move_bombs"])
+
+    # ────────────────────────────────────────────────
+    # 連通檢查（地圖上下左右相通，傳送門直接跳到出口）
+    # ────────────────────────────────────────────────
+    def reachable(self, start=None):
+        """從 start（預設蛇頭）走得到哪些格子：bytearray，1 = 走得到。
+        障礙、隱形障礙走不進去；蛇身當成走得到（之後會移開）；踩進傳送門就從出口那格出來。"""
+        W, C = self.grid_w, self.grid_w * self.grid_h
+        occ = self.occ
+        exits = self.portal_exits
+        seen = bytearray(C)
+        s = self.cell_id(start if start is not None else self.snake[0])
+        seen[s] = 1
+        stack = [s]
+        while stack:
+            c = stack.pop()
+            x = c % W
+            row = c - x
+            for n in (row + (x + 1) % W, row + (x - 1) % W, (c + W) % C, (c - W) % C):
+                f = occ[n]
+                if f & OCC_PORTAL:
+                    n = exits[n][0]
+                elif f & OCC_WALL:
+                    continue
+                if not seen[n]:
+                    seen[n] = 1
+                    stack.append(n)
+        return seen
+
+    def map_connected(self):
+        """障礙、隱形障礙、傳送門以外的每一格都要從蛇頭走得到（食物因此也一定吃得到）。"""
+        seen = self.reachable()
+        blocked = {self.cell_id(p) for kind in ("obstacles", "invisible_obstacles") for p in getattr(self, kind)}
+        blocked.update(self.cell_id(p) for p in self.portals)
+        reached = seen.count(1) - sum(seen[c] for c in blocked)
+        return reached == self.grid_w * self.grid_h - len(blocked)
+
+    def keeps_connected(self, c):
+        """在格子 c 放障礙會不會把地圖切開：只看周圍一圈 8 格（O(1)，不做整張 flood fill）。
+        上下左右還能走的格子沿著這圈彼此連得通，原本經過 c 的路就都能繞過去；
+        旁邊有傳送門一律當作不行（出口被堵住的話繞不過去）。"""
+        W, H, occ = self.grid_w, self.grid_h, self.occ
+        x, y = c % W, c // W
+        # 上、右上、右、右下、下、左下、左、左上
+        ring = [occ[((y + dy) % H) * W + (x + dx) % W]
+                for dx, dy in ((0, -1), (1, -1), (1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1))]
+        if any(ring[i] & OCC_PORTAL for i in (0, 2, 4, 6)):
+            return False
+        open_ = [not f & (OCC_WALL | OCC_PORTAL) for f in ring]
+        sides = sum(open_[i] for i in (0, 2, 4, 6))
+        links = sum(open_[i] and open_[i + 1] and open_[(i + 2) % 8] for i in (0, 2, 4, 6))
+        # 四邊一圈全通是 1 塊；否則每個相通的角把兩塊接成一塊
+        return links == 4 or sides - links <= 1
@@ -0,0 +1,149 @@
+"""
+SnakeEnv – 強化學習用的單局環境（Gym 介面）
+==========================================
+包一個 `SnakeSim`，提供 `reset()` / `step()`（gymnasium 的回傳格式）。
+
+觀察值是 uint8 張量 `(9, grid_h, grid_w)`，每種東西一個平面（`PLANES` 的順序）：
+蛇身、蛇頭、食物、障礙、炸彈、加速、混亂、傳送門、假食物。隱形障礙不放進去（玩家也看不到）。
+
+* 平面只在開局時整張建立；之後 sim 佔用有變動的格子（`SnakeSim.watchers`）才重寫，
+  每個 tick 通常只有蛇頭、蛇尾那幾格；
+* `reset()` / `step()` 回傳的 obs 是環境自己那塊 NumPy 陣列（不複製），下一次 step 會被改掉，
+  要留下來請自己 `obs.copy()`；
+* 獎勵：長度每 +1 給 `growth`（炸彈、假食物變短就是負的），每活過一個 tick 給 `alive`，
+  Game Over 給 `death`（見 `DEFAULT_REWARDS`，建構時可覆寫）；
+* 動作：0~3 = DIR_LIST，-1 / None = 不轉向（和 BatchSnakeEnv 一樣）。
+
+```python
+env = SnakeEnv(make_config(2), seed=0)
+obs, info = env.reset()
+while True:
+    obs, reward, terminated, truncated, info = env.step(policy(obs))
+    if terminated or truncated:
+        obs, info = env.reset()
+```
+
+需要 numpy；有裝 gymnasium 的話會是 `gymnasium.Env` 子類別並帶 observation / action space。
+"""
+import numpy as np
+
+from snake_core import (
+    SnakeSim, make_config, DIR_LIST,
+    OCC_FOOD, OCC_OBSTACLE, OCC_BOMB, OCC_BOOST, OCC_CONFUSE, OCC_PORTAL, OCC_FAKE, OCC_ALL,
+)
+
+try:
+    import gymnasium as gym
+except ImportError:
+    gym = None
+
+PLANES = ("body", "head", "food", "obstacles", "bombs", "boosts", "confuses", "portals", "fake_food")
+
+# 道具平面（第 2 個起）對應的佔用旗標
+ITEM_PLANE_FLAGS = (OCC_FOOD, OCC_OBSTACLE, OCC_BOMB, OCC_BOOST, OCC_CONFUSE, OCC_PORTAL, OCC_FAKE)
+
+# occ 值 → 每個道具平面是 0 或 1（查表，一次算完一批格子）
+_ITEM_LUT = np.array([[1 if occ & flag else 0 for occ in range(OCC_ALL + 1)]
+                      for flag in ITEM_PLANE_FLAGS], dtype=np.uint8)
+
+DEFAULT_REWARDS = {"growth": 1.0, "alive": 0.01, "death": -1.0}
+
+
+class SnakeEnv(gym.Env if gym is not None else object):
+    metadata = {"render_modes": []}
+
+    def __init__(self, config=None, seed=None, max_ticks=None, rewards=None):
+        self.config = config if config is not None else make_config()
+        self.max_ticks = max_ticks
+        self.rewards = dict(DEFAULT_REWARDS, **(rewards or {}))
+        self.sim = SnakeSim(self.config, seed)
+        W, H = self.sim.grid_w, self.sim.grid_h
+
+        self.obs = np.zeros((len(PLANES), H, W), dtype=np.uint8)
+        self._flat = self.obs.reshape(len(PLANES), W * H)     # 同一塊記憶體，用格子編號寫
+        self.log = []               # sim 會把有變動的格子記進來
+        self.sim.watchers.append(self.log)
+        self._load()
+
+        if gym is not None:
+            self.observation_space = gym.spaces.Box(0, 1, self.obs.shape, dtype=np.uint8)
+            self.action_space = gym.spaces.Discrete(len(DIR_LIST))
+
+    def close(self):
+        """不再跟著 sim 更新。"""
+        # 用 is 比對：空的 list 彼此相等，remove() 可能拿掉別人的
+        self.sim.watchers[:] = [log for log in self.sim.watchers if log is not self.log]
+
+    # ────────────────────────────────────────────────
+    # Gym 介面
+    # ────────────────────────────────────────────────
+    def reset(self, seed=None, options=None):
+        """重開一局；給 seed 就用它重設 sim 的 RNG。回傳 (obs, info)。"""
+        sim = self.sim
+        if seed is not None:
+            sim.seed = seed
+            sim.rng.seed(seed)
+        sim.reset()
+        self._load()
+        return self.obs, self._info()
+
+    def step(self, action):
+        """回傳 (obs, reward, terminated, truncated, info)。"""
+        sim = self.sim
+        length = len(sim.snake)
+        if action is not None and action >= 0:
+            sim.step(DIR_LIST[action])
+        else:
+            sim.step()
+        self._sync()
+
+        r = self.rewards
+        reward = (len(sim.snake) - length) * r["growth"]
+        if sim.game_over:
+            reward += r["death"]
+        elif not sim.waiting_start:
+            reward += r["alive"]
+        truncated = self.max_ticks is not None and sim.tick >= self.max_ticks and not sim.game_over
+        return self.obs, reward, sim.game_over, truncated, self._info()
+
+    def _info(self):
+        sim = self.sim
+        return {
+            "events": sim.events,
+            "length": len(sim.snake),
+            "tick": sim.tick,
+            "death_cause": sim.death_cause,
+            "boost_remaining": sim.boost_remaining,
+            "confuse_remaining": sim.confuse_remaining,
+        }
+
+    # ────────────────────────────────────────────────
+    # 觀察值平面
+    # ────────────────────────────────────────────────
+    def _load(self):
+        """整張重建（開局時）；sim.reset() 會換掉 occ / body_count，零複製的 view 也要重拿。"""
+        sim = self.sim
+        self._occ = np.frombuffer(sim.occ, dtype=np.uint16)
+        self._body = np.frombuffer(sim.body_count, dtype=np.uint8)
+        flat = self._flat
+        np.not_equal(self._body, 0, out=flat[0], casting="unsafe")
+        flat[1] = 0
+        self._head = sim.cell_id(sim.snake[0])
+        flat[1, self._head] = 1
+        flat[2:] = _ITEM_LUT[:, self._occ]
+        del self.log[:]
+
+    def _sync(self):
+        """只重寫 sim 上次到現在有變動的格子。"""
+        sim, flat = self.sim, self._flat
+        if self.log:
+            cells = np.fromiter(self.log, dtype=np.intp, count=len(self.log))
+            del self.log[:]
+            flat[0, cells] = self._body[cells] != 0
+            flat[2:, cells] = _ITEM_LUT[:, self._occ[cells]]
+        # 吃到食物頭尾互換、被傳送都會讓蛇頭跳格，直接比對前後
+        head = sim.cell_id(sim.snake[0]) if len(sim.snake) else self._head
+        if head != self._head:
+            flat[1, self._head] = 0
+            flat[1, head] = 1
+            self._head = head
@@ -1,7 +1,23 @@
 import sys
+import time
+STARTUP_T0 = time.perf_counter()   # 啟動計時起點（--timing 用，含 import pygame 的時間）
 import random
+import argparse
+from collections import OrderedDict
 import pygame
 import intro_screen
+from autopilot import Autopilot
+from mapgen import MapCache
+from font_cache import load_font
+from frame_profiler import FrameProfiler, PHASES
+from level_pack import LevelPack, LEVEL_DIR
+from replay import Replay, ReplayRecorder, seed_arg
+from score_store import ScoreWorker
+from snake_core import (
+    SnakeSim, ITEM_FLAGS,
+    OCC_BOMB, OCC_PORTAL, OCC_FAKE, OCC_INVISIBLE, OCC_OBSTACLE, OCC_FOOD, OCC_BOOST, OCC_CONFUSE,
+    GRID_W, GRID_H,
+)
 
 
 
@@ -14,8 +30,11 @@ Snake Game (Pygame) – 難度 + 隨機加速道具 + 隨機邊界傳送
   1. 普通
   2. 障礙物定時移動
   3. 障礙與食物皆定時移動
+* **關卡檔**：難度、Boss 模式和自訂關卡都定義在 levels/*.json（格數、道具數量、計時、固定牆、速度曲線），
+  第一次讀取後編譯成快取，之後啟動直接 mmap（level_pack.py）
 * **隨機加速道具**（閃電⚡）：吃到後 N 秒內速度提升
 * **隨機邊界傳送**：撞牆不 Game‑Over，而是隨機出現在任一邊界
+* **地圖保證連通**：不會有被障礙圍死、吃不到的角落；下一局的地圖在背景先生成好（mapgen.py）
 * 其他：得分顯示、頭尾互換、身體截斷、加速逐漸遞增等
 
 測試環境：pygame 2.5.2、Python ≥3.10
@@ -23,47 +42,44 @@ Snake Game (Pygame) – 難度 + 隨機加速道具 + 隨機邊界傳送
 ```bash
 pip install pygame
 python snake_game.py
+python snake_game.py --seed 42 --record game.snkr    # 決定性模式 + 錄下重播
+python snake_game.py --replay game.snkr --speed 4    # 播放重播（--speed 0 = 不限速）
+python snake_game.py --level 2 --name ginny          # 跳過開場與選單，直接開始選單上的第 2 關（4 = Boss）
+python snake_game.py --levels my_levels              # 改用別的關卡目錄
+python snake_game.py --timing                        # 印出啟動各階段花的時間
+python snake_game.py --profile frames.csv            # 每幀分段計時寫檔（也可 .jsonl），F3 開關疊加顯示
+python snake_game.py --level 3 --world 1000          # 1000×1000 大地圖，鏡頭跟著蛇頭
+python snake_game.py --autopilot --level 2           # 自動駕駛展示（F2 隨時切換，Game Over 後自動重開）
+python snake_game.py --level 2 --spectate finals     # 開放觀戰：python spectate.py finals
 ```
 """
 
 # ────────────────────────────────────────────────────────────────────
 # 全域參數
 # ────────────────────────────────────────────────────────────────────
+# 規則相關參數（格數、計時、難度表）都在 snake_core.py
 CELL_SIZE         = 15
-GRID_W, GRID_H    = 50, 50
 SCOREBAR_H        = 40
-FPS_BASE          = 8
-OBSTACLE_COUNT    = 25
-INITIAL_FOOD      = 3
-NEW_FOOD_EVENT_MS = 2500
-BOOST_EVENT_MS    = 10000          # 新閃電道具產生間隔(ms)
-BOOST_DURATION    = 450            # 加速持續 frame 數（依 FPS 計）
-BOOST_FPS_INC     = 4
-SPAWN_BOMB = pygame.USEREVENT + 5
 C_BOMB = (139, 0, 0)
-BOMB_EFFECT = 3  # 被扣掉的長度
-CONFUSE_INTERVAL  = 12000          # 每 12 秒嘗試產生一個迷惑道具
-# 新增 Boss 模式參數
-BOSS_MODE = False
-BOSS_SHRINK_INTERVAL = 10000  # 每 10 秒減 1 格
-BOMB_MOVE_INTERVAL = 3000     # 每 3 秒移動炸彈
-SPAWN_FAKE_FOOD = pygame.USEREVENT + 7
-MOVE_BOMBS = pygame.USEREVENT + 8
-
-
-# 難度 (障礙刷新 ms, 食物刷新 ms)
-DIFFICULTY_SETTINGS = {
-    1: {"obst_ms": 0,     "food_ms": 0,     "obst_count": 10, "food_count": 5, "bomb_count": 1, "confuse_count": 1, "portal_pairs": 1},
-    2: {"obst_ms": 4000,  "food_ms": 0,     "obst_count": 20, "food_count": 4, "bomb_count": 2, "confuse_count": 1, "portal_pairs": 2},
-    3: {"obst_ms": 3000,  "food_ms": 3000,  "obst_count": 35, "food_count": 3, "bomb_count": 3, "confuse_count": 2, "portal_pairs": 3},
-}
-
-speed_increment   = True
-randomized_start  = True
-
+DIRTY_RENDER = True     # 只重畫有變動的格子；False = 每幀整張重畫
+SCORE_DB = "scores.db"  # 排行榜（第一次開啟會匯入舊的 scores_level*.txt）
+SCORE_JOURNAL = None    # 排行榜日誌模式："wal" / "delete"；None = 自動（網路磁碟用 delete）
+MENU_FPS = 60           # 主迴圈每秒幾幀；遊戲本身照 sim.fps 推進
+MAX_CATCHUP = 8         # 一幀最多補跑幾個 tick（卡頓後不要一次暴衝）
+FLASH_TIMES = 3         # 💥 爆炸閃爍次數
+FLASH_MS = 100          # 每次紅 / 正常各持續多久
+PROFILER_KEY = pygame.K_F3
+AUTOPILOT_KEY = pygame.K_F2
+AUTOPILOT_RESTART_MS = 3000     # 自動駕駛 Game Over 後幾 ms 自動重開（展示機台沒人按鍵）
+CHUNK = 16              # 大地圖：每個區塊 16×16 格，各有一張快取 surface
+CHUNK_CACHE = 128       # 最多留幾個區塊（LRU；1000×1000 約有 4000 塊，不能全留）
+
+# 視窗固定顯示 GRID_W×GRID_H 格；地圖比這大時只畫鏡頭範圍（見 render_world）
 WINDOW_W = CELL_SIZE * GRID_W
 WINDOW_H = CELL_SIZE * GRID_H + SCOREBAR_H
 
+MENU_ROWS = 9           # 選單一頁顯示幾個關卡（1–9 直接選，↑↓ + Enter 捲動）
+
 # 色彩
 C_BG       = (30, 30, 30)
 C_GRID     = (50, 50, 50)
@@ -78,6 +94,7 @@ C_MENU     = (180, 180, 180)
 C_SNAKE_CONFUSE = (100, 100, 255)  # 混亂狀態下的蛇色（藍紫色）
 C_FAKE_FOOD = (50, 50, 50)
 C_FAKE_OBST = (80, 80, 80)
+C_SPRITE_KEY = (1, 2, 3)   # 圖集透明色（不會出現在任何物件上）
 
 PORTAL_COLORS = [
     (0, 255, 255),  # 青藍
@@ -93,183 +110,244 @@ DIRS = {
     pygame.K_d: (1, 0),  pygame.K_RIGHT: (1, 0),
 }
 
-# 自定義事件
-SPAWN_FOOD     = pygame.USEREVENT + 1
-MOVE_OBSTACLES = pygame.USEREVENT + 2
-MOVE_FOODS     = pygame.USEREVENT + 3
-SPAWN_BOOST    = pygame.USEREVENT + 4
-
-SPAWN_CONFUSE = pygame.USEREVENT + 6
-CONFUSE_DURATION = 5 * FPS_BASE  # 持續 5 秒（依 FPS 計）
 C_CONFUSE = (100, 100, 255)  # 淡藍紫
 
+# 佔用旗標 → SnakeSim 上的道具集合名稱
+ITEM_KINDS = {flag: kind for kind, flag in ITEM_FLAGS.items()}
+
+# 生成 / 移動道具不再用 pygame.time.set_timer：SnakeSim 內建依 tick 排程的 TickScheduler，
+# 和遊戲速度同步、暫停時不會偷跑，重開一局就整個清掉
+
 
 # ────────────────────────────────────────────────────────────────────
 # 遊戲類別
 # ────────────────────────────────────────────────────────────────────
 class SnakeGame:
-    def __init__(self):
-        self.waiting_start = True
-        self.paused = False
-
-        pygame.init()
+    def __init__(self, seed=None, record=None, replay=None, speed=1.0, level=None, name=None, timing=False,
+                 profile=None, world=None, autopilot=False, spectate=None, levels=None):
+        self.timing = timing
+        # 每幀分段計時；--profile 時一開始就顯示並寫檔，F3 切換疊加顯示
+        self.profiler = FrameProfiler(export=profile)
+        self.show_profiler = profile is not None
+        self.profiler_lines = []    # 疊加顯示的文字（每 15 幀重新 render 一次）
+        self.flip_time = 0.0
+        self.startup_marks = []     # [(階段, 距離啟動的 ms)]，第一個可玩畫面出現後清空
+        self.mark("imports")
+        # 關卡定義：第一次讀取會解析、檢查並寫快取，之後直接 mmap 快取
+        try:
+            self.levels = LevelPack.load(levels or LEVEL_DIR)
+        except (OSError, ValueError) as err:
+            sys.exit(f"關卡檔讀取失敗：{err}")
+        self.mark("levels")
+
+        # 決定性模式：固定 seed（生成本來就依 tick 排程），錄製 / 播放重播都靠它
+        self.replay = Replay.load(replay) if replay else None
+        self.replay_actions = None
+        self.record_path = record
+        self.recorder = None
+        self.speed = speed
+        self.deterministic = seed is not None or record is not None or self.replay is not None
+        if self.deterministic and seed is None and self.replay is None:
+            seed = random.randrange(2**31)
+        self.seed = seed
+        self.games = 0
+
+        # 只初始化用得到的子系統（不開音效、搖桿）
+        pygame.display.init()
+        pygame.font.init()
         self.screen = pygame.display.set_mode((WINDOW_W, WINDOW_H))
         pygame.display.set_caption("Snake Game – Plus Mode")
         self.clock = pygame.time.Clock()
-        self.font  = pygame.font.SysFont("Courier New", 28)
-        self.small_font = pygame.font.SysFont("Courier New", 18)
-
-        intro_screen.show_intro(self.screen, self.font)
-
-        self.difficulty = self.choose_difficulty()
-        self.show_level_info(self.difficulty)
-        self.player_name = self.get_player_name()
-
-        # ✅ 然後取得對應難度設定
-        settings = DIFFICULTY_SETTINGS[self.difficulty]
-        self.obstacle_count = settings["obst_count"]
-        self.initial_food   = settings["food_count"]
-        self.max_bombs      = settings["bomb_count"]
-        self.max_confuses = settings["confuse_count"]
-        self.bombs          = set()
-        self.portals = []  # 傳送門位置對
-        self.num_portal_pairs = settings["portal_pairs"]
-
-
-        # ✅ 現在才開始設 timer 沒問題
-        pygame.time.set_timer(SPAWN_BOMB, 8000)
-
-        self.confuses = set()
-        self.confuse_remaining = 0
-        pygame.time.set_timer(SPAWN_CONFUSE, 12000)  # 每 12 秒嘗試產生一次
-
-
-
-        # 設定計時器（只有 >0 才會設）
-        if settings["obst_ms"] > 0:
-            pygame.time.set_timer(MOVE_OBSTACLES, settings["obst_ms"])
-        if settings["food_ms"] > 0:
-            pygame.time.set_timer(MOVE_FOODS, settings["food_ms"])
-
-        if self.difficulty >= 2:
-            pygame.time.set_timer(SPAWN_CONFUSE, CONFUSE_INTERVAL)
-        
-        # 初始化 Boss 計時器
-        if BOSS_MODE:
-            pygame.time.set_timer(pygame.USEREVENT + 9, BOSS_SHRINK_INTERVAL)
-            pygame.time.set_timer(MOVE_BOMBS, BOMB_MOVE_INTERVAL)
-            pygame.time.set_timer(SPAWN_FAKE_FOOD, 5000)
-
-        self.fake_food = set()
-        self.invisible_obstacles = set()
-
-
-
-        # 一律設定的固定計時器
-        pygame.time.set_timer(SPAWN_FOOD, NEW_FOOD_EVENT_MS)
-        pygame.time.set_timer(SPAWN_BOOST, BOOST_EVENT_MS)
-
+        self.mark("display")
+        # 字型路徑跨次執行快取，不用每次 SysFont 掃系統字型
+        self.font  = load_font("Courier New", 28)
+        self.small_font = load_font("Courier New", 18)
+        self.mark("fonts")
+        self.background = None      # 格線背景快取（見 get_background）
+        self.background_key = None
+        self.dirty_render = DIRTY_RENDER
+        self.full_redraw = True     # 下一幀整張重畫
+        self.last_frame = None      # 上一幀每格畫了什麼（見 build_frame）
+        self.portal_labels = {}
+        self.sprites = {}           # 圖集：(種類, 參數) → (surface, 偏移)
+        self.sprites_cell = None
+        # 大地圖（--world，或重播的地圖不是 GRID_W×GRID_H）
+        self.world = world
+        self.world_mode = False
+        self.camera = (0, 0)        # 畫面左上角是地圖的第幾格
+        self.chunks = OrderedDict() # (區塊 x, 區塊 y) → surface，最近用過的在後面
+        self.chunk_state = None     # 區塊快取是依哪個 sim / 格子大小畫的
+        self.chunk_log = []
+        self.chunk_thickness = None
+        self.chunk_confused = None
+        self.last_head = None
+        self.build_atlas()
+        self.mark("atlas")
+        self.scores = ScoreWorker(SCORE_DB, journal=SCORE_JOURNAL)   # 存檔 / 讀排行榜都在背景執行緒
+
+        # 場景：intro → menu → level_info → name → playing ⇄ paused / exploding → game_over → leaderboard
+        # 全部由 run() 的同一個迴圈推進，沒有任何場景會自己卡住迴圈
+        self.scene = None
+        self.scene_time = 0         # 進入目前場景後經過的 ms
+        self.needs_draw = True      # 靜態畫面（選單、說明…）有變動才重畫
+        self.step_ms = 0            # 遊戲 tick 的時間累積
+        self.flash_phase = None
+        self.intro_banner = None
+        self.intro_shown = None
+        self.name_input = ""
+        self.level = None           # 選到的關卡（level_pack.Level）；重播不一定有對應的關卡檔
+        self.difficulty = 1         # 排行榜分類：關卡的 number + boss_mode
+        self.boss_mode = False
+        self.menu_index = 0         # 選單游標（第幾個關卡）
+        self.player_name = ""
+        self.sim = None
+        self.autopilot = autopilot  # F2 切換；開著的話每一局都交給 Autopilot 操作
+        self.pilot = None
+        self.piloted = False        # 這局有沒有用過自動駕駛（用過就不記排行榜）
+        self.maps = MapCache()      # 下一局的地圖在背景程序先生成、檢查好
+        self.feed = None            # 觀戰轉播（--spectate）
+        if spectate:
+            # 用到才 import（會帶進 asyncio，不要拖慢一般啟動）
+            from spectate import SpectatorFeed
+            self.feed = SpectatorFeed(spectate)
+
+        if self.replay is not None:
+            # 播放重播：難度、設定都照錄製時的，不走選單
+            self.config = dict(self.replay.config)
+            self.difficulty = self.config["level"]
+            self.boss_mode = self.config["boss"]
+            self.level = self.levels.find(self.difficulty, self.boss_mode)
+            self.player_name = "replay"
+            self.start_game()
+        elif level is not None or autopilot:
+            # --level / --autopilot：跳過開場、選單、說明與輸入名字（--level N = 選單上的第 N 個）
+            level = level or 1
+            if not 1 <= level <= len(self.levels):
+                sys.exit(f"--level 要在 1–{len(self.levels)} 之間")
+            self.select_level(level - 1)
+            self.player_name = (name or ("autopilot" if autopilot else "player"))[:10]
+            self.start_game()
+        else:
+            self.set_scene("intro")
+
+    def mark(self, label):
+        if self.startup_marks is not None:
+            self.startup_marks.append((label, (time.perf_counter() - STARTUP_T0) * 1000))
+
+    def report_startup(self):
+        """第一個可玩畫面出現了：--timing 時印出各階段時間。"""
+        self.mark("first playable frame")
+        if self.timing:
+            prev = 0
+            for label, ms in self.startup_marks:
+                print(f"[startup] {label:<22}{ms:8.1f} ms  (+{ms - prev:.1f})")
+                prev = ms
+        self.startup_marks = None
+
+    def set_scene(self, scene):
+        self.scene = scene
+        self.scene_time = 0
+        self.needs_draw = True
+        self.full_redraw = True
+
+    def select_level(self, index):
+        self.level = self.levels[index]
+        self.difficulty = self.level.number
+        self.boss_mode = self.level.boss
+
+    def start_game(self):
+        """選單都選完了：依關卡組設定、開第一局。"""
+        if self.replay is None:
+            self.scores.prefetch(self.difficulty, self.boss_mode)
+            # 規則與生成排程都交給 SnakeSim（依 tick 觸發）
+            self.config = self.level.config(self.world)
         self.reset()
 
     # ────────────────────────────────────────────────
     # 選單
     # ────────────────────────────────────────────────
-    def get_player_name(self):
-        name = ""
-        asking = True
-        prompt = self.font.render("Enter Your Name:", True, C_TEXT)
-        while asking:
-            self.screen.fill(C_BG)
-            self.screen.blit(prompt, (WINDOW_W//3, WINDOW_H//2 - 30))
-            input_txt = self.font.render(name + "_", True, C_TEXT)
-            self.screen.blit(input_txt, (WINDOW_W//3, WINDOW_H//2))
-            pygame.display.flip()
-            for e in pygame.event.get():
-                if e.type == pygame.QUIT:
-                    pygame.quit(); sys.exit()
-                if e.type == pygame.KEYDOWN:
-                    if e.key == pygame.K_RETURN and name.strip():
-                        return name.strip()[:10]
-                    elif e.key == pygame.K_BACKSPACE:
-                        name = name[:-1]
-                    else:
-                        if len(name) < 10 and e.unicode.isprintable():
-                            name += e.unicode
-
-
-    def choose_difficulty(self):
-        title = self.font.render("Select Difficulty", True, C_MENU)
-        opts  = ["Level 1", "Level 2 ", "Level 3", "Boss Mode"]
-        while True:
-            for e in pygame.event.get():
-                if e.type == pygame.QUIT:
-                    pygame.quit(); sys.exit()
-                if e.type == pygame.KEYDOWN:
-                    if e.key in (pygame.K_1, pygame.K_KP1): return 1
-                    if e.key in (pygame.K_2, pygame.K_KP2): return 2
-                    if e.key in (pygame.K_3, pygame.K_KP3): return 3
-                    if e.key in (pygame.K_4, pygame.K_KP4):
-                        global BOSS_MODE
-                        BOSS_MODE = True
-                        return 3
-            self.screen.fill(C_BG)
-            self.screen.blit(title, ((WINDOW_W-title.get_width())//2, 80))
-            for i, txt in enumerate(opts):
-                label = self.font.render(txt, True, C_MENU)
-                self.screen.blit(label, (WINDOW_W//2-110, 150+i*40))
-            pygame.display.flip(); self.clock.tick(15)
-
-    def show_level_info(self, level):
+    # 開場動畫：依經過時間畫到第幾行，任意鍵跳過
+    def intro_event(self, e):
+        if e.type == pygame.KEYDOWN:
+            self.set_scene("menu")
+
+    def intro_update(self, dt):
+        if self.scene_time >= intro_screen.INTRO_MS:
+            self.set_scene("menu")
+
+    def intro_draw(self):
+        if self.intro_banner is None:
+            self.intro_banner = intro_screen.render_banner(self.font)   # 整張橫幅只 render 一次
+        shown = intro_screen.lines_shown(self.scene_time)
+        if shown == self.intro_shown and not self.needs_draw:
+            return
+        self.intro_shown = shown
+        self.needs_draw = False
+        intro_screen.draw_intro(self.screen, self.intro_banner, self.scene_time)
+        self.present()
+        if self.startup_marks and self.startup_marks[-1][0] != "first frame":
+            self.mark("first frame")
+
+    # 選關卡：1–9 直接選這一頁的第幾個，↑↓ 移動游標（跨頁捲動）、Enter 選游標所在
+    def menu_event(self, e):
+        if e.type != pygame.KEYDOWN:
+            return
+        top = self.menu_index // MENU_ROWS * MENU_ROWS
+        if pygame.K_1 <= e.key <= pygame.K_9 or pygame.K_KP1 <= e.key <= pygame.K_KP9:
+            row = e.key - (pygame.K_1 if e.key <= pygame.K_9 else pygame.K_KP1)
+            if top + row >= len(self.levels):
+                return
+            self.menu_index = top + row
+        elif e.key in (pygame.K_UP, pygame.K_DOWN):
+            step = -1 if e.key == pygame.K_UP else 1
+            self.menu_index = (self.menu_index + step) % len(self.levels)
+            self.needs_draw = True
+            return
+        elif e.key not in (pygame.K_RETURN, pygame.K_KP_ENTER):
+            return
+        self.select_level(self.menu_index)
+        self.set_scene("level_info")
+
+    def menu_draw(self):
+        if not self.needs_draw:
+            return
+        title = self.font.render("Select Level", True, C_MENU)
+        self.screen.fill(C_BG)
+        self.screen.blit(title, ((WINDOW_W-title.get_width())//2, 80))
+        top = self.menu_index // MENU_ROWS * MENU_ROWS
+        for row in range(min(MENU_ROWS, len(self.levels) - top)):
+            i = top + row
+            marker = ">" if i == self.menu_index else " "
+            label = self.font.render(f"{marker}{row + 1} {self.levels[i].name}", True,
+                                     C_TEXT if i == self.menu_index else C_MENU)
+            self.screen.blit(label, (WINDOW_W//2-150, 150+row*40))
+        if len(self.levels) > MENU_ROWS:
+            pages = (len(self.levels) + MENU_ROWS - 1) // MENU_ROWS
+            more = self.small_font.render(f"Page {top // MENU_ROWS + 1}/{pages}  (Up/Down to scroll)", True, C_MENU)
+            self.screen.blit(more, ((WINDOW_W-more.get_width())//2, 160+MENU_ROWS*40))
+        self.present()
+        self.needs_draw = False
+
+    # 難度說明，按 Enter 繼續
+    def level_info_event(self, e):
+        if e.type == pygame.KEYDOWN and e.key == pygame.K_RETURN:
+            self.set_scene("name")
+
+    def level_info_draw(self):
+        if not self.needs_draw:
+            return
         self.screen.fill(C_BG)
 
-        # 設定說明內容與對應圖示代號（用文字標記圖形種類）
-        if level == 1:
-            title = "Level 1 – Normal Mode"
-            info = [
-            ("wall", "Fixed obstacles: cannot be touched"),
-            ("food", "Food: eat to grow, and the snake reverses direction"),
-            ("boost", "Speed boost: temporarily increases speed"),
-            ("portal", "Portal: teleport to the other side"),
-            ("border", "Border teleport: hitting wall wraps you to opposite edge"),
-        ]
-        elif level == 2:
-            title = "Level 2 – Moving Obstacles"
-            info = [
-            ("wall", "Obstacles move every 4 seconds"),
-            ("food", "Fewer food items, fixed position"),
-            ("boost", "Speed boost"),
-            ("portal", "Portal"),
-            ("confuse", "Confuse item: reverses control for 5 seconds"),
-            ("bomb", "Bomb: causes explosion, shortens snake tail"),
-        ]
-        elif BOSS_MODE:
-            title = "Boss Mode – Survival Challenge"
-            info = [
-            ("timer", "Snake shrinks automatically every 10 seconds"),
-            ("fake", "Fake food: reduces snake length when eaten"),
-            ("invisible", "Invisible obstacles: instant death on collision"),
-            ("bomb", "Bomb"),
-            ("boost", "Speed boost"),
-            ("confuse", "Confuse item"),
-            ("portal", "Portal"),
-        ]
-        else:
-            title = "Level 3 – Full Chaos Mode"
-            info = [
-            ("wall", "Obstacles and food move periodically"),
-            ("food", "Fewer food items"),
-            ("bomb", "Bomb"),
-            ("boost", "Speed boost"),
-            ("confuse", "Confuse item"),
-            ("portal", "Portal: multiple pairs"),
-        ]
+        # 說明頁的標題與每一列（圖示代號, 文字）都在關卡檔裡
+        title = self.level.title
+        info = self.level.info
 
         # 畫標題
         title_surface = self.font.render(title, True, C_TEXT)
         self.screen.blit(title_surface, ((WINDOW_W - title_surface.get_width()) // 2, 60))
 
         # 畫每一列說明與圖示
-        y_start = 130
+        y_start = y = 130          # 關卡檔可以沒有 info
         for i, (icon, text) in enumerate(info):
             y = y_start + i * 35
             self.draw_icon(icon, 40, y + 5)
@@ -280,139 +358,101 @@ class SnakeGame:
         tip = self.small_font.render("Press enter to continue...", True, C_MENU)
         self.screen.blit(tip, ((WINDOW_W - tip.get_width()) // 2, y + 50))
 
-        pygame.display.flip()
-
-        # 等待 Enter
-        waiting = True
-        while waiting:
-            for e in pygame.event.get():
-                if e.type == pygame.QUIT:
-                    pygame.quit(); sys.exit()
-                if e.type == pygame.KEYDOWN and e.key == pygame.K_RETURN:
-                    waiting = False
-    
+        self.present()
+        self.needs_draw = False
+
+    # 輸入名字
+    def name_event(self, e):
+        if e.type != pygame.KEYDOWN:
+            return
+        name = self.name_input
+        if e.key == pygame.K_RETURN and name.strip():
+            self.player_name = name.strip()[:10]
+            self.start_game()
+            return
+        elif e.key == pygame.K_BACKSPACE:
+            name = name[:-1]
+        else:
+            if len(name) < 10 and e.unicode.isprintable():
+                name += e.unicode
+        self.name_input = name
+        self.needs_draw = True
+
+    def name_draw(self):
+        if not self.needs_draw:
+            return
+        prompt = self.font.render("Enter Your Name:", True, C_TEXT)
+        self.screen.fill(C_BG)
+        self.screen.blit(prompt, (WINDOW_W//3, WINDOW_H//2 - 30))
+        input_txt = self.font.render(self.name_input + "_", True, C_TEXT)
+        self.screen.blit(input_txt, (WINDOW_W//3, WINDOW_H//2))
+        self.present()
+        self.needs_draw = False
+
     def draw_icon(self, type, x, y):
+        sprite, (ox, oy) = self.get_sprite("icon", type)
+        self.screen.blit(sprite, (x + ox, y + oy))
+
+    def paint_icon(self, surface, type, x, y):
         if type == "food":
-            pygame.draw.circle(self.screen, C_FOOD, (x+8, y+8), 7)
-            pygame.draw.rect(self.screen, (0, 200, 0), pygame.Rect(x+6, y-2, 4, 4))
+            pygame.draw.circle(surface, C_FOOD, (x+8, y+8), 7)
+            pygame.draw.rect(surface, (0, 200, 0), pygame.Rect(x+6, y-2, 4, 4))
         elif type == "boost":
             points = [
             (x+5, y), (x+9, y+6), (x+6, y+6),
             (x+11, y+16), (x+7, y+9), (x+10, y+9)
         ]
-            pygame.draw.polygon(self.screen, C_BOOST, points)
+            pygame.draw.polygon(surface, C_BOOST, points)
         elif type == "bomb":
-            pygame.draw.circle(self.screen, C_BOMB, (x+8, y+8), 6)
-            pygame.draw.line(self.screen, (0,0,0), (x+8, y+2), (x+8, y-3), 2)
+            pygame.draw.circle(surface, C_BOMB, (x+8, y+8), 6)
+            pygame.draw.line(surface, (0,0,0), (x+8, y+2), (x+8, y-3), 2)
         elif type == "portal":
-            pygame.draw.circle(self.screen, (0,255,255), (x+8, y+8), 7, 2)
+            pygame.draw.circle(surface, (0,255,255), (x+8, y+8), 7, 2)
         elif type == "confuse":
             for i in range(3):
-                pygame.draw.circle(self.screen, C_CONFUSE, (x+4+i*4, y+8), 2)
+                pygame.draw.circle(surface, C_CONFUSE, (x+4+i*4, y+8), 2)
         elif type == "wall":
-            pygame.draw.rect(self.screen, C_OBST, pygame.Rect(x+2, y+2, 12, 12))
+            pygame.draw.rect(surface, C_OBST, pygame.Rect(x+2, y+2, 12, 12))
         elif type == "fake":
-            pygame.draw.circle(self.screen, C_FAKE_FOOD, (x+8, y+8), 6)
+            pygame.draw.circle(surface, C_FAKE_FOOD, (x+8, y+8), 6)
         elif type == "invisible":
-            pygame.draw.rect(self.screen, C_FAKE_OBST, pygame.Rect(x+2, y+2, 12, 12), 1)
+            pygame.draw.rect(surface, C_FAKE_OBST, pygame.Rect(x+2, y+2, 12, 12), 1)
         elif type == "timer":
-            pygame.draw.circle(self.screen, (200, 200, 0), (x+8, y+8), 7, 2)
-            pygame.draw.line(self.screen, (200, 200, 0), (x+8, y+8), (x+8, y+3), 2)
-            pygame.draw.line(self.screen, (200, 200, 0), (x+8, y+8), (x+11, y+8), 2)
+            pygame.draw.circle(surface, (200, 200, 0), (x+8, y+8), 7, 2)
+            pygame.draw.line(surface, (200, 200, 0), (x+8, y+8), (x+8, y+3), 2)
+            pygame.draw.line(surface, (200, 200, 0), (x+8, y+8), (x+11, y+8), 2)
 
     # ────────────────────────────────────────────────
     # 初始化 / 重開
     # ────────────────────────────────────────────────
     def reset(self):
-    # 畫面顯示
-        self.screen.fill(C_BG)
-        loading_msg = self.font.render("Generating map... Please wait", True, C_TEXT)
-        self.screen.blit(loading_msg, ((WINDOW_W - loading_msg.get_width()) // 2, WINDOW_H // 2))
-        pygame.display.flip()
-
-        pygame.time.wait(1000)# 顯示 1 秒
+        pygame.event.clear() # ✅ 清空事件佇列，避免上一局的按鍵帶到新的一局
 
-        pygame.event.clear() # ✅ 清空事件佇列，避免卡在輸入或 quit
-
-        # 初始蛇身
-        tries = 0
-        while tries < 1000:
-            if randomized_start:
-                head = (random.randint(5, GRID_W-6), random.randint(5, GRID_H-6))
-                dir_idx = random.choice(list(DIRS.values()))
+        # 蛇、障礙、食物、傳送門都由 SnakeSim 產生；第二局起通常是 MapCache 在背景做好的，不需要 loading 畫面
+        try:
+            if self.replay is not None:
+                self.sim = SnakeSim(self.config, self.replay.seed)
+                self.replay_actions = self.replay.actions()
+            elif self.deterministic:
+                # 每重開一局 seed + 1，錄到的是最後一局
+                seed = self.seed + self.games
+                self.sim = self.maps.take(self.config, seed)
+                self.maps.prefetch(self.config, [seed + 1])
+                self.recorder = ReplayRecorder(self.sim)
             else:
-                head, dir_idx = (GRID_W//2, GRID_H//2), (1, 0)
-
-            body = (head[0] - dir_idx[0], head[1] - dir_idx[1])
-            next_step = (head[0] + dir_idx[0], head[1] + dir_idx[1])
-
-            if all(0 <= x < GRID_W and 0 <= y < GRID_H for x, y in [body, next_step]):
-                break
-            tries += 1
-
-        # 把 dir_idx 展開成 dx, dy
-        dx, dy = dir_idx
-        # 假設方向是 (0, 1) 往下
-        self.snake = [head,
-                      (head[0] - dx, head[1] - dy),
-                      (head[0] - 2*dx, head[1] - 2*dy)]
-        self.direction = (dx, dy)
-
-        self.pending_growth = 0
-        self.age = 0
-        self.game_over = False
-
-        # 建立保護區域（蛇頭、身體、頭前一步）
-        protect_area = set(self.snake)
-        hx, hy = self.snake[0]
-        dx, dy = self.direction
-        protect_area.add((hx + dx, hy + dy))
-
-        # 建立所有合法位置
-        all_grid = {(x, y) for x in range(GRID_W) for y in range(GRID_H)}
-        available = list(all_grid - protect_area)
-
-        # 檢查可用空格是否足夠
-        total_needed = self.obstacle_count + self.initial_food
-        if len(available) < total_needed:
-            print("⚠ 地圖太小或障礙數量太多，請減少設定")
-            pygame.quit(); sys.exit()
-
-        # 障礙與食物
-        sampled = random.sample(available, total_needed)
-        self.obstacles = set(sampled[:self.obstacle_count])
-        self.food = set(sampled[self.obstacle_count:self.obstacle_count+self.initial_food])
-        self.boosts = set()
-
-        self.confuses = set()
-
-        # Boss 模式才需要生成 fake_food 和 invisible_obstacles
-        self.fake_food = set()
-        self.invisible_obstacles = set()
-        if BOSS_MODE:
-            # 確保障礙與食物設好後再額外取
-            remaining = list(set(available) - set(sampled[:total_needed]))
-            if len(remaining) >= 8:
-                self.invisible_obstacles = set(random.sample(remaining, 8))
-
-
-        # 重設速度
-        self.base_fps = FPS_BASE
-        self.fps = FPS_BASE
-        self.boost_remaining = 0
-
-        self.spawn_portals()  # ✅ 這裡呼叫剛剛出錯的 spawn_portals
-
-        # ✅ 馬上顯示遊戲畫面（不會卡在 loading）
-        self.render()
-
-        if self.paused and not self.game_over:
-            pause_msg = self.font.render("PAUSED – Press P to resume", True, C_MENU)
-            self.screen.blit(pause_msg, ((WINDOW_W - pause_msg.get_width()) // 2, WINDOW_H // 2))
-
-        pygame.display.flip()  # ✅ 顯示畫面更新
+                self.sim = self.maps.take(self.config)
+            self.games += 1
+        except ValueError as err:
+            print(err)
+            self.quit()
 
-        self.waiting_start = True  # 等待玩家第一次按鍵才開始動
+        self.world_mode = (self.sim.grid_w, self.sim.grid_h) != (GRID_W, GRID_H)
+        self.pilot = Autopilot(self.sim) if self.autopilot and self.replay is None else None
+        self.piloted = self.pilot is not None
+        if self.feed is not None:
+            self.feed.attach(self.sim, self.player_name, self.difficulty)
+        self.step_ms = 0
+        self.set_scene("playing")
 
 
     # ────────────────────────────────────────────────
@@ -420,255 +460,231 @@ class SnakeGame:
     # ────────────────────────────────────────────────
     def run(self):
         while True:
-            self.handle_events()
-            if not self.game_over and not self.paused:
-                self.update()
-            self.render()
-            self.clock.tick(self.fps)
+            if self.scene == "playing" and self.speed <= 0:
+                dt = self.clock.tick()          # 重播不限速
+            else:
+                dt = self.clock.tick(MENU_FPS)
+            self.frame(dt)
+
+    def frame(self, dt):
+        """主迴圈的一幀：處理輸入 → 推進目前場景 → 畫面（各段時間記到 profiler）。"""
+        clock = time.perf_counter
+        t0 = clock()
+        self.handle_events()
+        t1 = clock()
+        self.scene_time += dt
+        update = getattr(self, self.scene + "_update", None)
+        if update is not None:
+            update(dt)
+        t2 = clock()
+        self.flip_time = 0.0
+        scene = self.scene
+        getattr(self, scene + "_draw")()
+        t3 = clock()
+        self.profiler.record(scene, events=t1 - t0, update=t2 - t1,
+                             render=t3 - t2 - self.flip_time, flip=self.flip_time)
+
+    def present(self, rects=None):
+        """把畫好的東西送上螢幕（display.flip / update），時間另外記成 flip。"""
+        t0 = time.perf_counter()
+        if rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(rects)
+        self.flip_time += time.perf_counter() - t0
+
+    def quit(self):
+        self.save_replay()
+        self.profiler.close()
+        if self.feed is not None:
+            self.feed.close()
+        self.maps.close()
+        self.scores.close(timeout=2.0)   # 等背景把分數寫完（最多 2 秒）
+        pygame.quit(); sys.exit()
 
     # ────────────────────────────────────────────────
     # 事件處理
     # ────────────────────────────────────────────────
     def handle_events(self):
-
         for e in pygame.event.get():
             if e.type == pygame.QUIT:
-                pygame.quit(); sys.exit()
-            if e.type == pygame.KEYDOWN:
-                if e.key == pygame.K_ESCAPE:
-                    pygame.quit(); sys.exit()
-
-                if e.key == pygame.K_p:
-                    self.paused = not self.paused
-
-                if e.key in DIRS:
-                    nd = DIRS[e.key]
-
-                    # 🌀 如果進入混亂狀態，上下左右全部反轉
-                    if self.confuse_remaining > 0:
-                        nd = (-nd[0], -nd[1])
-
-
-                    if self.waiting_start or (nd[0] != -self.direction[0] or nd[1] != -self.direction[1]):
-                        self.direction = nd
-                        self.waiting_start = False
-
-
-                if self.game_over and e.key == pygame.K_r:
-                    self.reset()
-            if e.type == SPAWN_BOMB and not self.game_over and len(self.bombs) < self.max_bombs:
-                self.spawn_bomb()
-            if e.type == SPAWN_CONFUSE and not self.game_over:
-                # 限制增加速度，不要太快增加太多
-                if len(self.confuses) < self.max_confuses + self.age // 300:
-                    self.spawn_confuse()
-            if e.type == SPAWN_FOOD and not self.game_over:
-                self.spawn_food()
-            if e.type == SPAWN_BOOST and not self.game_over and len(self.boosts) < 1:
-                self.spawn_boost()
-            if e.type == MOVE_OBSTACLES and not self.game_over:
-                self.relocate_obstacles()
-            if e.type == MOVE_FOODS and not self.game_over:
-                self.relocate_foods()
-            if e.type == SPAWN_FAKE_FOOD and BOSS_MODE and not self.game_over:
-                self.spawn_fake_food()
-            if e.type == MOVE_BOMBS and BOSS_MODE and not self.game_over:
-                self.relocate_bombs()
-            if e.type == pygame.USEREVENT + 9 and BOSS_MODE and not self.game_over:
-                if len(self.snake) > 1:
-                    self.snake.pop()
-
-
-    def flash_explosion(self, times=3, interval=100):
-        for _ in range(times):
+                self.quit()
+            if e.type == pygame.KEYDOWN and e.key == pygame.K_ESCAPE:
+                self.quit()
+            if e.type == pygame.KEYDOWN and e.key == PROFILER_KEY:
+                self.show_profiler = not self.show_profiler
+                self.profiler_lines = []
+                self.full_redraw = True
+                continue
+            if e.type == pygame.KEYDOWN and e.key == AUTOPILOT_KEY:
+                self.toggle_autopilot()
+                continue
+            handler = getattr(self, self.scene + "_event", None)
+            if handler is not None:
+                handler(e)
+
+    def toggle_autopilot(self):
+        if self.replay is not None:
+            return
+        self.autopilot = not self.autopilot
+        if self.pilot is not None:
+            self.pilot.close()
+            self.pilot = None
+        if self.autopilot and self.sim is not None and not self.sim.game_over:
+            self.pilot = Autopilot(self.sim)
+            self.piloted = True
+        self.full_redraw = True
+
+    # ────────────────────────────────────────────────
+    # 遊戲中的場景
+    # ────────────────────────────────────────────────
+    def playing_event(self, e):
+        if e.type != pygame.KEYDOWN:
+            return
+        if e.key == pygame.K_p:
+            self.set_scene("paused")
+        elif e.key in DIRS and self.replay is None:
+            # 混亂反轉、禁止回頭都在 turn() 裡；錄製時經過 recorder 記下來
+            (self.recorder or self.sim).turn(DIRS[e.key])
+
+    def playing_update(self, dt):
+        # 依 sim.fps 累積時間推進 tick；輸入每幀都處理，不必等到下一個 tick
+        if self.speed <= 0:
+            self.update()
+            return
+        self.step_ms += dt
+        interval = 1000 / (self.sim.fps * self.speed)
+        steps = 0
+        while self.step_ms >= interval and self.scene == "playing":
+            self.step_ms -= interval
+            self.update()
+            steps += 1
+            if steps == MAX_CATCHUP:
+                self.step_ms = 0
+                break
+
+    def playing_draw(self):
+        self.render()
+        if self.startup_marks is not None:
+            self.report_startup()
+
+    def paused_event(self, e):
+        if e.type == pygame.KEYDOWN and e.key == pygame.K_p:
+            self.set_scene("playing")
+
+    def paused_draw(self):
+        if self.needs_draw:
+            self.render("PAUSED – Press P to resume", C_MENU)
+            self.needs_draw = False
+
+    # 💥 爆炸：紅 / 正常交替閃 FLASH_TIMES 次，依經過時間切換；按任意鍵直接回到遊戲
+    def exploding_event(self, e):
+        if e.type == pygame.KEYDOWN:
+            self.set_scene("playing")
+            self.playing_event(e)
+
+    def exploding_update(self, dt):
+        if self.scene_time * self.speed >= FLASH_TIMES * 2 * FLASH_MS:
+            self.set_scene("playing")
+
+    def exploding_draw(self):
+        phase = int(self.scene_time * self.speed // FLASH_MS)
+        if phase == self.flash_phase and not self.needs_draw:
+            return
+        self.flash_phase = phase
+        self.needs_draw = False
+        if phase % 2 == 0:
             # 閃紅色
             self.screen.fill((255, 0, 0))
-            pygame.display.flip()
-            pygame.time.delay(interval)
-        
+            self.present()
+        else:
             # 閃背景色
+            self.full_redraw = True
             self.render()
-            pygame.display.flip()
-            pygame.time.delay(interval)
+
+    def game_over_event(self, e):
+        if e.type != pygame.KEYDOWN:
+            return
+        if e.key in (pygame.K_y, pygame.K_r):
+            self.reset()
+        elif e.key == pygame.K_n:
+            self.set_scene("leaderboard")
+
+    def game_over_update(self, dt):
+        if self.autopilot and self.replay is None and self.scene_time >= AUTOPILOT_RESTART_MS:
+            self.reset()
+
+    def game_over_draw(self):
+        if self.needs_draw:
+            self.render("GAME OVER – Play again? (Y/N)", C_GAMEOVER)
+            self.needs_draw = False
 
     # ────────────────────────────────────────────────
     # 核心更新
     # ────────────────────────────────────────────────
 
     def update(self):
-        
-        if self.waiting_start:
-            return  # 還沒按鍵，不更新位置
-
-        # FPS 自增
-        self.age += 1
-        if speed_increment and self.age % 150 == 0:
-            self.base_fps += 1
-            if self.boost_remaining == 0:
-                self.fps = self.base_fps
-
-        # Boost 時間減少
-        if self.boost_remaining > 0:
-            self.boost_remaining -= 1
-            if self.boost_remaining == 0:
-                self.fps = self.base_fps
-
-        if self.confuse_remaining > 0:
-            self.confuse_remaining -= 1
-
-
-        # 計算下一格
-        hx, hy = self.snake[0]
-        dx, dy = self.direction
-        nx, ny = hx+dx, hy+dy
-
-        # 邊界處理：對側傳送
-        if nx < 0:
-            nx = GRID_W - 1
-        elif nx >= GRID_W:
-            nx = 0
-        if ny < 0:
-            ny = GRID_H - 1
-        elif ny >= GRID_H:
-            ny = 0
-
-
-        new_head = (nx, ny)
-
-        # 傳送門處理：進入後立即傳送到另一邊
-        if new_head in self.portals:
-            idx = self.portals.index(new_head)
-            other_idx = 1 - idx
-            new_head = self.portals[other_idx]
-
-            # 移動蛇：直接從出口出現（跳過一般移動流程）
-            self.snake.insert(0, new_head)
-            if self.pending_growth:
-                self.pending_growth -= 1
-            else:
-                self.snake.pop()
-
-            return  # ✅ 傳送完直接結束 update（不再檢查碰撞）
-
-        # 碰撞
-        if new_head in self.obstacles:
-            self.game_over = True; 
-            self.save_score(self.player_name, len(self.snake), self.difficulty)
-            return
-        if new_head in self.snake and len(self.snake) > 2:
-            idx = self.snake.index(new_head)
-            self.snake = self.snake[idx:]
-            self.save_score(self.player_name, len(self.snake), self.difficulty)
-            self.game_over = True
-            return
-              
-        if new_head in self.bombs:
-            self.bombs.remove(new_head)
-
-            self.flash_explosion()  # 💥 爆炸動畫
-
-            # 扣掉尾巴
-            self.snake = self.snake[:-BOMB_EFFECT] if len(self.snake) > BOMB_EFFECT else self.snake[:1]
-
-        # 移動蛇
-        self.snake.insert(0, new_head)
-        if self.pending_growth:
-            self.pending_growth -= 1
+        # 規則在 snake_core.SnakeSim.update()，這裡只處理畫面效果與存檔
+        if self.replay is not None:
+            events = self.replay_step()
+        elif self.recorder is not None:
+            if self.pilot is not None:
+                action = self.pilot.act()
+                if action is not None:
+                    self.recorder.turn(action)
+            events = self.recorder.step()
         else:
-            self.snake.pop()
-
-        # 食物
-        if new_head in self.food:
-            self.food.remove(new_head)
-            self.pending_growth += 1
-            self.snake.reverse()
-            if len(self.snake) >= 2:
-                hx, hy = self.snake[0]; nx, ny = self.snake[1]
-                self.direction = (hx-nx, hy-ny)
-
-        if new_head in self.confuses:
-            self.confuses.remove(new_head)
-            self.confuse_remaining = CONFUSE_DURATION
-
-
-        # 加速道具
-        if new_head in self.boosts:
-            self.boosts.remove(new_head)
-            self.boost_remaining = BOOST_DURATION
-            self.fps = self.base_fps + BOOST_FPS_INC
-
-        if new_head in self.portals:
-            idx = self.portals.index(new_head)
-            if idx % 2 == 0:
-                other_idx = idx + 1
+            events = self.sim.step(self.pilot.act() if self.pilot is not None else None)
+        if self.feed is not None:
+            self.feed.publish()
+        self.profiler.tick()
+
+        if "bomb" in events and self.speed > 0:
+            self.flash_phase = None
+            self.set_scene("exploding")  # 💥 爆炸動畫
+
+        if "game_over" in events:
+            if self.replay is None:
+                if not self.piloted:
+                    self.save_score(self.player_name, len(self.sim.snake), self.difficulty)
+                self.save_replay()
+            self.set_scene("game_over")
+
+    def replay_step(self):
+        """重播：套用到下一個 step 為止的輸入，再推進一個 tick。"""
+        for action, arg in self.replay_actions:
+            if action == "turn":
+                self.sim.turn(arg)
             else:
-                other_idx = idx - 1
-            new_head = self.portals[other_idx]
+                return self.sim.step()
+        self.quit()   # 重播結束（錄製時中途離開）
 
-            # 移動蛇：直接從出口出現（跳過一般移動流程）
-            self.snake.insert(0, new_head)
-            if self.pending_growth:
-                self.pending_growth -= 1
-            else:
-                self.snake.pop()
-            return
-        
-        # 在 update 中處理 Boss 模式效果
-        if BOSS_MODE:
-            if self.age % (FPS_BASE * 10) == 0 and len(self.snake) > 1:
-                self.snake.pop()
-
-        if new_head in self.fake_food:
-            self.fake_food.remove(new_head)
-            penalty = random.randint(2, 5)
-            self.snake = self.snake[:-penalty] if len(self.snake) > penalty else self.snake[:1]
-
-        if new_head in self.invisible_obstacles:
-            self.game_over = True
-            self.save_score(self.player_name, len(self.snake), self.difficulty)
-            return
+    def save_replay(self):
+        if self.recorder is not None and self.record_path:
+            self.recorder.save(self.record_path)
 
     def save_score(self, name, score, level, two_player=False):
-        mode_tag = "_boss" if BOSS_MODE else ""
-        filename = f"scores_level{level}{mode_tag}.txt"
-
-        scores = self.load_scores(level, full=True)  # ← 這裡要有縮排
-
-        updated = False
-        for i, (n, s) in enumerate(scores):
-            if n == name:
-                if score > s:
-                    scores[i] = (name, score)
-                updated = True
-                break
-        if not updated:
-            scores.append((name, score))
-
-        # 按照分數排序後覆寫檔案
-        scores = sorted(scores, key=lambda x: x[1], reverse=True)
-        with open(filename, "w", encoding="utf-8") as f:
-            for n, s in scores:
-                f.write(f"{n},{s}\n")
+        # 丟給背景寫入；每位玩家只留最高分，多個遊戲同時寫也安全（見 score_store.py）
+        self.scores.submit(name, score, level, self.boss_mode)
 
     def load_scores(self, level, full=False):
-        mode_tag = "_boss" if BOSS_MODE else ""
-        filename = f"scores_level{level}{mode_tag}.txt"
+        # 記憶體裡的排行榜快取，不碰磁碟
+        return self.scores.leaderboard(level, self.boss_mode, k=None if full else 5)
 
-        scores = []
-        try:
-            with open(filename, "r", encoding="utf-8") as f:
-                lines = f.readlines()
-                scores = [tuple(line.strip().split(",")) for line in lines]
-                scores = [(name, int(score)) for name, score in scores]
-                return scores if full else scores[:5]
-        except FileNotFoundError:
-            return []
 
+    def leaderboard_event(self, e):
+        if e.type == pygame.KEYDOWN:
+            self.quit()
 
-    def show_leaderboard(self):
+    def leaderboard_draw(self):
+        if not self.needs_draw:
+            return
         scores = self.load_scores(self.difficulty)
         self.screen.fill(C_BG)
-        mode_name = "Boss Mode" if BOSS_MODE else f"Level {self.difficulty}"
+        if self.level is not None:
+            mode_name = self.level.name
+        else:
+            mode_name = "Boss Mode" if self.boss_mode else f"Level {self.difficulty}"
         title = self.font.render(f"Leaderboard – {mode_name}", True, C_TEXT)
 
         self.screen.blit(title, ((WINDOW_W - title.get_width()) // 2, 50))
@@ -683,87 +699,163 @@ class SnakeGame:
 
         msg = self.font.render("Press any key to quit", True, C_MENU)
         self.screen.blit(msg, ((WINDOW_W - msg.get_width()) // 2, WINDOW_H - 80))
-        pygame.display.flip()
-
-        waiting = True
-        while waiting:
-            for e in pygame.event.get():
-                if e.type == pygame.QUIT:
-                    pygame.quit(); sys.exit()
-                if e.type == pygame.KEYDOWN:
-                    waiting = False
+        self.present()
+        self.needs_draw = False
 
 
     # ────────────────────────────────────────────────
     # 畫面
     # ────────────────────────────────────────────────
-    def render(self):
-        self.screen.fill(C_BG)
-        # 格線
-        for x in range(GRID_W):
-            for y in range(GRID_H):
-                pygame.draw.rect(self.screen, C_GRID,
-                                 pygame.Rect(x*CELL_SIZE, y*CELL_SIZE+SCOREBAR_H, CELL_SIZE, CELL_SIZE), 1)
-        # 框線
-        pygame.draw.rect(self.screen, C_BOUND, pygame.Rect(0,SCOREBAR_H,WINDOW_W,WINDOW_H-SCOREBAR_H),2)
-
-        # 炸彈（深紅圓 + 黑色引線）
-        for bx, by in self.bombs:
-            center = (bx * CELL_SIZE + CELL_SIZE // 2, by * CELL_SIZE + SCOREBAR_H + CELL_SIZE // 2)
-
-            # 圓形炸彈主體
-            pygame.draw.circle(self.screen, C_BOMB, center, CELL_SIZE // 2 - 2)
-
-            # 小引線（上方一小條）
+    def get_background(self):
+        """底色 + 格線 + 框線只畫一次，格數或 CELL_SIZE 改變時才重畫。"""
+        key = (GRID_W, GRID_H, CELL_SIZE)
+        if self.background is None or self.background_key != key:
+            w, h = CELL_SIZE * GRID_W, CELL_SIZE * GRID_H + SCOREBAR_H
+            bg = pygame.Surface((w, h)).convert()
+            bg.fill(C_BG)
+            # 格線
+            for x in range(GRID_W):
+                for y in range(GRID_H):
+                    pygame.draw.rect(bg, C_GRID,
+                                     pygame.Rect(x*CELL_SIZE, y*CELL_SIZE+SCOREBAR_H, CELL_SIZE, CELL_SIZE), 1)
+            # 框線
+            pygame.draw.rect(bg, C_BOUND, pygame.Rect(0, SCOREBAR_H, w, h-SCOREBAR_H), 2)
+            self.background = bg
+            self.background_key = key
+            self.full_redraw = True
+        return self.background
+
+    # 畫面上每格要畫的東西，依這個順序疊（和原本 render 的繪製順序相同）
+    def build_frame(self):
+        """回傳 {格子: ((圖層, 種類, 參數), ...)}，用來比對哪些格子需要重畫。"""
+        s = self.sim
+        frame = {}
+
+        def put(cell, item):
+            frame[cell] = frame.get(cell, ()) + (item,)
+
+        thickness = 2 + (s.age // 5) % 2     # 閃爍感 – 可選厚度切換
+        for layer, (flag, kind) in enumerate(self.ITEM_LAYERS):
+            if flag == OCC_PORTAL:
+                for k, p in enumerate(s.portals):
+                    put(p, (layer, kind, (k // 2, thickness)))
+            else:
+                for p in getattr(s, ITEM_KINDS[flag]):
+                    put(p, (layer, kind, None))
+        snake_color = C_SNAKE_CONFUSE if s.confuse_remaining > 0 else C_SNAKE
+        for i, p in enumerate(s.snake):
+            put(p, (len(self.ITEM_LAYERS), "snake", (snake_color, i == 0)))
+        return frame
+
+    def portal_label(self, pair):
+        if pair not in self.portal_labels:
+            color = PORTAL_COLORS[pair % len(PORTAL_COLORS)]
+            self.portal_labels[pair] = self.small_font.render(str(pair + 1), True, color)
+        return self.portal_labels[pair]
+
+    def cell_rect(self, cell):
+        return pygame.Rect(cell[0]*CELL_SIZE, cell[1]*CELL_SIZE+SCOREBAR_H, CELL_SIZE, CELL_SIZE)
+
+    def footprint(self, cell, item):
+        """物件實際會畫到的範圍（炸彈引線、傳送門編號會超出自己的格子）。"""
+        sprite, (ox, oy) = self.get_sprite(item[1], item[2])
+        rect = sprite.get_rect(topleft=(cell[0]*CELL_SIZE + ox, cell[1]*CELL_SIZE + SCOREBAR_H + oy))
+        return rect.union(self.cell_rect(cell))
+
+    def draw_item(self, cell, item):
+        sprite, (ox, oy) = self.get_sprite(item[1], item[2])
+        self.screen.blit(sprite, (cell[0]*CELL_SIZE + ox, cell[1]*CELL_SIZE + SCOREBAR_H + oy))
+
+    # ────────────────────────────────────────────────
+    # 圖集：每種物件只在啟動（或 CELL_SIZE 改變）時畫一次
+    # ────────────────────────────────────────────────
+    def get_sprite(self, kind, arg):
+        """回傳 (surface, 相對格子左上角的偏移)；沒有就現畫一張存起來。"""
+        if self.sprites_cell != CELL_SIZE:
+            self.build_atlas()
+        key = (kind, arg)
+        if key not in self.sprites:
+            self.sprites[key] = self.make_sprite(kind, arg)
+        return self.sprites[key]
+
+    def build_atlas(self):
+        self.sprites = {}
+        self.sprites_cell = CELL_SIZE
+        self.full_redraw = True
+        for kind in ("bomb", "fake", "invisible", "obstacle", "food", "boost", "confuse"):
+            self.get_sprite(kind, None)
+        for color in (C_SNAKE, C_SNAKE_CONFUSE):
+            for is_head in (False, True):
+                self.get_sprite("snake", (color, is_head))
+        for pair in range(max(level.config()["portal_pairs"] for level in self.levels)):
+            for thickness in (2, 3):
+                self.get_sprite("portal", (pair, thickness))
+        for type in ("wall", "food", "boost", "portal", "border", "confuse", "bomb", "timer", "fake", "invisible"):
+            self.get_sprite("icon", type)
+
+    def make_sprite(self, kind, arg):
+        # 先畫在留白的透明畫布上（引線、編號會超出格子），再裁到實際有畫的範圍
+        pad = 3 * CELL_SIZE
+        canvas = pygame.Surface((CELL_SIZE + 2*pad, CELL_SIZE + 2*pad), pygame.SRCALPHA)
+        if kind == "icon":
+            self.paint_icon(canvas, arg, pad, pad)
+        else:
+            self.paint_item(canvas, pad, pad, kind, arg)
+        box = canvas.get_bounding_rect()
+        if box.width == 0:
+            box = pygame.Rect(pad, pad, 1, 1)
+        sprite = canvas.subsurface(box).copy()
+
+        # 只有全透明 / 全不透明像素的圖改用 colorkey（RLE），比逐像素 alpha 混色快；
+        # 傳送門編號有反鋸齒，保留 alpha
+        solid = pygame.mask.from_surface(sprite, 254).count()
+        if solid == pygame.mask.from_surface(sprite, 0).count():
+            keyed = pygame.Surface(box.size).convert()
+            if solid < box.width * box.height:
+                keyed.fill(C_SPRITE_KEY)
+                keyed.set_colorkey(C_SPRITE_KEY, pygame.RLEACCEL)
+            keyed.blit(sprite, (0, 0))
+            sprite = keyed
+        else:
+            sprite = sprite.convert_alpha()
+        return sprite, (box.x - pad, box.y - pad)
+
+    def paint_item(self, surface, x0, y0, kind, arg):
+        center = (x0 + CELL_SIZE // 2, y0 + CELL_SIZE // 2)
+
+        if kind == "bomb":
+            # 炸彈（深紅圓 + 黑色引線）
+            pygame.draw.circle(surface, C_BOMB, center, CELL_SIZE // 2 - 2)
             fuse_start = (center[0], center[1] - CELL_SIZE // 2 + 2)
             fuse_end = (center[0], center[1] - CELL_SIZE // 2 - 3)
-            pygame.draw.line(self.screen, (0, 0, 0), fuse_start, fuse_end, 2)
-
-        # 傳送門（每對一色 + 編號）
-        for i in range(0, len(self.portals), 2):
-            color = PORTAL_COLORS[(i//2) % len(PORTAL_COLORS)]
-            label = self.small_font.render(str(i//2 + 1), True, color)
-
-            for j in (0, 1):
-                px, py = self.portals[i + j]
-                center = (px * CELL_SIZE + CELL_SIZE // 2, py * CELL_SIZE + SCOREBAR_H + CELL_SIZE // 2)
-
-                # 閃爍感 – 可選厚度切換
-                thickness = 2 + (self.age // 5) % 2
-                pygame.draw.circle(self.screen, color, center, CELL_SIZE // 2 - 1, thickness)
-
-                # 編號放在門的右下角
-                text_x = center[0] + CELL_SIZE // 2 - 5
-                text_y = center[1] + CELL_SIZE // 2 - 5
-                self.screen.blit(label, (text_x, text_y))
-
-        # render 中畫出 fake food 和隱形障礙
-        for fx, fy in self.fake_food:
-            center = (fx*CELL_SIZE + CELL_SIZE//2, fy*CELL_SIZE + SCOREBAR_H + CELL_SIZE//2)
-            pygame.draw.circle(self.screen, C_FAKE_FOOD, center, CELL_SIZE//2 - 1)
-        for ox, oy in self.invisible_obstacles:
-            rect = pygame.Rect(ox*CELL_SIZE, oy*CELL_SIZE+SCOREBAR_H, CELL_SIZE, CELL_SIZE)
-            pygame.draw.rect(self.screen, C_FAKE_OBST, rect, 1)
-
-        # 障礙
-        for ox, oy in self.obstacles:
-            pygame.draw.rect(self.screen, C_OBST,
-                             pygame.Rect(ox*CELL_SIZE, oy*CELL_SIZE+SCOREBAR_H, CELL_SIZE, CELL_SIZE))
-        # 食物（蘋果造型）
-        for fx, fy in self.food:
-            # 畫紅色圓形作為蘋果果實
-            center = (fx*CELL_SIZE + CELL_SIZE//2, fy*CELL_SIZE + SCOREBAR_H + CELL_SIZE//2)
-            pygame.draw.circle(self.screen, C_FOOD, center, CELL_SIZE//2 - 2)
-
-            # 畫小綠葉（上方小矩形）
-            leaf_rect = pygame.Rect(center[0] - 2, center[1] - CELL_SIZE//2 + 2, 4, 4)
-            pygame.draw.rect(self.screen, (0, 200, 0), leaf_rect)
+            pygame.draw.line(surface, (0, 0, 0), fuse_start, fuse_end, 2)
+
+        elif kind == "portal":
+            # 傳送門（每對一色 + 編號放在門的右下角）
+            pair, thickness = arg
+            color = PORTAL_COLORS[pair % len(PORTAL_COLORS)]
+            pygame.draw.circle(surface, color, center, CELL_SIZE // 2 - 1, thickness)
+            text_x = center[0] + CELL_SIZE // 2 - 5
+            text_y = center[1] + CELL_SIZE // 2 - 5
+            surface.blit(self.portal_label(pair), (text_x, text_y))
+
+        elif kind == "fake":
+            pygame.draw.circle(surface, C_FAKE_FOOD, center, CELL_SIZE//2 - 1)
 
-        # Boost（閃電造型）
-        for bx, by in self.boosts:
-            x0 = bx * CELL_SIZE
-            y0 = by * CELL_SIZE + SCOREBAR_H
+        elif kind == "invisible":
+            pygame.draw.rect(surface, C_FAKE_OBST, pygame.Rect(x0, y0, CELL_SIZE, CELL_SIZE), 1)
 
+        elif kind == "obstacle":
+            pygame.draw.rect(surface, C_OBST, pygame.Rect(x0, y0, CELL_SIZE, CELL_SIZE))
+
+        elif kind == "food":
+            # 食物（紅色圓形果實 + 上方小綠葉）
+            pygame.draw.circle(surface, C_FOOD, center, CELL_SIZE//2 - 2)
+            leaf_rect = pygame.Rect(center[0] - 2, center[1] - CELL_SIZE//2 + 2, 4, 4)
+            pygame.draw.rect(surface, (0, 200, 0), leaf_rect)
+
+        elif kind == "boost":
+            # Boost（閃電造型）
             points = [
                 (x0 + CELL_SIZE//2 - 2, y0 + 2),          # 上尖
                 (x0 + CELL_SIZE//2 + 1, y0 + CELL_SIZE//2 - 4),
@@ -772,145 +864,274 @@ class SnakeGame:
                 (x0 + CELL_SIZE//2 - 1, y0 + CELL_SIZE//2 + 2),
                 (x0 + CELL_SIZE//2 + 3, y0 + CELL_SIZE//2 + 2)
             ]
+            pygame.draw.polygon(surface, C_BOOST, points)
 
-            pygame.draw.polygon(self.screen, C_BOOST, points)
-
-        # 🌀 迷惑道具 – 模擬螺旋圖樣
-        for cx, cy in self.confuses:
-            center_x = cx * CELL_SIZE + CELL_SIZE // 2
-            center_y = cy * CELL_SIZE + SCOREBAR_H + CELL_SIZE // 2
+        elif kind == "confuse":
+            # 🌀 迷惑道具 – 模擬螺旋圖樣
             for i in range(5):
-                angle = i * 72
                 radius = 2 + i
                 offset_x = int(radius * (i / 5) * (-1) ** i)
                 offset_y = int(radius * ((4 - i) / 5) * (-1) ** (i + 1))
-                pygame.draw.circle(self.screen, C_CONFUSE,
-                                    (center_x + offset_x, center_y + offset_y), 2)
-
-        # 蛇
-        snake_color = C_SNAKE_CONFUSE if self.confuse_remaining > 0 else C_SNAKE
-        for i, (sx, sy) in enumerate(self.snake):
-            rect = pygame.Rect(sx*CELL_SIZE, sy*CELL_SIZE+SCOREBAR_H, CELL_SIZE, CELL_SIZE)
-            pygame.draw.rect(self.screen, snake_color, rect)
-            if i==0:
+                pygame.draw.circle(surface, C_CONFUSE,
+                                    (center[0] + offset_x, center[1] + offset_y), 2)
+
+        elif kind == "snake":
+            snake_color, is_head = arg
+            rect = pygame.Rect(x0, y0, CELL_SIZE, CELL_SIZE)
+            pygame.draw.rect(surface, snake_color, rect)
+            if is_head:
                 eye = CELL_SIZE//5
-                pygame.draw.circle(self.screen, C_BG, (rect.x+CELL_SIZE//3, rect.y+CELL_SIZE//3), eye)
-                pygame.draw.circle(self.screen, C_BG, (rect.x+2*CELL_SIZE//3, rect.y+CELL_SIZE//3), eye)
+                pygame.draw.circle(surface, C_BG, (rect.x+CELL_SIZE//3, rect.y+CELL_SIZE//3), eye)
+                pygame.draw.circle(surface, C_BG, (rect.x+2*CELL_SIZE//3, rect.y+CELL_SIZE//3), eye)
+
+    def redraw_region(self, rect, frame):
+        """只重畫 rect 範圍：貼回背景，再把會畫進這塊的物件依圖層順序畫上（有裁切）。"""
+        reach = 2   # 物件最多超出自己格子幾格（傳送門編號）
+        x0 = max(0, rect.left // CELL_SIZE - reach)
+        x1 = min(GRID_W - 1, rect.right // CELL_SIZE + reach)
+        y0 = max(0, (rect.top - SCOREBAR_H) // CELL_SIZE - reach)
+        y1 = min(GRID_H - 1, (rect.bottom - SCOREBAR_H) // CELL_SIZE + reach)
+
+        items = []
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                for item in frame.get((cx, cy), ()):
+                    items.append((item[0], (cx, cy), item))
+        # 同一圖層依格子座標排序：和整張重畫的疊法一致（傳送門編號可能蓋到隔壁的門）
+        items.sort(key=lambda t: t[:2])
+
+        self.screen.set_clip(rect)
+        self.screen.blit(self.get_background(), rect, rect)
+        for _, cell, item in items:
+            self.draw_item(cell, item)
+        self.screen.set_clip(None)
+
+    def render(self, message=None, color=C_TEXT):
+        """畫遊戲畫面；message 會蓋在正中央（暫停、Game Over），並整張更新。"""
+        s = self.sim
+        if self.world_mode:
+            # 大地圖：鏡頭範圍內的區塊每幀貼一次（區塊本身有快取）
+            frame = dirty_rects = None
+            self.render_world()
+        else:
+            frame, dirty_rects = self.render_board()
 
-    
-        # Info
-        info = f"Len {len(self.snake)}  FPS {self.fps}  D{self.difficulty}"
-        if self.boost_remaining > 0: info += " BOOST"
+        # Info：FPS 顯示實際遊戲速度 / 目標速度
+        info = f"Len {len(s.snake)}  FPS {self.profiler.tick_rate():.0f}/{s.fps}  D{self.difficulty}"
+        if s.boost_remaining > 0: info += " BOOST"
+        if self.pilot is not None: info += " AUTO"
+        if self.world_mode: info += "  @%d,%d" % s.snake[0]
         self.screen.blit(self.font.render(info, True, C_TEXT), (10, 10))
 
-        if self.game_over:
-            msg = self.font.render("GAME OVER – Play again? (Y/N)", True, C_GAMEOVER)
-            self.screen.blit(msg, ((WINDOW_W - msg.get_width()) // 2, WINDOW_H // 2))
-            pygame.display.flip()
-
-            waiting = True
-            while waiting:
-                for e in pygame.event.get():
-                    if e.type == pygame.QUIT:
-                        pygame.quit(); sys.exit()
-                    if e.type == pygame.KEYDOWN:
-                        if e.key in (pygame.K_y, pygame.K_y):
-                            self.reset()
-                            waiting = False
-                        elif e.key in (pygame.K_n, pygame.K_n):
-                            self.show_leaderboard()
-                            pygame.quit(); sys.exit()
-        pygame.display.flip()  # 或者 pygame.display.update()
+        if self.show_profiler:
+            box = self.draw_profiler(frame)
+            if dirty_rects is not None:
+                dirty_rects.append(box)
 
+        if message:
+            msg = self.font.render(message, True, color)
+            self.screen.blit(msg, ((WINDOW_W - msg.get_width()) // 2, WINDOW_H // 2))
+            self.full_redraw = True     # 訊息蓋在畫面上，下一幀要整張重畫
+            dirty_rects = None
+
+        self.present(dirty_rects)
+
+    def render_board(self):
+        """GRID_W×GRID_H 的地圖：整張重畫或只重畫變動的格子，回傳 (frame, 要更新的範圍)。"""
+        frame = self.build_frame()
+        background = self.get_background()
+
+        if self.full_redraw or not self.dirty_render or self.last_frame is None:
+            # 整張重畫：重開、爆炸閃爍、暫停、Game Over
+            self.screen.blit(background, (0, 0))
+            items = [(item[0], cell, item) for cell, its in frame.items() for item in its]
+            items.sort(key=lambda t: t[:2])
+            for _, cell, item in items:
+                self.draw_item(cell, item)
+            dirty_rects = None
+        else:
+            # 只重畫這一幀有變動的格子（新蛇頭、舊蛇尾、吃掉 / 生成的道具）
+            old = self.last_frame
+            dirty_rects = []
+            for cell in frame.keys() | old.keys():
+                before, after = old.get(cell, ()), frame.get(cell, ())
+                if before == after:
+                    continue
+                rect = self.cell_rect(cell)
+                for item in before + after:
+                    rect.union_ip(self.footprint(cell, item))
+                self.redraw_region(rect, frame)
+                dirty_rects.append(rect)
+            # 分數列每幀都更新
+            bar = pygame.Rect(0, 0, WINDOW_W, SCOREBAR_H)
+            self.redraw_region(bar, frame)
+            dirty_rects.append(bar)
+
+        self.last_frame = frame
+        self.full_redraw = False
+        return frame, dirty_rects
 
     # ────────────────────────────────────────────────
-    # 工具：隨機生成 / 移動道具
+    # 大地圖：鏡頭 + 區塊快取
     # ────────────────────────────────────────────────
-    def spawn_food(self):
-        for _ in range(1000):
-            p = (random.randint(0,GRID_W-1), random.randint(0,GRID_H-1))
-            if p not in self.snake and p not in self.obstacles and p not in self.food:
-                self.food.add(p); return
-
-    def spawn_boost(self):
-        for _ in range(1000):
-            p = (random.randint(0,GRID_W-1), random.randint(0,GRID_H-1))
-            if p not in self.snake and p not in self.obstacles and p not in self.food and p not in self.boosts:
-                self.boosts.add(p); return
-            
-    def spawn_bomb(self):
-        for _ in range(1000):
-            p = (random.randint(0, GRID_W-1), random.randint(0, GRID_H-1))
-            if p not in self.snake and p not in self.obstacles and p not in self.food and p not in self.boosts and p not in self.bombs:
-                self.bombs.add(p)
-                return
-    
-    def spawn_confuse(self):
-        for _ in range(1000):
-            p = (random.randint(0, GRID_W-1), random.randint(0, GRID_H-1))
-            if p not in self.snake and p not in self.obstacles and p not in self.food and p not in self.boosts and p not in self.bombs and p not in self.confuses:
-                self.confuses.add(p)
-                return
-    
-    def spawn_portals(self):
-        forbidden = set(self.snake) | self.obstacles | self.food | self.boosts | self.bombs | self.confuses
-        all_positions = {(x, y) for x in range(GRID_W) for y in range(GRID_H)}
-        candidates = list(all_positions - forbidden)
-
-        total_needed = self.num_portal_pairs * 2
-        if len(candidates) >= total_needed:
-            self.portals = random.sample(candidates, total_needed)
-
-    def spawn_fake_food(self):
-        for _ in range(1000):
-            p = (random.randint(0, GRID_W-1), random.randint(0, GRID_H-1))
-            if p not in self.snake and p not in self.obstacles and p not in self.food and p not in self.fake_food:
-                self.fake_food.add(p)
-                return
-
-    def random_edge_position(self):
-        side = random.choice(["top", "bottom", "left", "right"])
-        if side == "top":
-            return random.randint(0, GRID_W-1), 0
-        elif side == "bottom":
-            return random.randint(0, GRID_W-1), GRID_H-1
-        elif side == "left":
-            return 0, random.randint(0, GRID_H-1)
+    def render_world(self):
+        """只畫鏡頭看得到的區塊；區塊內容沒變就直接貼快取。"""
+        s = self.sim
+        self.invalidate_chunks()
+        hx, hy = s.snake[0]
+        # 鏡頭跟著蛇頭，停在地圖範圍內（穿過邊界時鏡頭跟著跳到另一邊）
+        cam_x = min(max(hx - GRID_W // 2, 0), max(s.grid_w - GRID_W, 0))
+        cam_y = min(max(hy - GRID_H // 2, 0), max(s.grid_h - GRID_H, 0))
+        self.camera = (cam_x, cam_y)
+
+        board = pygame.Rect(0, SCOREBAR_H, WINDOW_W, WINDOW_H - SCOREBAR_H)
+        self.screen.fill(C_BG)
+        self.screen.set_clip(board)
+        for ky in range(cam_y // CHUNK, (min(cam_y + GRID_H, s.grid_h) - 1) // CHUNK + 1):
+            for kx in range(cam_x // CHUNK, (min(cam_x + GRID_W, s.grid_w) - 1) // CHUNK + 1):
+                self.screen.blit(self.get_chunk(kx, ky),
+                                 ((kx*CHUNK - cam_x) * CELL_SIZE, (ky*CHUNK - cam_y) * CELL_SIZE + SCOREBAR_H))
+        self.screen.set_clip(None)
+        pygame.draw.rect(self.screen, C_BOUND, board, 2)
+
+    def invalidate_chunks(self):
+        """把這幀有變動的格子所在（與被物件蓋到）的區塊從快取丟掉。"""
+        s = self.sim
+        state = (s, CELL_SIZE)
+        if self.chunk_state != state:
+            # 新的一局或換了格子大小：整個快取作廢
+            self.chunks.clear()
+            if self.chunk_state is None or self.chunk_state[0] is not s:
+                self.chunk_log = []     # sim 會把有變動的格子記進來
+                s.watchers.append(self.chunk_log)
+            self.chunk_state = state
+            self.last_head = None
+        cells = self.chunk_log[:]
+        del self.chunk_log[:]
+
+        W = s.grid_w
+        head = s.snake[0]
+        if head != self.last_head:
+            # 舊蛇頭那格要改畫成身體（吃到食物頭尾互換時也一樣）
+            cells.append(head[1]*W + head[0])
+            if self.last_head is not None:
+                cells.append(self.last_head[1]*W + self.last_head[0])
+            self.last_head = head
+        thickness = 2 + (s.age // 5) % 2
+        if thickness != self.chunk_thickness:
+            self.chunk_thickness = thickness
+            cells.extend(y*W + x for x, y in s.portals)
+        confused = s.confuse_remaining > 0
+        if confused != self.chunk_confused:
+            self.chunk_confused = confused
+            cells.extend(y*W + x for x, y in s.snake)
+
+        reach = 2   # 物件最多超出自己格子幾格（傳送門編號），鄰近區塊也要重畫
+        chunks = self.chunks
+        for c in set(cells):
+            x, y = c % W, c // W
+            for ky in range((y - reach) // CHUNK, (y + reach) // CHUNK + 1):
+                for kx in range((x - reach) // CHUNK, (x + reach) // CHUNK + 1):
+                    chunks.pop((kx, ky), None)
+
+    def get_chunk(self, kx, ky):
+        chunk = self.chunks.get((kx, ky))
+        if chunk is None:
+            chunk = self.render_chunk(kx, ky)
+            self.chunks[(kx, ky)] = chunk
+            if len(self.chunks) > CHUNK_CACHE:
+                self.chunks.popitem(last=False)
         else:
-            return GRID_W-1, random.randint(0, GRID_H-1)
-
-    def relocate_obstacles(self):
-        new_obs = set()
-        attempts = 0
-        while len(new_obs) < OBSTACLE_COUNT and attempts < OBSTACLE_COUNT * 100:
-            p = (random.randint(0, GRID_W-1), random.randint(0, GRID_H-1))
-            if p not in self.snake and p not in self.food and p not in self.boosts:
-                new_obs.add(p)
-            attempts += 1
-        self.obstacles = new_obs
-
-    def relocate_foods(self):
-        new_foods = set()
-        for _ in range(len(self.food)):
-            for _ in range(1000):
-                p = (random.randint(0, GRID_W-1), random.randint(0, GRID_H-1))
-                if p not in self.snake and p not in self.obstacles and p not in new_foods:
-                    new_foods.add(p)
-                    break
-        self.food = new_foods
-
-    def relocate_bombs(self):
-        new_bombs = set()
-        for _ in range(len(self.bombs)):
-            for _ in range(1000):
-                p = (random.randint(0, GRID_W-1), random.randint(0, GRID_H-1))
-                if p not in self.snake and p not in self.food and p not in self.boosts and p not in self.obstacles:
-                    new_bombs.add(p); break
-        self.bombs = new_bombs
+            self.chunks.move_to_end((kx, ky))
+        return chunk
+
+    # 佔用旗標 → 畫哪一種，依序疊（和原本 render 的繪製順序相同）；蛇身最後畫
+    ITEM_LAYERS = ((OCC_BOMB, "bomb"), (OCC_PORTAL, "portal"), (OCC_FAKE, "fake"),
+                    (OCC_INVISIBLE, "invisible"), (OCC_OBSTACLE, "obstacle"), (OCC_FOOD, "food"),
+                    (OCC_BOOST, "boost"), (OCC_CONFUSE, "confuse"))
+
+    def render_chunk(self, kx, ky):
+        """畫一個區塊：格線、地圖邊框，加上這塊（與旁邊 reach 格內）的所有物件。
+        直接查 occ / body_count，不用掃整張地圖的道具集合。"""
+        s = self.sim
+        W, H = s.grid_w, s.grid_h
+        x0, y0 = kx * CHUNK, ky * CHUNK
+        size = CHUNK * CELL_SIZE
+        surf = pygame.Surface((size, size)).convert()
+        surf.fill(C_BG)
+        for y in range(min(CHUNK, H - y0)):
+            for x in range(min(CHUNK, W - x0)):
+                pygame.draw.rect(surf, C_GRID, pygame.Rect(x*CELL_SIZE, y*CELL_SIZE, CELL_SIZE, CELL_SIZE), 1)
+        pygame.draw.rect(surf, C_BOUND, pygame.Rect(-x0*CELL_SIZE, -y0*CELL_SIZE, W*CELL_SIZE, H*CELL_SIZE), 2)
+
+        reach = 2
+        occ, body = s.occ, s.body_count
+        portals = {p: k for k, p in enumerate(s.portals)}
+        head = s.snake[0]
+        snake_color = C_SNAKE_CONFUSE if self.chunk_confused else C_SNAKE
+        items = []
+        for y in range(max(0, y0 - reach), min(H, y0 + CHUNK + reach)):
+            row = y * W
+            for x in range(max(0, x0 - reach), min(W, x0 + CHUNK + reach)):
+                flags = occ[row + x]
+                if flags:
+                    for layer, (flag, kind) in enumerate(self.ITEM_LAYERS):
+                        if flags & flag:
+                            arg = (portals[(x, y)] // 2, self.chunk_thickness) if kind == "portal" else None
+                            items.append((layer, x, y, kind, arg))
+                if body[row + x]:
+                    items.append((len(self.ITEM_LAYERS), x, y, "snake", (snake_color, (x, y) == head)))
+        items.sort(key=lambda t: t[:3])
+        for _, x, y, kind, arg in items:
+            sprite, (ox, oy) = self.get_sprite(kind, arg)
+            surf.blit(sprite, ((x - x0)*CELL_SIZE + ox, (y - y0)*CELL_SIZE + oy))
+        return surf
+
+    def draw_profiler(self, frame):
+        """右上角的分段計時表：各段 p50 / p95 / p99 與實際幀率（文字每 15 幀更新一次）。"""
+        prof = self.profiler
+        if not self.profiler_lines or prof.frames % 15 == 0:
+            rows = [f"{'ms':<7}{'p50':>6}{'p95':>6}{'p99':>6}"]
+            for phase in PHASES + ("total",):
+                rows.append(f"{phase:<7}" + "".join(f"{v:6.2f}" for v in prof.percentiles(phase)))
+            rows.append(f"{prof.fps():.0f} frames/s")
+            self.profiler_lines = [self.small_font.render(r, True, C_TEXT) for r in rows]
+
+        lines = self.profiler_lines
+        w = max(label.get_width() for label in lines) + 12
+        h = len(lines) * 18 + 8
+        box = pygame.Rect(WINDOW_W - w - 4, SCOREBAR_H + 4, w, h)
+        # 底下的格子先畫回來（dirty 模式下這塊每幀都會變），再蓋半透明底與文字
+        if frame is not None:
+            self.redraw_region(box, frame)
+        shade = pygame.Surface(box.size)
+        shade.set_alpha(180)
+        self.screen.blit(shade, box)
+        for i, label in enumerate(lines):
+            self.screen.blit(label, (box.x + 6, box.y + 4 + i * 18))
+        return box
+
 
 # ────────────────────────────────────────────────────────────────────
 # 執行
 # ────────────────────────────────────────────────────────────────────
 if __name__ == "__main__":
-    game = SnakeGame()
+    parser = argparse.ArgumentParser(description="Snake Game")
+    parser.add_argument("--seed", type=seed_arg, help="決定性模式：固定亂數種子（計時改用 tick）")
+    parser.add_argument("--record", metavar="FILE", help="把這局錄成重播檔")
+    parser.add_argument("--replay", metavar="FILE", help="播放重播檔")
+    parser.add_argument("--speed", type=float, default=1.0, help="播放倍速，0 = 不限速")
+    parser.add_argument("--level", type=int, help="跳過開場與選單，直接開始選單上的第 N 個關卡（內建 4 = Boss 模式）")
+    parser.add_argument("--levels", metavar="DIR", help="關卡目錄（預設 levels/）")
+    parser.add_argument("--name", help="搭配 --level 使用的玩家名稱")
+    parser.add_argument("--timing", action="store_true", help="印出啟動到第一個可玩畫面的時間")
+    parser.add_argument("--profile", metavar="FILE", help="每幀分段計時寫到 CSV（或 .jsonl），並顯示計時表")
+    parser.add_argument("--world", type=int, metavar="N", help="N×N 大地圖（鏡頭跟著蛇頭，道具數量依面積放大）")
+    parser.add_argument("--autopilot", action="store_true", help="自動駕駛展示模式（F2 切換）")
+    parser.add_argument("--spectate", metavar="NAME", help="開放觀戰（python spectate.py NAME）")
+    args = parser.parse_args()
+
+    game = SnakeGame(seed=args.seed, record=args.record, replay=args.replay, speed=args.speed,
+                     level=args.level, name=args.name, timing=args.timing, profile=args.profile,
+                     world=args.world, autopilot=args.autopilot, spectate=args.spectate, levels=args.levels)
     game.run()
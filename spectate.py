@@ -0,0 +1,383 @@
+"""
+Spectate – 觀戰（共享記憶體環形緩衝）
+=====================================
+遊戲程序把盤面寫進一塊共享記憶體：每隔 `KEYFRAME_TICKS` 個 tick（或緩衝寫過 1/4）寫一個關鍵幀
+（整張盤面 + 傳送門），其餘每個 tick 只寫有變的格子與蛇頭、長度、加速 / 混亂倒數等狀態。
+觀戰程序自己開這塊記憶體來讀，中途加入就從最新的關鍵幀開始追，想開幾個都可以；
+遊戲這邊每個 tick 只做「寫一筆」的工作，和有幾個觀眾無關，也不需要等任何人。
+
+```bash
+python snake_game.py --level 2 --spectate finals     # 比賽那台：開放觀戰
+python spectate.py finals                             # 觀戰（任意多個視窗）
+```
+
+盤面每格的值和 netplay 相同（旗標 | 玩家編號 << 9，單人遊戲的蛇是 1 號），格子編碼也共用。
+
+共享記憶體配置（little-endian）：
+
+| 位置 | 內容 |
+|------|------|
+| 0    | magic `SNKF`、version:I、capacity:I、seq:I |
+| 16   | write_pos:Q（總共寫了幾 bytes）、key_pos:Q（最新關鍵幀的位置） |
+| 32   | closed:I（遊戲關掉或換了一塊更大的記憶體時設成 1）、保留 4 bytes |
+| 40   | 資料區（capacity bytes，位置 = pos % capacity） |
+
+每筆紀錄 = 長度:I + 類型:1 byte + 內容；`seq` 是 seqlock（寫入標頭時為奇數）。緩衝大小至少是
+最大一筆紀錄的 4 倍；讀的一方讀完一筆再確認它離 write_pos 還有 1/4 圈以上的餘裕
+（下一筆正在寫的也蓋不到），不然就回到最新的關鍵幀重來。
+讀到 `closed` 的觀眾讀完剩下的紀錄後，重新用同一個名稱開（遊戲換成更大的地圖時會重開一塊）。
+"""
+import argparse
+import asyncio
+import struct
+import sys
+from array import array
+from multiprocessing import shared_memory
+
+from netplay import (
+    encode_cells, decode_cells, pack_str, unpack_str, run_window, RemotePlayer, MAX_CELLS, OWNER_SHIFT,
+    PF_ALIVE, PF_WAITING, PF_CONFUSED, PF_BOOSTED,
+)
+
+MAGIC = b"SNKF"
+VERSION = 2
+KEYFRAME_TICKS = 64         # 至少每幾個 tick 寫一個關鍵幀
+MIN_CAPACITY = 1 << 20
+PLAYER = 1                  # 單人遊戲的蛇在盤面上的玩家編號
+
+REC_KEYFRAME, REC_DELTA = b"K", b"D"
+
+_HEADER = struct.Struct("<4sIIIQQI4x")
+_SEQ_AT = 12                # seq 在標頭裡的位置
+_CLOSED_AT = 32             # closed 在標頭裡的位置
+_LEN = struct.Struct("<I")
+# 每筆紀錄都有的狀態：tick、蛇頭、長度、age、fps、加速 / 混亂倒數、flags
+_STATE = struct.Struct("<IIIIHHHB")
+# 關鍵幀多的部分：地圖大小、level、boss、傳送門數
+_KEY = struct.Struct("<HHBBB")
+
+
+def _attach(name):
+    """開既有的共享記憶體，不交給 resource tracker 管（不然觀眾一關就把它刪掉）。"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:       # Python < 3.13 沒有 track 參數
+        shm = shared_memory.SharedMemory(name=name)
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+# ────────────────────────────────────────────────────────────────────
+# 遊戲這一邊
+# ────────────────────────────────────────────────────────────────────
+class SpectatorFeed:
+    """遊戲程序裡建立；每局開始 attach(sim)，每個 tick publish()。"""
+
+    def __init__(self, name, capacity=MIN_CAPACITY):
+        self.name = name
+        self.capacity = capacity
+        self.shm = None
+        self.sim = None
+        self.log = []               # sim 會把有變動的格子記進來
+        self.nonzero = set()        # 目前值不是 0 的格子（關鍵幀只要編這些）
+        self.board = None
+        self.write_pos = self.key_pos = 0
+        self.last_key_tick = 0
+        self.player = ""
+        self.level = 0
+
+    def _open(self, capacity):
+        if self.shm is not None:
+            self.close()
+        try:
+            self.shm = shared_memory.SharedMemory(name=self.name, create=True, size=_HEADER.size + capacity)
+        except FileExistsError:
+            # 上次沒有正常結束留下來的，直接換掉
+            old = _attach(self.name)
+            _LEN.pack_into(old.buf, _CLOSED_AT, 1)
+            old.close()
+            old.unlink()
+            self.shm = shared_memory.SharedMemory(name=self.name, create=True, size=_HEADER.size + capacity)
+        self.capacity = capacity
+        self.write_pos = self.key_pos = 0
+        _HEADER.pack_into(self.shm.buf, 0, MAGIC, VERSION, capacity, 0, 0, 0, 0)
+
+    def close(self):
+        self.detach()
+        if self.shm is not None:
+            # 還開著這塊的觀眾看到 closed 就會重新開（不然會停在最後一幀）
+            _LEN.pack_into(self.shm.buf, _CLOSED_AT, 1)
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def attach(self, sim, player="", level=0):
+        """開始轉播 sim（每局一個新的 SnakeSim）：整張掃一次，寫關鍵幀。"""
+        self.detach()
+        C = sim.grid_w * sim.grid_h
+        # 最大的一筆紀錄（每格 5 bytes）不超過緩衝的 1/4
+        capacity = max(MIN_CAPACITY, 4 * (5 * C + 1024))
+        if self.shm is None or capacity > self.capacity:
+            self._open(capacity)
+        self.sim, self.player, self.level = sim, player, level
+        sim.watchers.append(self.log)
+        self.board = array("H", bytes(2 * C))
+        self.nonzero = set()
+        self._refresh(range(C))
+        self.write_keyframe()
+
+    def detach(self):
+        if self.sim is not None:
+            self.sim.watchers[:] = [log for log in self.sim.watchers if log is not self.log]
+            self.sim = None
+        del self.log[:]
+
+    def _refresh(self, cells):
+        s, board, nonzero = self.sim, self.board, self.nonzero
+        occ, body = s.occ, s.body_count
+        changed = []
+        for c in cells:
+            v = occ[c] | (PLAYER << OWNER_SHIFT if body[c] else 0)
+            if board[c] != v:
+                board[c] = v
+                changed.append(c)
+                if v:
+                    nonzero.add(c)
+                else:
+                    nonzero.discard(c)
+        return changed
+
+    def _state(self):
+        s = self.sim
+        flags = (PF_ALIVE if not s.game_over else 0) | (PF_WAITING if s.waiting_start else 0) | \
+            (PF_CONFUSED if s.confuse_remaining > 0 else 0) | (PF_BOOSTED if s.boost_remaining > 0 else 0)
+        head = s.cell_id(s.snake[0]) if len(s.snake) else 0
+        return _STATE.pack(s.tick, head, len(s.snake), s.age, min(s.fps, 0xFFFF),
+                           min(s.boost_remaining, 0xFFFF), min(s.confuse_remaining, 0xFFFF), flags)
+
+    def publish(self):
+        """sim 推進一個 tick 之後呼叫：寫一筆差分（該寫關鍵幀時寫關鍵幀）。"""
+        if self.sim is None:
+            return
+        changed = self._refresh(set(self.log))
+        del self.log[:]
+        if (self.sim.tick - self.last_key_tick >= KEYFRAME_TICKS
+                or self.write_pos - self.key_pos > self.capacity // 4):
+            self.write_keyframe()
+        else:
+            self._write(REC_DELTA + self._state() + encode_cells(changed, self.board))
+
+    def write_keyframe(self):
+        s = self.sim
+        portals = [s.cell_id(p) for p in s.portals]
+        body = (REC_KEYFRAME + self._state() + _KEY.pack(s.grid_w, s.grid_h, self.level, s.boss, len(portals))
+                + struct.pack(f"<{len(portals)}I", *portals) + pack_str(self.player)
+                + encode_cells(self.nonzero, self.board))
+        self.last_key_tick = s.tick
+        self._write(body, key=True)
+
+    def _write(self, body, key=False):
+        buf, cap = self.shm.buf, self.capacity
+        record = _LEN.pack(_LEN.size + len(body)) + body
+        start = self.write_pos
+        at = start % cap
+        first = min(len(record), cap - at)
+        base = _HEADER.size
+        buf[base + at:base + at + first] = record[:first]
+        if first < len(record):
+            buf[base:base + len(record) - first] = record[first:]
+        # seqlock：標頭改到一半時 seq 是奇數
+        seq = _LEN.unpack_from(buf, _SEQ_AT)[0]
+        _LEN.pack_into(buf, _SEQ_AT, seq + 1)
+        self.write_pos = start + len(record)
+        if key:
+            self.key_pos = start
+        struct.pack_into("<QQ", buf, 16, self.write_pos, self.key_pos)
+        _LEN.pack_into(buf, _SEQ_AT, seq + 2)
+
+
+# ────────────────────────────────────────────────────────────────────
+# 觀眾這一邊
+# ────────────────────────────────────────────────────────────────────
+class FeedReader:
+    """開遊戲那邊的共享記憶體，poll() 讀到最新；欄位和 netplay.GameClient 相同，可以直接交給 run_window。"""
+
+    def __init__(self, name):
+        self.name = name
+        self.shm = _attach(name)
+        magic, version, self.capacity = _HEADER.unpack_from(self.shm.buf, 0)[:3]
+        if magic != MAGIC or version != VERSION:
+            self.shm.close()
+            raise ValueError(f"{name} 不是觀戰用的共享記憶體")
+        self.pos = None             # 下一筆要讀的位置；None = 還沒對上關鍵幀
+        self.grid_w = self.grid_h = 0
+        self.board = None
+        self.portals = []
+        self.players = {}
+        self.pid = PLAYER
+        self.tick = None
+        self.age = self.fps = self.boost_remaining = self.confuse_remaining = 0
+        self.player = ""
+        self.level, self.boss = 0, False
+        self.resyncs = 0
+        self.reattaches = 0
+
+    def close(self):
+        self.shm.close()
+
+    def _reattach(self):
+        """遊戲關掉了這塊記憶體：改開同名的新的一塊，從它的關鍵幀開始；還沒有新的就回傳 False（下次再試）。"""
+        try:
+            shm = _attach(self.name)
+        except FileNotFoundError:
+            return False
+        magic, version, capacity, _, _, _, closed = _HEADER.unpack_from(shm.buf, 0)
+        if magic != MAGIC or version != VERSION or closed:
+            shm.close()         # 遊戲剛建好、標頭還沒寫，或還沒換掉：下次再試
+            return False
+        self.shm.close()
+        self.shm, self.capacity, self.pos = shm, capacity, None
+        self.reattaches += 1
+        return True
+
+    def _header(self):
+        buf = self.shm.buf
+        while True:
+            seq = _LEN.unpack_from(buf, _SEQ_AT)[0]
+            if seq & 1:
+                continue
+            write_pos, key_pos = struct.unpack_from("<QQ", buf, 16)
+            if _LEN.unpack_from(buf, _SEQ_AT)[0] == seq:
+                return write_pos, key_pos
+
+    def _read(self, pos, n):
+        buf, cap, base = self.shm.buf, self.capacity, _HEADER.size
+        at = pos % cap
+        first = min(n, cap - at)
+        data = bytes(buf[base + at:base + at + first])
+        if first < n:
+            data += bytes(buf[base:base + n - first])
+        return data
+
+    def _safe(self, write_pos):
+        """self.pos 那筆還沒被蓋掉（含正在寫、還沒更新 write_pos 的下一筆）。"""
+        return write_pos - self.pos <= self.capacity - self.capacity // 4
+
+    def poll(self):
+        """讀完目前寫到的所有紀錄，回傳讀了幾筆；遊戲換了一塊記憶體就跟過去。"""
+        # 先看 closed 再讀：設了 closed 之後遊戲不會再寫，讀完就是全部
+        closed = _LEN.unpack_from(self.shm.buf, _CLOSED_AT)[0]
+        n = self._poll()
+        if closed and self._reattach():
+            n += self._poll()
+        return n
+
+    def _poll(self):
+        write_pos, key_pos = self._header()
+        if self.pos is None or not self._safe(write_pos):
+            if self.pos is not None:
+                self.resyncs += 1       # 落後超過一整圈，回到最新的關鍵幀
+            self.pos = key_pos
+            if write_pos == 0:
+                return 0
+        n = 0
+        while self.pos < write_pos:
+            size = _LEN.unpack(self._read(self.pos, _LEN.size))[0]
+            record = self._read(self.pos + _LEN.size, max(0, min(size, self.capacity) - _LEN.size))
+            # 讀的時候被蓋掉了：紀錄不可靠，從最新的關鍵幀重來
+            if not self._safe(self._header()[0]):
+                self.pos = None
+                self.resyncs += 1
+                return n + self._poll()
+            self.apply(record)
+            self.pos += size
+            n += 1
+        return n
+
+    def apply(self, record):
+        kind = record[:1]
+        tick, head, length, age, fps, boost, confuse, flags = _STATE.unpack_from(record, 1)
+        pos = 1 + _STATE.size
+        if kind == REC_KEYFRAME:
+            w, h, self.level, boss, n = _KEY.unpack_from(record, pos)
+            pos += _KEY.size
+            self.boss = bool(boss)
+            self.portals = list(struct.unpack_from(f"<{n}I", record, pos))
+            self.player, pos = unpack_str(record, pos + 4 * n)
+            self.grid_w, self.grid_h = w, h
+            self.board = array("H", bytes(2 * w * h))
+        elif self.board is None:
+            return
+        decode_cells(record, pos, self.board)
+        self.tick, self.age, self.fps = tick, age, fps
+        self.boost_remaining, self.confuse_remaining = boost, confuse
+        self.players = {PLAYER: RemotePlayer(PLAYER, flags, head, length, length, self.player)}
+
+    # run_window 用
+    def turn(self, direction):
+        pass            # 觀眾不能操作
+
+    def me(self):
+        return self.players.get(PLAYER)
+
+    def status_text(self):
+        if self.board is None:
+            return f"waiting for {self.name}…"
+        mode = "Boss" if self.boss else f"L{self.level}"
+        text = f"{self.name} {mode}  tick {self.tick}  fps {self.fps}"
+        if self.boost_remaining:
+            text += f"  boost {self.boost_remaining}"
+        if self.confuse_remaining:
+            text += f"  confuse {self.confuse_remaining}"
+        me = self.me()
+        if me is not None and not me.alive:
+            text += "  GAME OVER"
+        return text
+
+
+async def follow(reader, interval=1 / 60):
+    while True:
+        reader.poll()
+        await asyncio.sleep(interval)
+
+
+async def watch(name):
+    # 遊戲還沒開始（或還在選單）就等它
+    while True:
+        try:
+            reader = FeedReader(name)
+            break
+        except FileNotFoundError:
+            print(f"等待 {name} 開始…（遊戲要用 --spectate {name} 開）", file=sys.stderr, end="\r")
+            await asyncio.sleep(0.5)
+    try:
+        while reader.board is None:
+            reader.poll()
+            await asyncio.sleep(0.05)
+        if reader.grid_w * reader.grid_h > MAX_CELLS:
+            raise ValueError("大地圖（--world）沒有觀戰畫面")
+        poller = asyncio.ensure_future(follow(reader))
+        try:
+            await run_window(reader, title=f"Snake – watching {name}")
+        finally:
+            poller.cancel()
+    finally:
+        reader.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Snake 觀戰：看 snake_game.py --spectate NAME 的遊戲")
+    parser.add_argument("name", help="遊戲那邊 --spectate 的名稱")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(watch(args.name))
+    except KeyboardInterrupt:
+        pass
+    except ValueError as err:
+        print(err, file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
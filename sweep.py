@@ -0,0 +1,265 @@
+"""
+Sweep – 多程序自我對戰，調 DIFFICULTY_SETTINGS 用
+=================================================
+對一組參數格（難度 × 每個 `--set` 的值）各跑 N 局無畫面對局，交給 process pool 用滿所有核心，
+最後整理成一張表：存活 tick 數、最終長度、死因比例、每 1000 tick 撿到幾個道具。
+
+* 每一局的 seed 固定（`--seed` + 第幾局），同一組 seed 在每個參數組合都會跑到，比較起來比較公平；
+* `--out` 每跑完一局就寫一行 JSON，中途 Ctrl-C 之後同樣的指令加 `--resume` 會跳過已經跑完的局；
+* 設定欄位見 `snake_core.make_config()` / `timer_periods()`（例如 obst_count、bomb_ms）。
+
+```bash
+python sweep.py --levels 1,2,3 --games 200 --out sweep.jsonl
+python sweep.py --levels 2 --set obst_count=10,20,30 --set obst_ms=2000,4000 --policy random
+python sweep.py --levels 1,2,3 --games 200 --out sweep.jsonl --resume   # 接著跑
+python sweep.py --summary sweep.jsonl                                   # 只看結果
+```
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import signal
+import statistics
+import sys
+import time
+
+from snake_core import SnakeSim, make_config, DIR_LIST, OPTIONAL_CONFIG_KEYS
+from autopilot import Autopilot
+
+PICKUPS = ("food", "boost", "bomb", "confuse", "fake_food", "portal")
+CAUSES = ("obstacle", "self", "invisible", "timeout")
+# 可以用 --set 掃的設定欄位（level / boss 由 --levels 決定）
+CONFIG_KEYS = (set(make_config()) | OPTIONAL_CONFIG_KEYS) - {"level", "boss"}
+
+
+def check_keys(keys):
+    """設定欄位打錯字（沒有人會讀）就丟 ValueError，免得白跑一整輪。"""
+    unknown = sorted(set(keys) - CONFIG_KEYS)
+    if unknown:
+        raise ValueError(f"不認得的設定欄位：{', '.join(unknown)}"
+                         f"（可用的見 snake_core.make_config() / timer_periods()）")
+
+
+# ────────────────────────────────────────────────────────────────────
+# 一局
+# ────────────────────────────────────────────────────────────────────
+def random_policy(sim, rng):
+    """隨機亂走：開局先選一個方向，之後每個 tick 有 10% 機率轉向（和 benchmarks 一樣）。"""
+    if sim.waiting_start or rng.random() < 0.1:
+        return rng.choice(DIR_LIST)
+    return None
+
+
+def play(combo, seed, policy="autopilot", max_ticks=3000):
+    """用 combo（level、boss 加設定覆寫）跑一局，回傳這局的統計。"""
+    overrides = {k: v for k, v in combo.items() if k not in ("level", "boss")}
+    check_keys(overrides)
+    sim = SnakeSim(make_config(combo["level"], combo["boss"], **overrides), seed)
+    rng = random.Random(seed)
+    pilot = Autopilot(sim) if policy == "autopilot" else None
+
+    pickups = dict.fromkeys(PICKUPS, 0)
+    max_length = len(sim.snake)
+    while not sim.game_over and sim.tick < max_ticks:
+        action = pilot.act() if pilot is not None else random_policy(sim, rng)
+        for event in sim.step(action):
+            if event in pickups:
+                pickups[event] += 1
+        max_length = max(max_length, len(sim.snake))
+    return {
+        "combo": combo,
+        "seed": seed,
+        "policy": policy,
+        "max_ticks": max_ticks,
+        "ticks": sim.tick,
+        "final_length": len(sim.snake),
+        "max_length": max_length,
+        "death": sim.death_cause if sim.game_over else "timeout",
+        "pickups": pickups,
+    }
+
+
+def _init_worker():
+    signal.signal(signal.SIGINT, signal.SIG_IGN)    # Ctrl-C 交給主程序處理，子程序不要各自噴 traceback
+
+
+def _play_job(job):
+    combo, seed, policy, max_ticks = job
+    return play(combo, seed, policy, max_ticks)
+
+
+def job_key(combo, seed, policy, max_ticks):
+    """同一局的判斷依據：--max-ticks 不同的結果不能混在一起（舊結果沒有這個欄位 = 重跑）。"""
+    return json.dumps([combo, seed, policy, max_ticks], sort_keys=True)
+
+
+# ────────────────────────────────────────────────────────────────────
+# 參數格
+# ────────────────────────────────────────────────────────────────────
+def parse_value(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def build_combos(levels, sets):
+    """levels：[1, 2, 3, 4]（4 = Boss）；sets：["obst_count=10,20", ...] → 所有組合。"""
+    axes = []
+    for item in sets:
+        key, sep, values = item.partition("=")
+        if not sep or not values:
+            raise ValueError(f"--set 格式是 key=v1,v2,...：{item!r}")
+        key = key.strip()
+        check_keys([key])
+        axes.append([(key, parse_value(v)) for v in values.split(",")])
+    combos = []
+    for level in levels:
+        for picked in itertools.product(*axes):
+            combo = {"level": min(level, 3), "boss": level == 4}
+            combo.update(picked)
+            combos.append(combo)
+    return combos
+
+
+def load_results(path):
+    """讀回之前寫的結果（最後一行可能因為中斷只寫了一半，略過）。"""
+    results = []
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    results.append(json.loads(line))
+                except ValueError:
+                    pass
+    return results
+
+
+def ends_with_newline(path):
+    """檔案是空的或最後一個字元是換行（上次有好好寫完）。"""
+    with open(path, "rb") as f:
+        if f.seek(0, os.SEEK_END) == 0:
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+# ────────────────────────────────────────────────────────────────────
+# 執行 / 彙整
+# ────────────────────────────────────────────────────────────────────
+def run(jobs, workers, out=None, progress=True):
+    """把 jobs 丟給 process pool，每跑完一局就 yield 結果（順序不固定）並寫進 out。"""
+    done = 0
+    t0 = time.perf_counter()
+    with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+        for result in pool.imap_unordered(_play_job, jobs, chunksize=max(1, len(jobs) // (workers * 16))):
+            if out is not None:
+                out.write(json.dumps(result, sort_keys=True) + "\n")
+                out.flush()
+            done += 1
+            if progress and (done % 50 == 0 or done == len(jobs)):
+                rate = done / (time.perf_counter() - t0)
+                print(f"\r{done}/{len(jobs)} games  {rate:.1f} games/s", end="", file=sys.stderr)
+            yield result
+    if progress and jobs:
+        print(file=sys.stderr)
+
+
+def summarize(results):
+    """依參數組合分組，回傳 [((combo, policy, max_ticks), 統計), ...]。"""
+    groups = {}
+    for r in results:
+        key = json.dumps([r["combo"], r["policy"], r.get("max_ticks")], sort_keys=True)
+        groups.setdefault(key, []).append(r)
+    rows = []
+    for key in sorted(groups):
+        rs = groups[key]
+        ticks = sum(r["ticks"] for r in rs)
+        stats = {
+            "games": len(rs),
+            "ticks_mean": statistics.mean(r["ticks"] for r in rs),
+            "ticks_median": statistics.median(r["ticks"] for r in rs),
+            "length_mean": statistics.mean(r["final_length"] for r in rs),
+            "length_max": max(r["max_length"] for r in rs),
+        }
+        for cause in CAUSES:
+            stats[cause] = sum(r["death"] == cause for r in rs) / len(rs)
+        for item in PICKUPS:
+            stats[item] = sum(r["pickups"][item] for r in rs) * 1000 / max(ticks, 1)
+        rows.append((json.loads(key), stats))
+    return rows
+
+
+def print_table(rows, file=sys.stdout):
+    if not rows:
+        print("(沒有結果)", file=file)
+        return
+    # 參數欄位：難度之外只列有變化的設定
+    keys = sorted({k for (combo, _, _), _ in rows for k in combo})
+    keys = [k for k in keys if k in ("level", "boss")
+            or len({json.dumps(combo.get(k)) for (combo, _, _), _ in rows}) > 1]
+    header = keys + ["policy", "max_ticks", "games", "ticks", "med", "len", "max"] + \
+        [f"{c}%" for c in CAUSES] + [f"{p}/kt" for p in PICKUPS]
+    table = []
+    for (combo, policy, max_ticks), st in rows:
+        table.append([str(combo.get(k, "")) for k in keys] + [
+            policy, str(max_ticks if max_ticks is not None else "?"), str(st["games"]), f"{st['ticks_mean']:.0f}", f"{st['ticks_median']:.0f}",
+            f"{st['length_mean']:.1f}", str(st["length_max"])] +
+            [f"{st[c]:.0%}" for c in CAUSES] + [f"{st[p]:.2f}" for p in PICKUPS])
+    widths = [max(len(h), *(len(row[i]) for row in table)) for i, h in enumerate(header)]
+    print("  ".join(h.rjust(w) for h, w in zip(header, widths)), file=file)
+    for row in table:
+        print("  ".join(v.rjust(w) for v, w in zip(row, widths)), file=file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Snake 平衡測試：多程序跑大量無畫面對局")
+    parser.add_argument("--levels", default="1,2,3", help="難度，逗號分隔（4 = Boss）")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=V1,V2",
+                        help="要掃的設定欄位與值（可重複，取所有組合）")
+    parser.add_argument("--games", type=int, default=100, help="每個組合跑幾局")
+    parser.add_argument("--policy", choices=["autopilot", "random"], default="autopilot")
+    parser.add_argument("--max-ticks", type=int, default=3000, help="一局最多幾個 tick（超過算 timeout）")
+    parser.add_argument("--seed", type=int, default=0, help="第 i 局用 seed + i")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--out", help="每局結果寫成 JSONL（可中斷後 --resume）")
+    parser.add_argument("--resume", action="store_true", help="跳過 --out 裡已經有的局")
+    parser.add_argument("--summary", metavar="FILE", help="不跑，只彙整現有的結果檔")
+    args = parser.parse_args(argv)
+
+    if args.summary:
+        print_table(summarize(load_results(args.summary)))
+        return
+
+    try:
+        combos = build_combos([int(v) for v in args.levels.split(",")], args.set)
+    except ValueError as err:
+        parser.error(str(err))
+    previous = load_results(args.out) if args.resume else []
+    finished = {job_key(r["combo"], r["seed"], r["policy"], r.get("max_ticks")) for r in previous}
+    jobs = [(combo, args.seed + i, args.policy, args.max_ticks)
+            for combo in combos for i in range(args.games)
+            if job_key(combo, args.seed + i, args.policy, args.max_ticks) not in finished]
+    print(f"{len(combos)} 組參數 × {args.games} 局：要跑 {len(jobs)} 局"
+          f"（已完成 {len(previous)}），{args.workers} 個程序", file=sys.stderr)
+
+    out = open(args.out, "a" if args.resume else "w", encoding="utf-8") if args.out else None
+    if out is not None and not ends_with_newline(args.out):
+        out.write("\n")    # 上次中斷時最後一行沒寫完，先換行（那半行讀的時候會略過）
+    results = list(previous)
+    try:
+        for result in run(jobs, args.workers, out):
+            results.append(result)
+    except KeyboardInterrupt:
+        print(f"\n中斷：已完成 {len(results)} 局" + ("，加 --resume 接著跑" if out else ""), file=sys.stderr)
+    finally:
+        if out is not None:
+            out.close()
+    print_table(summarize(results))
+
+
+if __name__ == "__main__":
+    main()